@@ -11,14 +11,27 @@ Provides
     4. MASS2_batch - a batch implementaiton of mass2
     5. top_k_motifs - find top k motifs
     6. top_k_discords - find top k discords
-    7. MASS2_GPU - a gpu powered version of MASS2
+    7. MASS2_GPU, MASS2_xp - MASS2 on CuPy or any array API namespace
+    8. MASS2_approximate - a two stage approximate version of MASS2
+    9. MASS_multiscale - MASS2 for a query at several lengths in one pass
+    10. MASS2_many - MASS2 of one query over many time series
+    11. amass2, amass2_batch - asyncio versions of MASS2 and MASS2_batch
+    12. SearchEngine - coalesces concurrent queries into batched MASS2 passes
+    13. MassIndex - a block partitioned index supporting appends and edits
+    14. MASS3_top_k - top k motifs or discords fused into the MASS3 pieces
+    15. drag_discords - find time series discords with the DRAG algorithm
+    16. distance_profile - a compact distance profile with lazy derived views
+    17. DistributedIndex - top k search over shards on socket workers
+    18. search - runs the fastest strategy fitting in a memory budget
+    19. pairwise_distances - distance matrix of equal length subsequences
+    20. MASS3_motif_set - every occurrence of a query within a radius
 
 Example Usage
 -------------
 >>> import mass_ts
 >>> import numpy as np
->>> ts = np.loadtxt('ts.txt')
->>> query = np.loadtxt('query.txt')
+>>> ts = mass_ts.core.load_series('ts.txt')
+>>> query = mass_ts.core.load_series('query.txt')
 >>> distance = mass_ts.mass(ts, query)
 
 Citations
@@ -30,7 +43,29 @@ __author__ = """Tyler Marrs"""
 __email__ = 'tylerwmarrs@gmail.com'
 __version__ = '0.1.4'
 
+import sys
 
-from mass_ts._mass_ts import mass, mass2, mass3, mass2_gpu
+from mass_ts._mass_ts import (
+    mass, mass2, mass3, mass2_gpu, mass2_xp, mass_multiscale, mass3_top_k,
+    mass3_motif_set
+)
 from mass_ts._mass2_batch import mass2_batch
+from mass_ts._mass2_many import mass2_many
 from mass_ts._top_k import top_k_motifs, top_k_discords
+from mass_ts._approximate import mass2_approximate
+from mass_ts._cache import (
+    SeriesCache, set_cache, get_cache, QueryCache, set_query_cache,
+    get_query_cache
+)
+from mass_ts._index import MassIndex
+from mass_ts._discords import drag_discords
+from mass_ts._profile import DistanceProfile, distance_profile
+from mass_ts._distributed import (
+    DistributedIndex, serve_worker, start_local_workers
+)
+from mass_ts._planner import search, plan_search, calibrate
+from mass_ts._pairwise import pairwise_distances
+
+if sys.version_info >= (3, 6):
+    from mass_ts._async import amass2, amass2_batch, amass2_batch_iter
+    from mass_ts._engine import SearchEngine
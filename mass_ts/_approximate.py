@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module contains all logic used for the approximate two stage MASS
+search. A downsampled version of the time series is searched first to find
+candidate regions which are then refined with exact MASS2 distances.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+range = getattr(__builtins__, 'xrange', range)
+# end of py2 compatability boilerplate
+
+import numpy as np
+
+import mass_ts as mts
+from mass_ts import core as mtscore
+from mass_ts import _top_k
+
+
+def _sample_distances(ts, query, indices):
+    """
+    Computes the exact z-normalized Euclidean distance between the query and
+    the subsequences starting at the given indices.
+
+    Parameters
+    ----------
+    ts : np.array
+        The time series.
+    query : np.array
+        The query.
+    indices : np.array
+        The subsequence starting indices to compute distances for.
+
+    Returns
+    -------
+    An array of distances.
+    """
+    m = len(query)
+    windows = ts[indices[:, np.newaxis] + np.arange(m)]
+    windows = windows - windows.mean(axis=1)[:, np.newaxis]
+    windows = windows / windows.std(axis=1)[:, np.newaxis]
+    query = (query - np.mean(query)) / np.std(query)
+
+    dist = np.sum((windows - query) ** 2, axis=1)
+
+    return np.sqrt(dist)
+
+
+def mass2_approximate(ts, query, factor=8, candidates=16, top_matches=3,
+                      exclusion_zone=None, padding=None, samples=256,
+                      random_state=None):
+    """
+    Approximate MASS2 search for very large time series. The time series and
+    query are downsampled with piecewise aggregate approximation (PAA) and
+    searched with MASS2 to find candidate regions. Only the candidate regions,
+    extended by the padding, are then searched with the exact MASS2 algorithm.
+    The returned distances are exact, however matches outside of the candidate
+    regions can be missed. An estimate of the recall is provided by sampling
+    exact distances outside of the searched regions.
+
+    Parameters
+    ----------
+    ts : array_like
+        The time series.
+    query : array_like
+        The query to search for.
+    factor : int, Default 8
+        The downsampling factor used for the PAA representation.
+    candidates : int, Default 16
+        The number of candidate regions to refine with exact distances.
+    top_matches : int, Default 3
+        The number of matches you would like to return.
+    exclusion_zone : int, Default None
+        The buffer around a match to exclude other matches from. By default
+        it is half of the query length.
+    padding : int, Default None
+        The number of points added to both sides of a candidate region before
+        the exact search. By default it is twice the downsampling factor.
+    samples : int, Default 256
+        The number of random subsequences outside of the candidate regions
+        used to estimate the recall.
+    random_state : int, Default None
+        Seed for sampling the recall estimate.
+
+    Returns
+    -------
+    Tuple (indices, distances, recall) - the indices and exact distances of
+    the best matches sorted by distance and the estimated recall in [0, 1].
+
+    Raises
+    ------
+    ValueError
+        If ts is not a list or np.array.
+        If query is not a list or np.array.
+        If ts or query is not one dimensional.
+        If factor is not an integer or is less than 1.
+        If candidates is not an integer or is less than 1.
+        If top_matches is < 1 or is not an integer.
+        If samples is < 0 or is not an integer.
+        If the downsampled query is shorter than 2 points.
+    """
+    ts, query = mtscore.precheck_series_and_query(ts, query)
+
+    if not isinstance(factor, int) or factor < 1:
+        raise ValueError('factor must be an integer of 1 or more.')
+
+    if not isinstance(candidates, int) or candidates < 1:
+        raise ValueError('candidates must be an integer of 1 or more.')
+
+    if not isinstance(top_matches, int) or top_matches < 1:
+        raise ValueError('top_matches must be an integer > 0.')
+
+    if not isinstance(samples, int) or samples < 0:
+        raise ValueError('samples must be an integer of 0 or more.')
+
+    n = len(ts)
+    m = len(query)
+
+    if m // factor < 2:
+        raise ValueError('factor is too large for the query length.')
+
+    if exclusion_zone is None:
+        exclusion_zone = max(1, m // 2)
+
+    if padding is None:
+        padding = 2 * factor
+
+    # search the downsampled representation for candidate regions
+    ts_paa = mtscore.paa(ts, factor)
+    query_paa = mtscore.paa(query, factor)
+    approx = np.real(mts.mass2(ts_paa, query_paa))
+    approx[~np.isfinite(approx)] = np.inf
+
+    candidates = min(candidates, len(approx) - 1)
+    if candidates > 0:
+        starts = _top_k.top_k_motifs(
+            approx, candidates, max(1, exclusion_zone // factor))
+    else:
+        starts = [0]
+
+    # refine each candidate region with exact distances
+    found_indices = []
+    found_dists = []
+    for start in starts:
+        region_start = max(0, start * factor - padding)
+        region_stop = min(n, start * factor + m + padding)
+        region_start = max(0, min(region_start, region_stop - m))
+
+        dist = np.real(mts.mass2(ts[region_start:region_stop], query))
+        found_indices.append(np.arange(len(dist)) + region_start)
+        found_dists.append(dist)
+
+    found_indices = np.concatenate(found_indices)
+    found_dists = np.concatenate(found_dists)
+    found_dists[~np.isfinite(found_dists)] = np.inf
+    searched, unique_idx = np.unique(found_indices, return_index=True)
+
+    best_indices, best_dists = _top_k._greedy_select(
+        searched, found_dists[unique_idx], top_matches, exclusion_zone)
+
+    # estimate recall from distances sampled outside the searched regions
+    recall = 1.0
+    unsearched = (n - m + 1) - len(searched)
+    if samples > 0 and unsearched > 0 and len(best_dists) > 0:
+        rng = np.random.RandomState(random_state)
+        sample_idx = rng.randint(0, n - m + 1, size=samples)
+        sample_idx = sample_idx[~np.isin(sample_idx, searched)]
+
+        if len(sample_idx) > 0:
+            sample_dists = _sample_distances(ts, query, sample_idx)
+            better = np.mean(sample_dists < np.max(best_dists))
+            missed = better * unsearched
+            recall = len(best_dists) / (len(best_dists) + missed)
+
+    return (best_indices, best_dists, recall)
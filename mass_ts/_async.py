@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module contains all logic used for the asyncio versions of MASS2 and
+MASS2 batch. The work is offloaded to a shared executor so the event loop is
+never blocked. It requires Python 3.6 or newer.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import cpu_count
+
+import numpy as np
+
+import mass_ts as mts
+from mass_ts import core as mtscore
+from mass_ts import _mass2_batch
+
+
+_executor = None
+
+
+def set_executor(executor):
+    """
+    Sets the shared executor used by the asyncio functions. Passing None
+    restores the default thread pool.
+
+    Parameters
+    ----------
+    executor : concurrent.futures.Executor or None
+        The executor to offload work to.
+    """
+    global _executor
+    _executor = executor
+
+
+def get_executor():
+    """
+    Returns the shared executor used by the asyncio functions. A thread pool
+    with one worker per cpu is created on first use.
+    """
+    global _executor
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=cpu_count())
+
+    return _executor
+
+
+async def amass2(ts, query, normalize=True, corr_coef=False,
+                 return_type=None):
+    """
+    Compute the distance profile for the given query over the given time
+    series without blocking the event loop. See mass2 for details.
+
+    Parameters
+    ----------
+    ts : array_like
+        The array to create a rolling window on.
+    query : array_like
+        The query.
+    normalize : bool, default True
+        Compute the z-normalized Euclidean distance. When False the raw
+        Euclidean distance is computed.
+    corr_coef : bool, default False
+        Optionally return the Pearson correlation coef. instead of distances.
+    return_type : str ('squared', 'distance', 'correlation'), default None
+        Return the squared distances, the distances or the Pearson
+        correlation coef. When None it is derived from corr_coef.
+
+    Returns
+    -------
+    An array of distances.
+
+    Raises
+    ------
+    ValueError
+        If ts is not a list or np.array.
+        If query is not a list or np.array.
+        If ts or query is not one dimensional.
+        If return_type is not squared, distance or correlation.
+    """
+    loop = asyncio.get_event_loop()
+    func = functools.partial(
+        mts.mass2, ts, query, normalize=normalize, corr_coef=corr_coef,
+        return_type=return_type)
+
+    return await loop.run_in_executor(get_executor(), func)
+
+
+async def amass2_batch_iter(ts, query, batch_size, top_matches=3,
+                            max_pending=None, normalize=True,
+                            corr_coef=False, return_type=None):
+    """
+    Asynchronous iterator version of mass2_batch. The batches are computed in
+    the shared executor and the running top matches are yielded every time a
+    batch completes. Cancelling the consuming task or closing the iterator
+    cancels the batches that have not started yet.
+
+    Parameters
+    ----------
+    ts : array_like
+        The time series.
+    query : array_like
+        The query to search for.
+    batch_size : int
+        The partitioning size of the time series into batches.
+    top_matches : int, Default 3
+        The number of matches you would like to return.
+    max_pending : int, Default None
+        The maximum number of batches submitted to the executor at once. By
+        default it is the number of available cpus.
+    normalize : bool, Default True
+        Compute the z-normalized Euclidean distance. When False the raw
+        Euclidean distance is computed.
+    corr_coef : bool, Default False
+        Return the Pearson correlation coef. of the most correlated matches
+        instead of the distances of the closest matches.
+    return_type : str ('squared', 'distance', 'correlation'), Default None
+        Return the squared distances, the distances or the Pearson
+        correlation coef. of the matches. When None it is derived from
+        corr_coef.
+
+    Returns
+    -------
+    An async iterator of tuples (indices, distances, completed, total) where
+    completed is the number of finished batches out of total.
+
+    Raises
+    ------
+    ValueError
+        If ts is not a list or np.array.
+        If query is not a list or np.array.
+        If ts or query is not one dimensional.
+        If batch_size is not an integer.
+        If top_matches is < 1 or is not an integer.
+        If return_type is not squared, distance or correlation.
+    """
+    ts, query = mtscore.precheck_series_and_query(ts, query)
+    return_type = mtscore.check_return_type(return_type, corr_coef)
+    corr_coef = (return_type == 'correlation')
+
+    if not isinstance(batch_size, int):
+        raise ValueError('batch_size must be an integer.')
+
+    if not isinstance(top_matches, int) or top_matches < 1:
+        raise ValueError('top_matches must be an integer > 0.')
+
+    if max_pending is None:
+        max_pending = cpu_count()
+
+    loop = asyncio.get_event_loop()
+    executor = get_executor()
+    indices = list(range(0, len(ts) - batch_size + 1, batch_size))
+    jobs = _mass2_batch._batch_job_generator(
+        ts, query, indices, batch_size, normalize=normalize,
+        return_type=return_type)
+
+    # only the best matches so far are kept so selecting them stays
+    # proportional to top_matches instead of the number of batches done
+    best = []
+    completed = 0
+    pending = set()
+    exhausted = False
+    try:
+        while True:
+            # keep at most max_pending batches in the executor
+            while not exhausted and len(pending) < max_pending:
+                values = next(jobs, None)
+                if values is None:
+                    exhausted = True
+                else:
+                    pending.add(loop.run_in_executor(
+                        executor, _mass2_batch._min_subsequence_distance,
+                        values))
+
+            if not pending:
+                break
+
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                best.append(future.result())
+                completed += 1
+                best_indices, best_dists = _mass2_batch._top_matches(
+                    best, top_matches, corr_coef=corr_coef)
+                best = list(zip(best_indices, best_dists))
+
+                yield (best_indices, best_dists, completed, len(indices))
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+async def amass2_batch(ts, query, batch_size, top_matches=3, timeout=None,
+                       max_pending=None, normalize=True, corr_coef=False,
+                       return_type=None):
+    """
+    Compute mass2_batch without blocking the event loop. On timeout or
+    cancellation the batches that have not started yet are cancelled.
+
+    Parameters
+    ----------
+    ts : array_like
+        The time series.
+    query : array_like
+        The query to search for.
+    batch_size : int
+        The partitioning size of the time series into batches.
+    top_matches : int, Default 3
+        The number of matches you would like to return.
+    timeout : float, Default None
+        The maximum number of seconds to wait for the search.
+    max_pending : int, Default None
+        The maximum number of batches submitted to the executor at once. By
+        default it is the number of available cpus.
+    normalize : bool, Default True
+        Compute the z-normalized Euclidean distance. When False the raw
+        Euclidean distance is computed.
+    corr_coef : bool, Default False
+        Return the Pearson correlation coef. of the most correlated matches
+        instead of the distances of the closest matches.
+    return_type : str ('squared', 'distance', 'correlation'), Default None
+        Return the squared distances, the distances or the Pearson
+        correlation coef. of the matches. When None it is derived from
+        corr_coef.
+
+    Returns
+    -------
+    Tuple (indices, distances) - a tuple of np.arrays where the first index is
+    the indices and the second is the distances.
+
+    Raises
+    ------
+    ValueError
+        If ts is not a list or np.array.
+        If query is not a list or np.array.
+        If ts or query is not one dimensional.
+        If batch_size is not an integer.
+        If top_matches is < 1 or is not an integer.
+        If return_type is not squared, distance or correlation.
+    asyncio.TimeoutError
+        If the search does not finish within the timeout.
+    """
+    async def consume():
+        result = None
+        batches = amass2_batch_iter(
+            ts, query, batch_size, top_matches=top_matches,
+            max_pending=max_pending, normalize=normalize, corr_coef=corr_coef,
+            return_type=return_type)
+        try:
+            async for result in batches:
+                pass
+        finally:
+            await batches.aclose()
+
+        if result is None:
+            return (np.array([], dtype='int64'), np.array([]))
+
+        return result[:2]
+
+    return await asyncio.wait_for(consume(), timeout)
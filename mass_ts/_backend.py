@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module contains the array namespace abstraction the MASS2 kernel is
+written against. The same kernel runs on NumPy, CuPy or any library
+implementing the array API standard, such as array-api-strict, and the
+results can be kept on the device of the inputs.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+range = getattr(__builtins__, 'xrange', range)
+# end of py2 compatability boilerplate
+
+import importlib
+
+import numpy as np
+
+
+def _import_cupy():
+    """
+    Imports CuPy.
+
+    Raises
+    ------
+    ImportError
+        If CuPy is not installed.
+    """
+    try:
+        import cupy
+    except ImportError:
+        raise ImportError(
+            'GPU support will not work. You must pip install mass-ts[gpu].')
+
+    return cupy
+
+
+def get_namespace(backend=None, arrays=()):
+    """
+    Resolves the array namespace to compute with.
+
+    Parameters
+    ----------
+    backend : str or module, Default None
+        The namespace given as a module or the name of one, e.g. 'numpy',
+        'cupy' or 'array_api_strict'. By default the namespace of the first
+        array exposing one is used and NumPy otherwise.
+    arrays : tuple(array_like), Default ()
+        The arrays the namespace is inferred from.
+
+    Returns
+    -------
+    The array namespace module.
+
+    Raises
+    ------
+    ValueError
+        If the named backend can not be imported.
+    ImportError
+        If CuPy is requested but not installed.
+    """
+    if backend is None:
+        for a in arrays:
+            if type(a).__module__.split('.')[0] == 'cupy':
+                return _import_cupy()
+
+            if hasattr(a, '__array_namespace__'):
+                return a.__array_namespace__()
+
+        return np
+
+    if not isinstance(backend, str):
+        return backend
+
+    if backend.lower() == 'numpy':
+        return np
+
+    if backend.lower() == 'cupy':
+        return _import_cupy()
+
+    try:
+        return importlib.import_module(backend)
+    except ImportError:
+        raise ValueError('backend {} could not be imported.'.format(backend))
+
+
+def to_numpy(a, xp=np):
+    """
+    Copies an array of the given namespace into a NumPy array.
+    """
+    if xp is np:
+        return np.asarray(a)
+
+    if hasattr(xp, 'asnumpy'):
+        return xp.asnumpy(a)
+
+    if hasattr(a, '__dlpack__'):
+        return np.from_dlpack(a)
+
+    return np.asarray(a)
+
+
+def is_complex(a, xp=np):
+    """
+    Checks whether an array of the given namespace is complex.
+    """
+    if hasattr(xp, 'isdtype'):
+        return xp.isdtype(a.dtype, 'complex floating')
+
+    return np.iscomplexobj(a)
+
+
+def concat(arrays, xp=np):
+    """
+    Concatenates one dimensional arrays of the given namespace.
+    """
+    if hasattr(xp, 'concat'):
+        return xp.concat(arrays)
+
+    return xp.concatenate(arrays)
+
+
+def cumulative_sum(a, xp=np):
+    """
+    Computes the cumulative sum of a one dimensional array of the given
+    namespace with a leading zero.
+    """
+    if hasattr(xp, 'cumulative_sum'):
+        return xp.cumulative_sum(a, include_initial=True)
+
+    return concat([xp.zeros(1, dtype=a.dtype), xp.cumsum(a)], xp=xp)
+
+
+def moving_stats(x, m, xp=np):
+    """
+    Computes the moving mean, std. and sum of squares of the windows of a
+    time series with cumulative sums.
+
+    Parameters
+    ----------
+    x : array
+        The time series.
+    m : int
+        The window size.
+    xp : module, Default numpy
+        The array namespace of x.
+
+    Returns
+    -------
+    A dict with the meanx, sigmax and sumx2 arrays.
+    """
+    sums = cumulative_sum(x, xp=xp)
+    sums_sq = cumulative_sum(x * x, xp=xp)
+
+    seg_sum = sums[m:] - sums[:-m]
+    seg_sum_sq = sums_sq[m:] - sums_sq[:-m]
+    meanx = seg_sum / m
+    var = seg_sum_sq / m - meanx * meanx
+
+    return {
+        'meanx': meanx,
+        'sigmax': xp.sqrt(xp.where(var < 0, xp.zeros_like(var), var)),
+        'sumx2': seg_sum_sq,
+    }
+
+
+def sliding_dot_product(X, y, n, xp=np, Y=None):
+    """
+    Computes the dot products of the query with every window of a time series
+    from the real FFT of the time series.
+
+    Parameters
+    ----------
+    X : array
+        The real FFT of the time series.
+    y : array
+        The query.
+    n : int
+        The length of the time series.
+    xp : module, Default numpy
+        The array namespace of X and y.
+    Y : array, Default None
+        The precomputed real FFT of the reversed query padded with zeros to
+        n points.
+
+    Returns
+    -------
+    The n - m + 1 sliding dot products.
+    """
+    m = y.shape[0]
+    if Y is None:
+        y = concat([xp.flip(y), xp.zeros(n - m, dtype=y.dtype)], xp=xp)
+        Y = xp.fft.rfft(y)
+
+    z = xp.fft.irfft(X * Y, n=n)
+
+    return z[m - 1:n]
@@ -0,0 +1,617 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module contains all logic used for the persistent on-disk cache of time
+series spectra and rolling statistics. Cached arrays are stored as .npy files
+and loaded memory mapped so warm runs skip the precomputation. It also holds
+the in-memory cache of query statistics and spectra.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+range = getattr(__builtins__, 'xrange', range)
+# end of py2 compatability boilerplate
+
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+
+
+_cache = None
+
+
+class SeriesCache(object):
+    """
+    A least recently used cache of arrays derived from time series stored as
+    memory-mappable .npy files in a directory. Entries are keyed by a content
+    hash of the time series and the parameters used to derive the arrays.
+    The least recently used entries are removed once the total size of the
+    directory exceeds the size budget.
+
+    Parameters
+    ----------
+    directory : str
+        The directory to store the cached arrays in. It is created if it does
+        not exist.
+    max_bytes : int, Default 2 ** 30
+        The size budget of the cache in bytes.
+
+    Raises
+    ------
+    ValueError
+        If max_bytes is not an integer or is less than 1.
+    """
+
+    suffix = '.npy'
+
+    def __init__(self, directory, max_bytes=2 ** 30):
+        if not isinstance(max_bytes, int) or max_bytes < 1:
+            raise ValueError('max_bytes must be an integer > 0.')
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    @staticmethod
+    def digest(ts):
+        """
+        Computes the content hash of a time series.
+
+        Parameters
+        ----------
+        ts : np.array
+            The time series.
+
+        Returns
+        -------
+        The hex digest as a str.
+        """
+        ts = np.ascontiguousarray(ts)
+        sha = hashlib.sha1(str(ts.dtype).encode('utf-8'))
+        sha.update(ts.data)
+
+        return sha.hexdigest()
+
+    def _paths(self, key):
+        prefix = key + '.'
+        return [
+            os.path.join(self.directory, f)
+            for f in os.listdir(self.directory)
+            if f.startswith(prefix) and f.endswith(self.suffix)
+            and not f.endswith('.tmp' + self.suffix)
+        ]
+
+    def get(self, key):
+        """
+        Loads the arrays of a cache entry memory mapped.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry.
+
+        Returns
+        -------
+        A dict of array name to np.memmap or None if the entry is missing.
+        """
+        paths = self._paths(key)
+        if not paths:
+            return None
+
+        arrays = {}
+        now = time.time()
+        try:
+            for path in paths:
+                name = os.path.basename(path)[len(key) + 1:-len(self.suffix)]
+                arrays[name] = np.load(path, mmap_mode='r')
+                os.utime(path, (now, now))
+        except (IOError, OSError, ValueError):
+            return None
+
+        return arrays
+
+    def put(self, key, arrays):
+        """
+        Stores the arrays of a cache entry and evicts the least recently used
+        entries when the size budget is exceeded. Entries larger than the
+        size budget are not stored.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry.
+        arrays : dict
+            The array name to np.array mapping to store.
+        """
+        size = sum(np.asarray(a).nbytes for a in arrays.values())
+        if size > self.max_bytes:
+            return
+
+        for name, a in arrays.items():
+            path = os.path.join(self.directory, key + '.' + name)
+            tmp_path = path + '.tmp' + self.suffix
+
+            # write then rename so readers never see partial files
+            np.save(tmp_path, a)
+            os.rename(tmp_path, path + self.suffix)
+
+        self.evict()
+
+    def writer(self, key, name, shape, dtype):
+        """
+        Creates a memory mapped array that is filled incrementally and stored
+        as an entry once it is complete, so large derived arrays never need
+        to be held in memory.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry.
+        name : str
+            The name of the array.
+        shape : tuple(int)
+            The shape of the array.
+        dtype : str or np.dtype
+            The dtype of the array.
+
+        Returns
+        -------
+        A CacheWriter or None when the array exceeds the size budget.
+        """
+        if int(np.prod(shape)) * np.dtype(dtype).itemsize > self.max_bytes:
+            return None
+
+        path = os.path.join(self.directory, key + '.' + name)
+        tmp_path = '{}.{}.tmp{}'.format(path, os.getpid(), self.suffix)
+        array = np.lib.format.open_memmap(
+            tmp_path, mode='w+', dtype=dtype, shape=shape)
+
+        return CacheWriter(self, array, tmp_path, path + self.suffix)
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache is within its
+        size budget.
+        """
+        entries = {}
+        for f in os.listdir(self.directory):
+            if not f.endswith(self.suffix) or f.endswith('.tmp' + self.suffix):
+                continue
+
+            path = os.path.join(self.directory, f)
+            key = f.split('.', 1)[0]
+            stat = os.stat(path)
+            size, last_used, paths = entries.get(key, (0, 0, []))
+            entries[key] = (
+                size + stat.st_size, max(last_used, stat.st_mtime),
+                paths + [path]
+            )
+
+        total = sum(e[0] for e in entries.values())
+        for key, (size, last_used, paths) in sorted(
+                entries.items(), key=lambda e: e[1][1]):
+            if total <= self.max_bytes:
+                break
+
+            for path in paths:
+                os.remove(path)
+
+            total -= size
+
+    def clear(self):
+        """
+        Removes all entries from the cache.
+        """
+        for f in os.listdir(self.directory):
+            if f.endswith(self.suffix):
+                os.remove(os.path.join(self.directory, f))
+
+
+class CacheWriter(object):
+    """
+    A memory mapped array of a SeriesCache entry being filled. The array is
+    written to a temporary file which is renamed into the cache by commit
+    or removed by discard.
+
+    Parameters
+    ----------
+    cache : SeriesCache
+        The cache the entry belongs to.
+    array : np.memmap
+        The memory mapped array to fill.
+    tmp_path : str
+        The temporary file of the array.
+    path : str
+        The file of the completed entry.
+    """
+
+    def __init__(self, cache, array, tmp_path, path):
+        self.cache = cache
+        self.array = array
+        self.tmp_path = tmp_path
+        self.path = path
+
+    def __setitem__(self, key, value):
+        self.array[key] = value
+
+    def commit(self):
+        """
+        Stores the completed array as a cache entry.
+        """
+        self.array.flush()
+        self.array = None
+        os.rename(self.tmp_path, self.path)
+        self.cache.evict()
+
+    def discard(self):
+        """
+        Removes the incomplete array.
+        """
+        self.array = None
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def set_cache(directory, max_bytes=2 ** 30):
+    """
+    Enables the persistent on-disk cache of time series spectra and rolling
+    statistics used by mass2 and mass3. Passing None disables the cache.
+
+    Parameters
+    ----------
+    directory : str or None
+        The directory to store the cached arrays in.
+    max_bytes : int, Default 2 ** 30
+        The size budget of the cache in bytes.
+
+    Returns
+    -------
+    The SeriesCache or None when disabled.
+    """
+    global _cache
+
+    if directory is None:
+        _cache = None
+    else:
+        _cache = SeriesCache(directory, max_bytes=max_bytes)
+
+    return _cache
+
+
+def get_cache():
+    """
+    Returns the enabled SeriesCache or None when the cache is disabled.
+    """
+    return _cache
+
+
+def cached_arrays(digest, parts, compute, names=()):
+    """
+    Loads the arrays derived from a time series from the enabled cache or
+    computes and stores them when missing.
+
+    Parameters
+    ----------
+    digest : str or None
+        The content hash of the time series. The arrays are computed without
+        caching when None.
+    parts : tuple
+        The parameters used to derive the arrays.
+    compute : callable
+        Computes the arrays as a dict of array name to np.array.
+    names : tuple(str), Default ()
+        The array names an entry must contain to be used. Incomplete entries
+        are recomputed.
+
+    Returns
+    -------
+    A dict of array name to array.
+    """
+    cache = _cache
+    if cache is None or digest is None:
+        return compute()
+
+    key = '-'.join([digest] + [str(p) for p in parts])
+    arrays = cache.get(key)
+
+    if arrays is None or not set(names).issubset(arrays):
+        arrays = compute()
+        cache.put(key, arrays)
+
+    return arrays
+
+
+def cached_array_writer(digest, parts, name, shape, dtype):
+    """
+    Loads an array derived from a time series from the enabled cache or
+    creates a writer filling it incrementally when it is missing.
+
+    Parameters
+    ----------
+    digest : str or None
+        The content hash of the time series. Nothing is cached when None.
+    parts : tuple
+        The parameters used to derive the array.
+    name : str
+        The name of the array.
+    shape : tuple(int)
+        The shape of the array.
+    dtype : str or np.dtype
+        The dtype of the array.
+
+    Returns
+    -------
+    Tuple (array, writer) - the cached array or None and a CacheWriter to
+    fill when the array is missing and fits the size budget, otherwise None.
+    """
+    cache = _cache
+    if cache is None or digest is None:
+        return (None, None)
+
+    key = '-'.join([digest] + [str(p) for p in parts])
+    arrays = cache.get(key)
+    if arrays is not None and name in arrays:
+        return (arrays[name], None)
+
+    return (None, cache.writer(key, name, shape, dtype))
+
+
+def series_digest(ts):
+    """
+    Computes the content hash of a time series when the cache is enabled.
+
+    Parameters
+    ----------
+    ts : np.array
+        The time series.
+
+    Returns
+    -------
+    The hex digest or None when the cache is disabled.
+    """
+    if _cache is None:
+        return None
+
+    return SeriesCache.digest(ts)
+
+
+class QueryCache(object):
+    """
+    A thread safe least recently used in-memory cache of arrays derived from
+    queries, such as their statistics and reversed padded spectra. Entries
+    are keyed by a content hash of the query and the parameters used to
+    derive the arrays, e.g. the FFT length. The least recently used entries
+    are evicted once the total size of the arrays exceeds the size budget.
+
+    The mass2 entries hold the real FFT of the query padded to the series
+    length, about 8 bytes per point of the series, so a series of 2 ** 20
+    points takes 8 MiB per query. Size the budget for the number of queries
+    searched repeatedly times 8 bytes per point.
+
+    Parameters
+    ----------
+    max_bytes : int, Default 2 ** 26
+        The size budget of the cache in bytes.
+
+    Raises
+    ------
+    ValueError
+        If max_bytes is not an integer or is less than 1.
+    """
+
+    def __init__(self, max_bytes=2 ** 26):
+        if not isinstance(max_bytes, int) or max_bytes < 1:
+            raise ValueError('max_bytes must be an integer > 0.')
+
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key):
+        """
+        Returns the arrays of a cache entry and marks it as recently used.
+
+        Parameters
+        ----------
+        key : tuple
+            The key of the entry.
+
+        Returns
+        -------
+        A dict of array name to read only np.array or None if the entry is
+        missing.
+        """
+        with self._lock:
+            arrays = self._entries.get(key)
+            if arrays is None:
+                self.misses += 1
+                return None
+
+            # re-inserted as the most recently used, py2 has no move_to_end
+            self._entries[key] = self._entries.pop(key)
+            self.hits += 1
+
+            return arrays
+
+    def put(self, key, arrays, copy=True):
+        """
+        Stores the arrays of a cache entry read only and evicts the least
+        recently used entries when the size budget is exceeded. Entries
+        larger than the size budget are not stored.
+
+        Parameters
+        ----------
+        key : tuple
+            The key of the entry.
+        arrays : dict
+            The array name to np.array mapping to store.
+        copy : bool, Default True
+            Store copies of the arrays. When False the arrays themselves are
+            stored and made read only, which suits arrays that were just
+            computed and are not shared.
+        """
+        convert = np.array if copy else np.asarray
+        arrays = dict((name, convert(a)) for name, a in arrays.items())
+        size = sum(a.nbytes for a in arrays.values())
+        if size > self.max_bytes:
+            return
+
+        for a in arrays.values():
+            a.flags.writeable = False
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= sum(a.nbytes for a in previous.values())
+
+            self._entries[key] = arrays
+            self.nbytes += size
+
+            while self.nbytes > self.max_bytes:
+                oldest, evicted = self._entries.popitem(last=False)
+                self.nbytes -= sum(a.nbytes for a in evicted.values())
+                self.evictions += 1
+
+    def stats(self):
+        """
+        Returns the hit and miss statistics of the cache.
+
+        Returns
+        -------
+        A dict with the hits, misses, hit_rate, evictions, entries, nbytes
+        and max_bytes.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'nbytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+            }
+
+    def clear(self):
+        """
+        Removes all entries from the cache and resets the statistics.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+
+_query_cache = QueryCache()
+
+
+def set_query_cache(max_bytes=2 ** 26):
+    """
+    Replaces the in-memory cache of query statistics and spectra used by
+    mass2, mass3 and mass2_batch. It is enabled with a 64 MiB budget by
+    default. Passing None disables the cache. A mass2 entry takes about
+    8 bytes per point of the series, see QueryCache.
+
+    Parameters
+    ----------
+    max_bytes : int or None, Default 2 ** 26
+        The size budget of the cache in bytes.
+
+    Returns
+    -------
+    The QueryCache or None when disabled.
+    """
+    global _query_cache
+
+    if max_bytes is None:
+        _query_cache = None
+    else:
+        _query_cache = QueryCache(max_bytes=max_bytes)
+
+    return _query_cache
+
+
+def get_query_cache():
+    """
+    Returns the enabled QueryCache or None when the cache is disabled.
+    """
+    return _query_cache
+
+
+def is_query_cached(query, parts):
+    """
+    Checks whether the arrays derived from a query are in the enabled query
+    cache without counting a hit or miss.
+
+    Parameters
+    ----------
+    query : np.array
+        The query.
+    parts : tuple
+        The parameters used to derive the arrays.
+
+    Returns
+    -------
+    True when the entry is cached.
+    """
+    cache = _query_cache
+    if cache is None:
+        return False
+
+    return ((SeriesCache.digest(query),) + tuple(parts)) in cache
+
+
+def cached_query_arrays(query, parts, compute):
+    """
+    Loads the arrays derived from a query from the enabled query cache or
+    computes and stores them when missing.
+
+    Parameters
+    ----------
+    query : np.array
+        The query.
+    parts : tuple
+        The parameters used to derive the arrays.
+    compute : callable
+        Computes the arrays as a dict of array name to np.array.
+
+    Returns
+    -------
+    A dict of array name to array.
+    """
+    cache = _query_cache
+    if cache is None:
+        return compute()
+
+    key = (SeriesCache.digest(query),) + tuple(parts)
+    arrays = cache.get(key)
+
+    # the computed arrays are not shared so they are stored without copying
+    if arrays is None:
+        arrays = compute()
+        cache.put(key, arrays, copy=False)
+
+    return arrays
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module contains all logic used for the DRAG discord discovery. A range
+threshold candidate selection phase prunes most subsequences and the few
+remaining candidates are refined with exact MASS distance profiles.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+range = getattr(__builtins__, 'xrange', range)
+# end of py2 compatability boilerplate
+
+import numpy as np
+
+from mass_ts import core as mtscore
+from mass_ts import _top_k
+
+
+def _normalized_window(ts, i, m, mean, std):
+    """
+    Returns the z-normalized subsequence starting at index i. Constant
+    subsequences are normalized to zeros.
+    """
+    return (ts[i:i + m] - mean[i]) / std[i]
+
+
+def _select_candidates(ts, m, r, exclusion_zone, mean, std):
+    """
+    DRAG phase 1. Scans the subsequences once and keeps a subsequence as a
+    candidate discord until a later non-trivial subsequence within distance
+    r of it is found. Every subsequence whose nearest neighbor distance is at
+    least r survives this phase.
+
+    Parameters
+    ----------
+    ts : np.array
+        The time series.
+    m : int
+        The subsequence length.
+    r : float
+        The range threshold.
+    exclusion_zone : int
+        Subsequences closer than this are trivial matches.
+    mean : np.array
+        The moving mean of the time series.
+    std : np.array
+        The moving std. of the time series with zeros replaced by ones.
+
+    Returns
+    -------
+    An array of candidate starting indices.
+    """
+    windows = len(ts) - m + 1
+    threshold = r ** 2
+    indices = np.zeros(windows, dtype='int64')
+    normalized = np.zeros((min(windows, 1024), m))
+    count = 0
+
+    for i in range(windows):
+        w = _normalized_window(ts, i, m, mean, std)
+
+        if count > 0:
+            dist = 2 * (m - np.dot(normalized[:count], w))
+            close = (dist < threshold) & \
+                (i - indices[:count] >= exclusion_zone)
+
+            if close.any():
+                keep = ~close
+                remaining = np.count_nonzero(keep)
+                indices[:remaining] = indices[:count][keep]
+                normalized[:remaining] = normalized[:count][keep]
+                count = remaining
+                continue
+
+        if count == len(normalized):
+            grown = np.zeros((2 * count, m))
+            grown[:count] = normalized
+            normalized = grown
+
+        indices[count] = i
+        normalized[count] = w
+        count += 1
+
+    return indices[:count].copy()
+
+
+def _refine_candidates(ts, m, candidates, exclusion_zone, mean, std,
+                       chunk_size=32):
+    """
+    DRAG phase 2. Computes the exact nearest neighbor distance of every
+    candidate with batched MASS distance profiles.
+
+    Parameters
+    ----------
+    ts : np.array
+        The time series.
+    m : int
+        The subsequence length.
+    candidates : np.array
+        The candidate starting indices.
+    exclusion_zone : int
+        Subsequences closer than this are trivial matches.
+    mean : np.array
+        The moving mean of the time series.
+    std : np.array
+        The moving std. of the time series with zeros replaced by ones.
+    chunk_size : int, Default 32
+        The number of candidates searched in one batched FFT.
+
+    Returns
+    -------
+    An array of nearest neighbor distances, one per candidate.
+    """
+    n = len(ts)
+    windows = n - m + 1
+    X = np.fft.rfft(ts)
+    positions = np.arange(windows)
+    nn_dists = np.zeros(len(candidates))
+
+    for start in range(0, len(candidates), chunk_size):
+        chunk = candidates[start:start + chunk_size]
+        queries = np.array([
+            _normalized_window(ts, c, m, mean, std) for c in chunk
+        ])
+
+        Y = np.fft.rfft(queries[:, ::-1], n, axis=1)
+        z = np.fft.irfft(X * Y, n, axis=1)[:, m - 1:n]
+
+        dist = 2 * (m - z / std)
+        trivial = np.abs(positions - chunk[:, np.newaxis]) < exclusion_zone
+        dist[trivial] = np.inf
+
+        nn_dists[start:start + chunk_size] = np.sqrt(
+            np.maximum(dist.min(axis=1), 0))
+
+    return nn_dists
+
+
+def drag_discords(ts, m, k=1, r=None, exclusion_zone=None):
+    """
+    Finds the top k time series discords, the subsequences farthest from
+    their nearest non-trivial neighbor under z-normalized Euclidean distance,
+    with the DRAG algorithm. A range threshold candidate selection phase
+    prunes every subsequence that has a neighbor within r and the remaining
+    candidates are refined with exact MASS distance profiles. This avoids
+    computing the full matrix profile. When r is not given it starts at the
+    largest possible distance and is halved until k discords are found.
+
+    Parameters
+    ----------
+    ts : array_like
+        The time series.
+    m : int
+        The subsequence length.
+    k : int, Default 1
+        The number of discords you want returned.
+    r : float, Default None
+        The range threshold. Only subsequences whose nearest neighbor is at
+        least r away are reported.
+    exclusion_zone : int, Default None
+        Subsequences closer than this are trivial matches and discords are
+        at least this far apart. By default it is m.
+
+    Returns
+    -------
+    Tuple (indices, distances) - the starting indices of the discords and
+    their nearest neighbor distances sorted by distance in descending order.
+    Fewer than k discords are returned when r is given and too large.
+
+    Raises
+    ------
+    ValueError
+        If ts is not a list or np.array.
+        If ts is not one dimensional.
+        If m is not an integer, is less than 2 or larger than half the ts.
+        If k is not an integer or is less than 1.
+        If r is not positive.
+    """
+    try:
+        ts = mtscore.to_np_array(ts).astype('float64')
+    except ValueError:
+        raise ValueError('Invalid ts value given. Must be array_like!')
+
+    if not mtscore.is_one_dimensional(ts):
+        raise ValueError('ts must be one dimensional!')
+
+    if not isinstance(m, int) or m < 2 or 2 * m > len(ts):
+        raise ValueError(
+            'm must be an integer between 2 and half of the ts length.')
+
+    if not isinstance(k, int) or k < 1:
+        raise ValueError('k must be an integer of 1 or more.')
+
+    if r is not None and r <= 0:
+        raise ValueError('r must be positive.')
+
+    if exclusion_zone is None:
+        exclusion_zone = m
+
+    mean, std = mtscore.moving_mean_std(ts, m)
+    std[std == 0] = 1
+
+    search_ranges = [r] if r is not None else \
+        [2 * np.sqrt(m) * 0.5 ** i for i in range(1, 40)]
+
+    for r in search_ranges:
+        candidates = _select_candidates(ts, m, r, exclusion_zone, mean, std)
+        nn_dists = _refine_candidates(
+            ts, m, candidates, exclusion_zone, mean, std)
+
+        found = np.isfinite(nn_dists) & (nn_dists >= r)
+        indices, dists = _top_k._greedy_select(
+            candidates[found], -nn_dists[found], k, exclusion_zone)
+
+        if len(indices) >= k:
+            break
+
+    return (indices, -dists)
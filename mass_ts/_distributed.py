@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module contains all logic used for the distributed search. The time
+series is split into shards overlapping by max_query_length - 1 points. Every
+shard is searched by a worker process reachable over a
+multiprocessing.connection socket, or by tasks submitted to a pluggable
+executor, and the candidate matches are merged centrally.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+range = getattr(__builtins__, 'xrange', range)
+# end of py2 compatability boilerplate
+
+import multiprocessing
+import os
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+import mass_ts as mts
+from mass_ts import core as mtscore
+from mass_ts import _top_k
+from mass_ts._index import MassIndex
+
+
+def _shard_bounds(n, shards, overlap):
+    """
+    Splits n points into shards. Each shard owns a contiguous range of window
+    starting indices and holds the overlap points following it so every
+    window it owns is complete. The last shard owns every trailing window, so
+    queries shorter than overlap + 1 points are searched up to the end.
+
+    Returns
+    -------
+    A list of tuples (start, stop, windows) where start to stop are the
+    points of the shard and windows the number of windows it owns, None for
+    the last shard.
+    """
+    windows = n - overlap
+    size = -(-windows // shards)
+    bounds = []
+
+    for start in range(0, windows, size):
+        owned = min(size, windows - start)
+        bounds.append((start, start + owned + overlap, owned))
+
+    start, stop, owned = bounds[-1]
+    bounds[-1] = (start, stop, None)
+
+    return bounds
+
+
+def _top_k_shard(dist, offset, windows, k, exclusion_zone):
+    """
+    Selects the candidates of the windows owned by a shard that greedy
+    selection of the top k matches could examine. Selecting the top k per
+    shard before merging would not be exact near the shard boundaries.
+    """
+    dist = np.real(dist[:windows])
+
+    return _top_k._greedy_candidates(
+        np.arange(len(dist)) + offset, dist, k, exclusion_zone)
+
+
+def _search_shard(shard, offset, windows, query, k, exclusion_zone,
+                  normalize=True):
+    """
+    Searches one shard with MASS2. It is the task submitted to executors.
+
+    Returns
+    -------
+    Tuple (indices, distances) of the candidate matches.
+    """
+    dist = mts.mass2(shard, query, normalize=normalize)
+
+    return _top_k_shard(dist, offset, windows, k, exclusion_zone)
+
+
+def _merge(partials, k, exclusion_zone):
+    """
+    Selects the top k matches from the candidates of every shard.
+    """
+    indices = np.concatenate([p[0] for p in partials])
+    dists = np.concatenate([p[1] for p in partials])
+
+    return _top_k._greedy_select(indices, dists, k, exclusion_zone)
+
+
+def serve_worker(address, authkey, ready=None):
+    """
+    Runs a search worker until it receives a shutdown message. The worker
+    accepts one connection at a time. A client loads a shard into a local
+    MassIndex and then searches it any number of times.
+
+    The messages are tuples sent with multiprocessing.connection:
+
+        ('load', shard, offset, windows, max_query_length) -> ('ok', None)
+        ('search', query, k, exclusion_zone, normalize) ->
+            ('ok', (indices, distances))
+        ('close',) ends the connection.
+        ('shutdown',) ends the connection and stops the worker.
+
+    Failures are answered with ('error', message). The messages are pickled,
+    so the authkey must be kept secret from anyone who should not run code on
+    the worker.
+
+    Parameters
+    ----------
+    address : tuple(str, int) or str
+        The address to listen on. Port 0 picks a free port.
+    authkey : bytes
+        The secret key clients must authenticate with.
+    ready : multiprocessing.Queue, Default None
+        Receives the address listened on once the worker accepts connections.
+
+    Raises
+    ------
+    ValueError
+        If authkey is empty.
+    """
+    if not authkey:
+        raise ValueError('authkey must be given.')
+
+    listener = Listener(address, authkey=authkey)
+    if ready is not None:
+        ready.put(listener.address)
+
+    running = True
+    try:
+        while running:
+            conn = listener.accept()
+            index = None
+
+            try:
+                while True:
+                    try:
+                        message = conn.recv()
+                    except EOFError:
+                        break
+
+                    if message[0] == 'close':
+                        break
+
+                    if message[0] == 'shutdown':
+                        running = False
+                        break
+
+                    try:
+                        if message[0] == 'load':
+                            shard, offset, windows, max_query_length = \
+                                message[1:]
+                            index = MassIndex(
+                                shard, max_query_length=max_query_length)
+                            result = None
+                        elif message[0] == 'search':
+                            query, k, exclusion_zone, normalize = message[1:]
+                            if index is None:
+                                raise ValueError('no shard is loaded.')
+
+                            dist = index.search(query, normalize=normalize)
+                            result = _top_k_shard(
+                                dist, offset, windows, k, exclusion_zone)
+                        else:
+                            raise ValueError(
+                                'unknown message {}.'.format(message[0]))
+
+                        conn.send(('ok', result))
+                    except Exception as e:
+                        conn.send(('error', str(e)))
+            finally:
+                conn.close()
+    finally:
+        listener.close()
+
+
+def start_local_workers(n, authkey=None, host='localhost'):
+    """
+    Starts search workers in local processes. It is a stand in for workers
+    running on other nodes.
+
+    Parameters
+    ----------
+    n : int
+        The number of workers.
+    authkey : bytes, Default None
+        The secret key clients must authenticate with. By default a random
+        key is generated.
+    host : str, Default 'localhost'
+        The host the workers listen on.
+
+    Returns
+    -------
+    Tuple (processes, addresses, authkey) of the worker processes, their
+    addresses and the key to authenticate with.
+    """
+    if authkey is None:
+        authkey = os.urandom(32)
+
+    ready = multiprocessing.Queue()
+    processes = []
+
+    for i in range(n):
+        process = multiprocessing.Process(
+            target=serve_worker, args=((host, 0), authkey, ready))
+        process.daemon = True
+        process.start()
+        processes.append(process)
+
+    addresses = [ready.get(timeout=30) for i in range(n)]
+
+    return (processes, addresses, authkey)
+
+
+class DistributedIndex(object):
+    """
+    Searches a time series split into shards that overlap by
+    max_query_length - 1 points. The shards are loaded into socket workers,
+    started with serve_worker on any node, or searched by tasks submitted to
+    a concurrent.futures style executor such as a Dask client. Each shard
+    returns its candidate matches which are merged centrally.
+
+    Parameters
+    ----------
+    ts : array_like
+        The time series.
+    workers : list(address), Default None
+        The addresses of running workers. One shard is loaded into each.
+    executor : concurrent.futures.Executor, Default None
+        An executor with a submit method used when no workers are given.
+    shards : int, Default None
+        The number of shards searched with the executor. By default it is the
+        number of available cpus.
+    max_query_length : int, Default 1024
+        The longest query that can be searched.
+    authkey : bytes, Default None
+        The secret key used to authenticate with the workers. It is required
+        when workers are given.
+
+    Raises
+    ------
+    ValueError
+        If ts is not a list or np.array.
+        If ts is not one dimensional.
+        If neither workers nor executor are given.
+        If workers are given without an authkey.
+        If max_query_length is not an integer or is less than 2.
+        If a shard is not longer than max_query_length.
+    """
+
+    def __init__(self, ts, workers=None, executor=None, shards=None,
+                 max_query_length=1024, authkey=None):
+        try:
+            ts = mtscore.to_np_array(ts)
+        except ValueError:
+            raise ValueError('Invalid ts value given. Must be array_like!')
+
+        if not mtscore.is_one_dimensional(ts):
+            raise ValueError('ts must be one dimensional!')
+
+        if not workers and executor is None:
+            raise ValueError('workers or an executor must be given.')
+
+        if workers and not authkey:
+            raise ValueError('authkey must be given with workers.')
+
+        if not isinstance(max_query_length, int) or max_query_length < 2:
+            raise ValueError(
+                'max_query_length must be an integer of 2 or more.')
+
+        if workers:
+            shards = len(workers)
+        elif shards is None:
+            shards = multiprocessing.cpu_count()
+
+        overlap = max_query_length - 1
+        if len(ts) - overlap < shards:
+            raise ValueError(
+                'each shard must be longer than max_query_length.')
+
+        self.ts = ts
+        self.max_query_length = max_query_length
+        self.executor = executor
+        self.bounds = _shard_bounds(len(ts), shards, overlap)
+        self._connections = []
+
+        for address, (start, stop, windows) in zip(workers or [], self.bounds):
+            conn = Client(address, authkey=authkey)
+            self._connections.append(conn)
+            conn.send(('load', ts[start:stop], start, windows,
+                       max_query_length))
+
+        for conn in self._connections:
+            self._receive(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _receive(self, conn):
+        status, result = conn.recv()
+        if status == 'error':
+            raise ValueError(result)
+
+        return result
+
+    def search(self, query, top_matches=3, exclusion_zone=None,
+               normalize=True):
+        """
+        Finds the top matches of the query over all shards.
+
+        Parameters
+        ----------
+        query : array_like
+            The query.
+        top_matches : int, Default 3
+            The number of matches you would like to return.
+        exclusion_zone : int, Default None
+            The minimum distance between matches. By default it is half the
+            query length.
+        normalize : bool, Default True
+            Compute the z-normalized Euclidean distance. When False the raw
+            Euclidean distance is computed.
+
+        Returns
+        -------
+        Tuple (indices, distances) sorted by distance.
+
+        Raises
+        ------
+        ValueError
+            If query is not a list or np.array.
+            If query is not one dimensional.
+            If query is longer than max_query_length.
+            If top_matches is < 1 or is not an integer.
+        """
+        try:
+            query = mtscore.to_np_array(query)
+        except ValueError:
+            raise ValueError('Invalid query value given. Must be array_like!')
+
+        if not mtscore.is_one_dimensional(query):
+            raise ValueError('query must be one dimensional!')
+
+        if len(query) > self.max_query_length:
+            raise ValueError('query must not be longer than max_query_length.')
+
+        if not isinstance(top_matches, int) or top_matches < 1:
+            raise ValueError('top_matches must be an integer > 0.')
+
+        if exclusion_zone is None:
+            exclusion_zone = max(1, len(query) // 2)
+
+        if self._connections:
+            # send to every worker first so the shards are searched in parallel
+            for conn in self._connections:
+                conn.send(
+                    ('search', query, top_matches, exclusion_zone, normalize))
+
+            partials = [self._receive(conn) for conn in self._connections]
+        else:
+            futures = [
+                self.executor.submit(
+                    _search_shard, self.ts[start:stop], start, windows, query,
+                    top_matches, exclusion_zone, normalize)
+                for start, stop, windows in self.bounds
+            ]
+            partials = [future.result() for future in futures]
+
+        return _merge(partials, top_matches, exclusion_zone)
+
+    def close(self, shutdown=False):
+        """
+        Closes the worker connections.
+
+        Parameters
+        ----------
+        shutdown : bool, Default False
+            Also stop the workers.
+        """
+        for conn in self._connections:
+            try:
+                conn.send(('shutdown',) if shutdown else ('close',))
+            finally:
+                conn.close()
+
+        self._connections = []
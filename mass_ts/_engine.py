@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module contains all logic used for the in-process search engine that
+coalesces concurrent queries over the same time series into batched FFT
+passes.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+range = getattr(__builtins__, 'xrange', range)
+# end of py2 compatability boilerplate
+
+from concurrent.futures import Future
+import threading
+import time
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+import numpy as np
+
+from mass_ts import core as mtscore
+
+
+_STOP = object()
+
+
+class SearchEngine(object):
+    """
+    A search engine wrapping one time series. Queries submitted from any
+    number of threads are queued for up to max_wait seconds, queries of the
+    same length are coalesced into a single batched FFT pass and the distance
+    profiles are fanned back out to the callers. The spectrum and cumulative
+    sums of the time series are computed once when the engine is created.
+
+    Parameters
+    ----------
+    ts : array_like
+        The time series to search.
+    max_batch_size : int, Default 32
+        The maximum number of queries computed in one batched FFT pass.
+    max_wait : float, Default 0.005
+        The maximum number of seconds a query waits for others to coalesce
+        with.
+    normalize : bool, Default True
+        Compute the z-normalized Euclidean distance. When False the raw
+        Euclidean distance is computed.
+
+    Raises
+    ------
+    ValueError
+        If ts is not a list or np.array.
+        If ts is not one dimensional.
+        If max_batch_size is not an integer or is less than 1.
+        If max_wait is negative.
+    """
+
+    def __init__(self, ts, max_batch_size=32, max_wait=0.005, normalize=True):
+        try:
+            ts = mtscore.to_np_array(ts)
+        except ValueError:
+            raise ValueError('Invalid ts value given. Must be array_like!')
+
+        if not mtscore.is_one_dimensional(ts):
+            raise ValueError('ts must be one dimensional!')
+
+        if not isinstance(max_batch_size, int) or max_batch_size < 1:
+            raise ValueError('max_batch_size must be an integer > 0.')
+
+        if max_wait < 0:
+            raise ValueError('max_wait must be 0 or more.')
+
+        self.ts = ts
+        self.n = len(ts)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.normalize = normalize
+
+        self._X = np.fft.rfft(ts)
+        self._sums = mtscore.cumulative_sums(ts)
+        self._stats = {}
+        self._queue = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run)
+        self._worker.daemon = True
+        self._worker.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def submit(self, query):
+        """
+        Queues a query for the next batch.
+
+        Parameters
+        ----------
+        query : array_like
+            The query.
+
+        Returns
+        -------
+        A concurrent.futures.Future resolving to the distance profile.
+
+        Raises
+        ------
+        ValueError
+            If query is not a list or np.array.
+            If query is not one dimensional or is longer than the ts.
+            If the engine is closed.
+        """
+        try:
+            query = mtscore.to_np_array(query)
+        except ValueError:
+            raise ValueError('Invalid query value given. Must be array_like!')
+
+        if not mtscore.is_one_dimensional(query):
+            raise ValueError('query must be one dimensional!')
+
+        if len(query) > self.n:
+            raise ValueError('query must not be longer than the ts.')
+
+        future = Future()
+
+        # checked and queued under the lock so no query lands behind _STOP
+        with self._lock:
+            if self._closed:
+                raise ValueError('the search engine is closed.')
+
+            self._queue.put((query.astype('float64'), future))
+
+        return future
+
+    def search(self, query, timeout=None):
+        """
+        Computes the distance profile of a query, possibly coalesced with
+        queries submitted concurrently from other threads.
+
+        Parameters
+        ----------
+        query : array_like
+            The query.
+        timeout : float, Default None
+            The maximum number of seconds to wait for the result.
+
+        Returns
+        -------
+        An array of distances.
+        """
+        return self.submit(query).result(timeout=timeout)
+
+    def close(self):
+        """
+        Stops the engine after the queued queries are computed.
+        """
+        with self._lock:
+            if self._closed:
+                return
+
+            self._closed = True
+            self._queue.put(_STOP)
+
+        self._worker.join()
+
+    def _window_stats(self, m):
+        if m not in self._stats:
+            meanx, sigmax = mtscore.moving_mean_std(
+                self.ts, m, sums=self._sums)
+            sums_sq = self._sums[1]
+            self._stats[m] = (meanx, sigmax, sums_sq[m:] - sums_sq[:-m])
+
+        return self._stats[m]
+
+    def _compute(self, queries):
+        """
+        Computes the distance profiles of queries sharing the same length in
+        one batched FFT pass.
+
+        Parameters
+        ----------
+        queries : np.array
+            A two dimensional array with one query per row.
+
+        Returns
+        -------
+        A two dimensional array with one distance profile per row.
+        """
+        n = self.n
+        m = queries.shape[1]
+        meanx, sigmax, sumx2 = self._window_stats(m)
+
+        Y = np.fft.rfft(queries[:, ::-1], n, axis=1)
+        z = np.fft.irfft(self._X * Y, n, axis=1)[:, m - 1:n]
+
+        if self.normalize:
+            meany = queries.mean(axis=1)[:, np.newaxis]
+            sigmay = queries.std(axis=1)[:, np.newaxis]
+            dist = 2 * (m - (z - m * meanx * meany) / (sigmax * sigmay))
+        else:
+            sumy2 = np.sum(queries ** 2, axis=1)[:, np.newaxis]
+            dist = sumx2 - 2 * z + sumy2
+
+        return np.sqrt(np.maximum(dist, 0))
+
+    def _collect(self):
+        """
+        Blocks for the next query and collects others arriving within
+        max_wait seconds up to max_batch_size queries.
+        """
+        batch = [self._queue.get()]
+        deadline = time.time() + self.max_wait
+
+        while batch[-1] is not _STOP and len(batch) < self.max_batch_size:
+            remaining = deadline - time.time()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch = self._collect()
+            if batch[-1] is _STOP:
+                stop = True
+                batch = batch[:-1]
+
+            groups = {}
+            for query, future in batch:
+                if future.set_running_or_notify_cancel():
+                    groups.setdefault(len(query), []).append((query, future))
+
+            for m, requests in groups.items():
+                try:
+                    dists = self._compute(np.array([q for q, f in requests]))
+                except Exception as e:
+                    for query, future in requests:
+                        future.set_exception(e)
+                    continue
+
+                for (query, future), dist in zip(requests, dists):
+                    future.set_result(dist)
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module contains all logic used for the incrementally updatable MASS
+index. The time series is partitioned into blocks whose spectra are kept so
+appending to or editing the time series only recomputes the affected blocks.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+range = getattr(__builtins__, 'xrange', range)
+# end of py2 compatability boilerplate
+
+import numpy as np
+
+from mass_ts import core as mtscore
+
+
+class MassIndex(object):
+    """
+    A MASS index over a time series that supports appending values and
+    editing ranges in place. The time series is partitioned into blocks of
+    block_size points and the zero padded spectrum of every block is stored.
+    Searches combine the block spectra with the query spectrum and overlap-add
+    the block results, similar to the pieces of MASS3. Appends and edits only
+    recompute the spectra of the blocks they touch and the cumulative sums
+    from the first changed point.
+
+    Parameters
+    ----------
+    ts : array_like
+        The initial time series. It may be empty.
+    block_size : int, Default 4096
+        The number of points in one block.
+    max_query_length : int, Default None
+        The longest query that can be searched. By default it is block_size.
+
+    Raises
+    ------
+    ValueError
+        If ts is not a list or np.array.
+        If ts is not one dimensional.
+        If block_size is not an integer or is less than 2.
+        If max_query_length is not an integer or is less than 2.
+    """
+
+    def __init__(self, ts, block_size=4096, max_query_length=None):
+        try:
+            ts = mtscore.to_np_array(ts)
+        except ValueError:
+            raise ValueError('Invalid ts value given. Must be array_like!')
+
+        if not mtscore.is_one_dimensional(ts):
+            raise ValueError('ts must be one dimensional!')
+
+        if not isinstance(block_size, int) or block_size < 2:
+            raise ValueError('block_size must be an integer of 2 or more.')
+
+        if max_query_length is None:
+            max_query_length = block_size
+
+        if not isinstance(max_query_length, int) or max_query_length < 2:
+            raise ValueError(
+                'max_query_length must be an integer of 2 or more.')
+
+        self.block_size = block_size
+        self.max_query_length = max_query_length
+        self.nfft = 1 << int(block_size + max_query_length - 2).bit_length()
+        self.n = 0
+
+        self._data = np.zeros(0)
+        self._sums = np.zeros(1)
+        self._sums_sq = np.zeros(1)
+        self._spectra = np.zeros((0, self.nfft // 2 + 1), dtype='complex128')
+
+        self.append(ts)
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def ts(self):
+        """
+        A read only view of the indexed time series.
+        """
+        view = self._data[:self.n]
+        view.flags.writeable = False
+
+        return view
+
+    @property
+    def n_blocks(self):
+        """
+        The number of blocks covering the time series.
+        """
+        return -(-self.n // self.block_size)
+
+    def _reserve(self, n):
+        """
+        Grows the storage geometrically to hold at least n points.
+        """
+        capacity = len(self._data)
+        if n <= capacity:
+            return
+
+        capacity = max(n, 2 * capacity, self.block_size)
+        blocks = -(-capacity // self.block_size)
+        capacity = blocks * self.block_size
+
+        data = np.zeros(capacity)
+        data[:self.n] = self._data[:self.n]
+        self._data = data
+
+        for name in ('_sums', '_sums_sq'):
+            sums = np.zeros(capacity + 1)
+            sums[:self.n + 1] = getattr(self, name)[:self.n + 1]
+            setattr(self, name, sums)
+
+        spectra = np.zeros(
+            (blocks, self._spectra.shape[1]), dtype='complex128')
+        spectra[:len(self._spectra)] = self._spectra
+        self._spectra = spectra
+
+    def _refresh(self, start, stop):
+        """
+        Recomputes the cumulative sums from start and the spectra of the
+        blocks covering start to stop.
+        """
+        n = self.n
+        values = self._data[start:n]
+        self._sums[start + 1:n + 1] = self._sums[start] + np.cumsum(values)
+        self._sums_sq[start + 1:n + 1] = \
+            self._sums_sq[start] + np.cumsum(values ** 2)
+
+        B = self.block_size
+        first = start // B
+        last = -(-stop // B)
+        blocks = self._data[first * B:last * B].reshape(-1, B)
+        self._spectra[first:last] = np.fft.rfft(blocks, self.nfft, axis=1)
+
+    def append(self, values):
+        """
+        Appends values to the end of the time series.
+
+        Parameters
+        ----------
+        values : array_like
+            The values to append.
+
+        Raises
+        ------
+        ValueError
+            If values is not a list or np.array.
+            If values is not one dimensional.
+        """
+        values = np.ravel(mtscore.to_np_array(values))
+        if len(values) == 0:
+            return
+
+        start = self.n
+        self._reserve(start + len(values))
+        self._data[start:start + len(values)] = values
+        self.n = start + len(values)
+
+        self._refresh(start, self.n)
+
+    def update(self, start, values):
+        """
+        Replaces the values of the time series starting at the given index.
+
+        Parameters
+        ----------
+        start : int
+            The index of the first value to replace.
+        values : array_like
+            The new values.
+
+        Raises
+        ------
+        ValueError
+            If values is not a list or np.array.
+            If the range to replace is not within the time series.
+        """
+        values = np.ravel(mtscore.to_np_array(values))
+        stop = start + len(values)
+
+        if start < 0 or stop > self.n:
+            raise ValueError('the range to update must be within the ts.')
+
+        if len(values) == 0:
+            return
+
+        self._data[start:stop] = values
+        self._refresh(start, stop)
+
+    def _sliding_dot_product(self, query):
+        """
+        Computes the dot products of the query with every window of the time
+        series by overlap-adding the block results.
+        """
+        m = len(query)
+        B = self.block_size
+        blocks = self.n_blocks
+
+        Y = np.fft.rfft(np.flip(query), self.nfft)
+        conv = np.fft.irfft(self._spectra[:blocks] * Y, self.nfft, axis=1)
+
+        # each block contributes block_size + m - 1 values of the convolution
+        width = B + m - 1
+        chunks = -(-width // B)
+        padded = np.zeros((blocks, chunks * B))
+        padded[:, :width] = conv[:, :width]
+
+        out = np.zeros((blocks + chunks, B))
+        for c in range(chunks):
+            out[c:c + blocks] += padded[:, c * B:(c + 1) * B]
+
+        return out.ravel()[m - 1:self.n]
+
+    def search(self, query, normalize=True):
+        """
+        Compute the distance profile for the given query over the indexed
+        time series.
+
+        Parameters
+        ----------
+        query : array_like
+            The query.
+        normalize : bool, default True
+            Compute the z-normalized Euclidean distance. When False the raw
+            Euclidean distance is computed.
+
+        Returns
+        -------
+        An array of distances.
+
+        Raises
+        ------
+        ValueError
+            If query is not a list or np.array.
+            If query is not one dimensional.
+            If query is longer than max_query_length or the time series.
+        """
+        try:
+            query = mtscore.to_np_array(query)
+        except ValueError:
+            raise ValueError('Invalid query value given. Must be array_like!')
+
+        if not mtscore.is_one_dimensional(query):
+            raise ValueError('query must be one dimensional!')
+
+        m = len(query)
+        if m > self.max_query_length or m > self.n:
+            raise ValueError(
+                'query must not be longer than max_query_length or the ts.')
+
+        z = self._sliding_dot_product(query)
+        sums = (self._sums[:self.n + 1], self._sums_sq[:self.n + 1])
+
+        if normalize:
+            meanx, sigmax = mtscore.moving_mean_std(None, m, sums=sums)
+            meany = np.mean(query)
+            sigmay = np.std(query)
+            dist = 2 * (m - (z - m * meanx * meany) / (sigmax * sigmay))
+        else:
+            sumx2 = sums[1][m:] - sums[1][:-m]
+            dist = sumx2 - 2 * z + np.sum(query ** 2)
+
+        return np.sqrt(np.maximum(dist, 0))
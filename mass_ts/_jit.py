@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module contains the optional Numba compiled kernels of the hot loops.
+Numba is used automatically when it is installed, otherwise the pure Python
+and NumPy implementations are used. Both implementations are exposed so
+their parity can be tested.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+range = getattr(__builtins__, 'xrange', range)
+# end of py2 compatability boilerplate
+
+import numpy as np
+
+from mass_ts import core as mtscore
+
+try:
+    import numba
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+
+def _top_k_exclusion_py(tmp, indices, k, exclusion_zone):
+    """
+    Walks the candidate indices in order and collects up to k indices while
+    setting the exclusion zone around every visited index to inf.
+
+    Parameters
+    ----------
+    tmp : np.array
+        A writable copy of the distance profile. It is modified in place.
+    indices : np.array
+        The candidate indices in visiting order.
+    k : int
+        The number of results you want returned.
+    exclusion_zone : int
+        The buffer around a found index to exclude results from being apart of.
+
+    Returns
+    -------
+    An array of the found indices.
+    """
+    n = len(tmp)
+    found = np.empty(k, dtype=np.int64)
+    count = 0
+
+    for idx in indices:
+        if not np.isinf(tmp[idx]):
+            found[count] = idx
+            count += 1
+
+        # apply exclusion zone
+        tmp[max(0, idx - exclusion_zone):min(n, idx + exclusion_zone)] = np.inf
+
+        if count >= k:
+            break
+
+    return found[:count]
+
+
+def _moving_mean_std_py(a, window):
+    """
+    Computes the moving mean and std. of an array with NumPy.
+
+    Parameters
+    ----------
+    a : np.array
+        The array to compute the moving mean and std. on.
+    window : int
+        The window size.
+
+    Returns
+    -------
+    (np.array, np.array) - The moving mean and std. respectively.
+    """
+    return (mtscore.moving_average(a, window), mtscore.moving_std(a, window))
+
+
+def _moving_mean_std_loop(a, window):
+    """
+    Computes the moving mean and std. of an array in O(n) by sliding
+    Welford's updates over the array. The deviations are recomputed exactly
+    every window steps to bound the accumulated rounding error.
+    """
+    windows = len(a) - window + 1
+    mean = np.empty(windows)
+    std = np.empty(windows)
+
+    for i in range(windows):
+        if i % window == 0:
+            mu = 0.
+            for j in range(i, i + window):
+                mu += a[j]
+            mu /= window
+
+            m2 = 0.
+            for j in range(i, i + window):
+                m2 += (a[j] - mu) ** 2
+        else:
+            x_old = a[i - 1]
+            x_new = a[i + window - 1]
+            mu_new = mu + (x_new - x_old) / window
+            m2 += (x_new - x_old) * (x_new - mu_new + x_old - mu)
+            mu = mu_new
+
+        mean[i] = mu
+        std[i] = np.sqrt(max(m2, 0.) / window)
+
+    return (mean, std)
+
+
+if HAS_NUMBA:
+    _top_k_exclusion_jit = numba.njit(cache=True)(_top_k_exclusion_py)
+    _moving_mean_std_jit = numba.njit(cache=True)(_moving_mean_std_loop)
+    top_k_exclusion = _top_k_exclusion_jit
+
+    def moving_mean_std(a, window):
+        """
+        Computes the moving mean and std. of a one dimensional array with the
+        compiled kernel.
+        """
+        return _moving_mean_std_jit(
+            np.ascontiguousarray(a, dtype=np.float64), window)
+else:
+    top_k_exclusion = _top_k_exclusion_py
+    moving_mean_std = _moving_mean_std_py
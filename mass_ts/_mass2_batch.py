@@ -13,12 +13,18 @@ range = getattr(__builtins__, 'xrange', range)
 # end of py2 compatability boilerplate
 
 
+import hashlib
+import json
 from multiprocessing import cpu_count
+import os
+import time
 
 import numpy as np
 
 import mass_ts as mts
 from mass_ts import core as mtscore
+from mass_ts._cache import SeriesCache
+from mass_ts._mass_ts import _distance_from_dot, _query_spectrum
 
 
 def _min_subsequence_distance(values):
@@ -30,21 +36,28 @@ def _min_subsequence_distance(values):
 
     Parameters
     ----------
-    values : tuple(iteration, batch_size, subsequence, query)
+    values : tuple(iteration, batch_size, subsequence, query, normalize,
+                   return_type)
         Tuple packed values for parallelization.
 
     Returns
     -------
     A tuple of the minimum index and distance for this particular subsequence.
+    When the return type is correlation, the maximum correlation is returned
+    instead.
     """
-    iteration, batch_size, subsequence, query = values
-    distances = mts.mass2(subsequence, query)
+    iteration, batch_size, subsequence, query, normalize, return_type = values
+    distances = mts.mass2(
+        subsequence, query, normalize=normalize, return_type=return_type)
 
     # find mininimum index of this batch which will be between 0 and batch_size
-    min_idx = np.argmin(distances)
+    if return_type == 'correlation':
+        min_idx = np.argmax(distances)
+    else:
+        min_idx = np.argmin(distances)
 
-    # add this distance to best distances
-    dist = distances[min_idx]
+    # add this distance to best distances as a real value
+    dist = np.real(distances[min_idx])
 
     # compute the actual index and store it
     index = min_idx + (batch_size * iteration)
@@ -52,7 +65,114 @@ def _min_subsequence_distance(values):
     return (index, dist)
 
 
-def _batch_job_generator(ts, query, indices, batch_size):
+def _row_stats(rows, m):
+    """
+    Computes the moving mean, std. and sum of squares of the windows of every
+    row with cumulative sums along the rows, so no temporary holds the m
+    points of every window.
+
+    Parameters
+    ----------
+    rows : np.array
+        A two dimensional array of one batch per row.
+    m : int
+        The window size.
+
+    Returns
+    -------
+    (np.array, np.array, np.array) - The moving mean, std. and sum of squares
+    of shape (rows, row length - m + 1).
+    """
+    sums = np.zeros((rows.shape[0], rows.shape[1] + 1))
+    sums_sq = np.zeros_like(sums)
+    np.cumsum(rows, axis=1, out=sums[:, 1:])
+    np.cumsum(np.square(rows), axis=1, out=sums_sq[:, 1:])
+
+    meanx = (sums[:, m:] - sums[:, :-m]) / m
+    sumx2 = sums_sq[:, m:] - sums_sq[:, :-m]
+    var = sumx2 / m - meanx ** 2
+
+    return (meanx, np.sqrt(np.maximum(var, 0)), sumx2)
+
+
+def _min_subsequence_distances(ts, query, batches, batch_size, normalize=True,
+                               return_type='distance', chunk_size=64):
+    """
+    Computes the minimum distance of every batch with two dimensional FFTs
+    over chunks of batches instead of one MASS2 call per batch. It is used in
+    single threaded mode and gives the same results as
+    _min_subsequence_distance. Missing values are zero filled chunk by chunk
+    and the windows containing them are never selected.
+
+    Parameters
+    ----------
+    ts : np.array
+        The time series to compute similarity distances for.
+    query : np.array
+        The query to find matches for within the time series.
+    batches : int
+        The number of consecutive batches starting at index 0.
+    batch_size : int
+        The subsequence size.
+    normalize : bool, Default True
+        Compute the z-normalized Euclidean distance.
+    return_type : str ('squared', 'distance', 'correlation')
+        Compute the squared distances, distances or Pearson correlation coef.
+    chunk_size : int, Default 64
+        The number of batches transformed at once.
+
+    Returns
+    -------
+    A list of tuples of the minimum index and distance of every batch.
+    """
+    m = len(query)
+    corr_coef = (return_type == 'correlation')
+    query_stats = _query_spectrum(query, batch_size)
+    meany = query_stats['meany']
+    sigmay = query_stats['sigmay']
+    sumy2 = query_stats['sumy2']
+    Y = query_stats['Y']
+
+    matches = []
+    for start in range(0, batches, chunk_size):
+        count = min(chunk_size, batches - start)
+
+        # the windows of a batch never cross into the next one, so the gaps
+        # of a chunk only depend on its own points
+        chunk, gaps = mtscore.fill_missing(
+            ts[start * batch_size:(start + count) * batch_size], m)
+        chunk = chunk.reshape(count, batch_size)
+
+        z = np.fft.ifft(np.fft.fft(chunk, axis=1) * Y, axis=1)
+
+        meanx, sigmax, sumx2 = _row_stats(chunk, m)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            distances = _distance_from_dot(
+                z[:, m - 1:], m, meanx, sigmax, meany, sigmay, sumx2=sumx2,
+                sumy2=sumy2, normalize=normalize, corr_coef=corr_coef,
+                squared=(return_type == 'squared'))
+
+        if gaps is not None:
+            windows = distances.shape[1]
+            positions = np.arange(count)[:, np.newaxis] * batch_size + \
+                np.arange(windows)
+            distances[gaps[positions]] = -np.inf if corr_coef else np.inf
+
+        if corr_coef:
+            min_idx = np.argmax(distances, axis=1)
+        else:
+            min_idx = np.argmin(distances, axis=1)
+
+        dists = np.real(distances[np.arange(len(chunk)), min_idx])
+        offsets = (np.arange(len(chunk)) + start) * batch_size
+        matches.extend(zip(min_idx + offsets, dists))
+
+    return matches
+
+
+def _batch_job_generator(ts, query, indices, batch_size, normalize=True,
+                         return_type='distance'):
     """
     A generator that yields the iteration, batch_size, subsequence
     and query for both single and multi processing.
@@ -68,18 +188,208 @@ def _batch_job_generator(ts, query, indices, batch_size):
         partitioning.
     batch_size : int
         The subsequence size.
+    normalize : bool, Default True
+        Compute the z-normalized Euclidean distance.
+    return_type : str ('squared', 'distance', 'correlation')
+        Compute the squared distances, distances or Pearson correlation coef.
 
     Returns
     -------
     A yielded job to compute.
     """
-    for iteration, i in enumerate(indices):
+    for i in indices:
         subsequence = ts[i:i+batch_size]
 
-        yield (iteration, batch_size, subsequence, query)
+        # the iteration is the batch number so any subset of batches works
+        yield (
+            i // batch_size, batch_size, subsequence, query, normalize,
+            return_type
+        )
 
 
-def mass2_batch(ts, query, batch_size, top_matches=3, n_jobs=1):
+def _sample_digest(ts, samples=4096, block=1024):
+    """
+    Computes a cheap content hash of a time series from its first and last
+    blocks and a few thousand evenly strided samples, as hashing a multi
+    billion point archive is too slow. It tells apart series of the same
+    length without reading more than a few pages of a memory map.
+
+    Returns
+    -------
+    The hex digest as a str.
+    """
+    stride = max(1, len(ts) // samples)
+    sha = hashlib.sha1(str(ts.dtype).encode('utf-8'))
+    for part in (ts[:block], ts[-block:], ts[::stride]):
+        sha.update(np.ascontiguousarray(part).data)
+
+    return sha.hexdigest()
+
+
+def _checkpoint_signature(ts, query, batch_size, normalize, return_type):
+    """
+    Describes a batch search so a checkpoint is only resumed by the same
+    search. The time series is identified by its length and a digest of
+    samples of its content.
+
+    Returns
+    -------
+    The signature as a JSON str.
+    """
+    return json.dumps({
+        'n': len(ts),
+        'ts': _sample_digest(ts),
+        'query': SeriesCache.digest(query),
+        'batch_size': int(batch_size),
+        'normalize': bool(normalize),
+        'return_type': return_type,
+    }, sort_keys=True)
+
+
+def _load_checkpoint(path, signature, batches):
+    """
+    Loads the completed batches of a checkpoint. A fresh state is returned
+    when the checkpoint does not exist.
+
+    Returns
+    -------
+    Tuple (done, matches) - a boolean array that is True for the completed
+    batches and an array of the (index, distance) match of every batch.
+
+    Raises
+    ------
+    ValueError
+        If the checkpoint belongs to a different search.
+    """
+    if not os.path.exists(path):
+        return (np.zeros(batches, dtype='bool'), np.zeros((batches, 2)))
+
+    with np.load(path) as data:
+        if str(data['signature']) != signature or \
+                len(data['done']) != batches:
+            raise ValueError(
+                'checkpoint {} belongs to a different search.'.format(path))
+
+        return (data['done'].copy(), data['matches'].copy())
+
+
+def _save_checkpoint(path, signature, done, matches):
+    """
+    Writes the completed batches to the checkpoint. The file is written to a
+    temporary path and renamed so a crash never leaves a partial checkpoint.
+    """
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, signature=np.array(signature), done=done, matches=matches)
+
+    # os.rename does not overwrite on windows and os.replace is py3 only
+    getattr(os, 'replace', os.rename)(tmp_path, path)
+
+
+def _checkpointed_matches(ts, query, batch_size, batches, n_jobs, normalize,
+                          return_type, checkpoint, checkpoint_interval,
+                          chunk_size=64):
+    """
+    Computes the best match of every batch not completed in the checkpoint
+    and persists the completed batches every checkpoint_interval seconds,
+    when the search ends and when it is interrupted.
+
+    Returns
+    -------
+    An array of the (index, distance) match of every batch.
+    """
+    signature = _checkpoint_signature(
+        ts, query, batch_size, normalize, return_type)
+    done, matches = _load_checkpoint(checkpoint, signature, batches)
+    pending = np.flatnonzero(~done)
+    saved = time.time()
+
+    try:
+        if n_jobs > 1:
+            jobs = _batch_job_generator(
+                ts, query, pending * batch_size, batch_size,
+                normalize=normalize, return_type=return_type)
+
+            with mtscore.mp_pool()(processes=n_jobs) as pool:
+                results = pool.imap(_min_subsequence_distance, jobs)
+                for number, match in zip(pending, results):
+                    matches[number] = match
+                    done[number] = True
+
+                    if time.time() - saved >= checkpoint_interval:
+                        _save_checkpoint(checkpoint, signature, done, matches)
+                        saved = time.time()
+        else:
+            # contiguous runs of pending batches are computed chunk by chunk
+            runs = np.split(pending, np.flatnonzero(np.diff(pending) != 1) + 1)
+            for run in runs:
+                for j in range(0, len(run), chunk_size):
+                    group = run[j:j + chunk_size]
+                    start = group[0] * batch_size
+                    stop = start + len(group) * batch_size
+
+                    found = _min_subsequence_distances(
+                        ts[start:stop], query, len(group), batch_size,
+                        normalize=normalize, return_type=return_type,
+                        chunk_size=chunk_size)
+
+                    matches[group] = np.array(found) + [start, 0]
+                    done[group] = True
+
+                    if time.time() - saved >= checkpoint_interval:
+                        _save_checkpoint(checkpoint, signature, done, matches)
+                        saved = time.time()
+    finally:
+        _save_checkpoint(checkpoint, signature, done, matches)
+
+    return matches
+
+
+def _top_matches(matches, top_matches, corr_coef=False):
+    """
+    Selects the best matches from the per batch minimum distances. All
+    matches are returned when there are no more than top_matches of them.
+
+    Parameters
+    ----------
+    matches : list(tuple(index, distance))
+        The best match of each computed batch.
+    top_matches : int
+        The number of matches to select.
+    corr_coef : bool, Default False
+        The matches are correlation coef. which are ranked in descending
+        order.
+
+    Returns
+    -------
+    Tuple (indices, distances) - a tuple of np.arrays where the first index is
+    the indices and the second is the distances.
+    """
+    # grab the indices and distances
+    matches = np.array(matches)
+    
+    # find the best K number of matches
+    # distance is in column 1, correlations are ranked in descending order
+    scores = matches[:, 1]
+    if corr_coef:
+        scores = -scores
+
+    if top_matches < len(scores):
+        top_indices = np.argpartition(scores, top_matches)[0:top_matches]
+    else:
+        top_indices = np.arange(len(scores))
+    
+    # the distances are stored as real values so the indices cast back to
+    # ints without discarding anything
+    best_indices = matches[:, 0][top_indices].astype('int64')
+    best_dists = matches[:, 1][top_indices]
+    
+    return (best_indices, best_dists)
+
+
+def mass2_batch(ts, query, batch_size, top_matches=3, n_jobs=1,
+                normalize=True, corr_coef=False, return_type=None,
+                checkpoint=None, checkpoint_interval=60.):
     """
     MASS2 batch is a batch version of MASS2 that reduces overall memory usage,
     provides parallelization and enables you to find top K number of matches
@@ -104,6 +414,23 @@ def mass2_batch(ts, query, batch_size, top_matches=3, n_jobs=1):
         By default the implementation runs in single-threaded mode. Setting the
         n_jobs to < 1 sets the n_jobs to the number of available threads on the
         computer it is ran.
+    normalize : bool, Default True
+        Compute the z-normalized Euclidean distance. When False the raw
+        Euclidean distance is computed.
+    corr_coef : bool, Default False
+        Return the Pearson correlation coef. of the most correlated matches
+        instead of the distances of the closest matches.
+    return_type : str ('squared', 'distance', 'correlation'), Default None
+        Return the squared distances or distances of the closest matches or
+        the Pearson correlation coef. of the most correlated matches. The
+        squared distances skip the square root. When None it is derived from
+        corr_coef.
+    checkpoint : str, Default None
+        A file the completed batch results are persisted to. When it exists
+        the search resumes from it and skips the completed batches. It is
+        kept after the search completes.
+    checkpoint_interval : float, Default 60.
+        The number of seconds between checkpoint writes.
 
     Note
     ----
@@ -126,9 +453,14 @@ def mass2_batch(ts, query, batch_size, top_matches=3, n_jobs=1):
         If batch_size is not an integer.
         If top_matches is < 1 or is not an integer.
         If n_jobs is not an integer.
+        If return_type is not squared, distance or correlation.
+        If checkpoint_interval is negative.
+        If the checkpoint belongs to a different search.
     """
     # parameter validation
     ts, query = mtscore.precheck_series_and_query(ts, query)
+    return_type = mtscore.check_return_type(return_type, corr_coef)
+    corr_coef = (return_type == 'correlation')
 
     if not isinstance(batch_size, int):
         raise ValueError('batch_size must be an integer.')
@@ -139,6 +471,9 @@ def mass2_batch(ts, query, batch_size, top_matches=3, n_jobs=1):
     if not isinstance(n_jobs, int):
         raise ValueError('n_jobs must be an integer.')
 
+    if checkpoint_interval < 0:
+        raise ValueError('checkpoint_interval must be >= 0.')
+
     # set the n_jobs appropriately
     if n_jobs < 1:
         n_jobs = cpu_count()
@@ -152,34 +487,21 @@ def mass2_batch(ts, query, batch_size, top_matches=3, n_jobs=1):
     # generate indices to process over given batch size
     indices = list(range(0, n - batch_size + 1, batch_size))
     
+    jobs = _batch_job_generator(
+        ts, query, indices, batch_size, normalize=normalize,
+        return_type=return_type)
+
     # determine if we are multiprocessing or not based on cpu_count
-    if n_jobs > 1:
+    if checkpoint is not None:
+        matches = _checkpointed_matches(
+            ts, query, batch_size, len(indices), n_jobs, normalize,
+            return_type, checkpoint, checkpoint_interval)
+    elif n_jobs > 1:
         with mtscore.mp_pool()(processes=n_jobs) as pool:
-            matches = pool.map(
-                _min_subsequence_distance,
-                _batch_job_generator(ts, query, indices, batch_size)
-            )
-    else:
-        for values in _batch_job_generator(ts, query, indices, batch_size):
-            matches.append(_min_subsequence_distance(values))
-    
-    # grab the indices and distances
-    matches = np.array(matches)
-    
-    # find the best K number of matches
-    # distance is in column 1
-    top_indices = np.argpartition(matches[:, 1], top_matches)[0:top_matches]
-    
-    # ignore the warning when casting the index values back to ints
-    # to store all values it had to choose complex types to handle the
-    # distances
-    with np.warnings.catch_warnings():
-        np.warnings.filterwarnings(
-            'ignore',
-            r'Casting complex values to real discards the imaginary part'
-        )
-        best_indices = matches[:, 0][top_indices].astype('int64')
-
-    best_dists = matches[:, 1][top_indices]
+            matches = pool.map(_min_subsequence_distance, jobs)
+    elif len(indices) > 0:
+        matches = _min_subsequence_distances(
+            ts, query, len(indices), batch_size, normalize=normalize,
+            return_type=return_type)
     
-    return (best_indices, best_dists)
\ No newline at end of file
+    return _top_matches(matches, top_matches, corr_coef=corr_coef)
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module contains all logic used for searching one query over many
+independent time series with batched FFTs.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+range = getattr(__builtins__, 'xrange', range)
+# end of py2 compatability boilerplate
+
+import numpy as np
+
+from mass_ts import core as mtscore
+from mass_ts import _top_k
+
+
+def _split_series(series, lengths):
+    """
+    Converts the given series into a list of one dimensional np.arrays.
+
+    Parameters
+    ----------
+    series : list(array_like) or np.array
+        A list of time series or a two dimensional array of padded time series.
+    lengths : array_like or None
+        The valid length of each row when series is two dimensional.
+
+    Returns
+    -------
+    A list of np.arrays.
+
+    Raises
+    ------
+    ValueError
+        If series is not array_like.
+        If a time series is not one dimensional.
+        If lengths does not match the number of rows.
+    """
+    if not mtscore.is_array_like(series):
+        raise ValueError('series must be array like.')
+
+    if isinstance(series, np.ndarray) and series.ndim == 2:
+        if lengths is None:
+            lengths = [series.shape[1]] * series.shape[0]
+
+        if len(lengths) != series.shape[0]:
+            raise ValueError('lengths must match the number of series.')
+
+        return [series[i, :int(l)] for i, l in enumerate(lengths)]
+
+    arrays = []
+    for ts in series:
+        try:
+            ts = mtscore.to_np_array(ts)
+        except ValueError:
+            raise ValueError('Invalid ts value given. Must be array_like!')
+
+        if not mtscore.is_one_dimensional(ts):
+            raise ValueError('ts must be one dimensional!')
+
+        arrays.append(ts)
+
+    return arrays
+
+
+def _group_distances(group, query, nfft, normalize):
+    """
+    Computes the distance profiles of the query over a group of time series
+    padded to the same FFT length with a single batched FFT.
+
+    Parameters
+    ----------
+    group : list(np.array)
+        The time series of the group. Each is at most nfft long.
+    query : np.array
+        The query.
+    nfft : int
+        The padded FFT length shared by the group.
+    normalize : bool
+        Compute the z-normalized Euclidean distance.
+
+    Returns
+    -------
+    A two dimensional array of distances where windows past the end of a time
+    series or containing missing values are set to inf.
+    """
+    m = len(query)
+    rows = len(group)
+    lengths = np.array([len(ts) for ts in group])
+
+    # missing values are zero filled and their windows masked below
+    x = np.zeros((rows, nfft))
+    gaps = []
+    for i, ts in enumerate(group):
+        x[i, :len(ts)], ts_gaps = mtscore.fill_missing(ts, m)
+        gaps.append(ts_gaps)
+
+    X = np.fft.rfft(x, axis=1)
+    Y = np.fft.rfft(np.flip(query), nfft)
+    z = np.fft.irfft(X * Y, nfft, axis=1)[:, m - 1:]
+
+    zeros = np.zeros((rows, 1))
+    sums = np.concatenate((zeros, np.cumsum(x, axis=1)), axis=1)
+    sums_sq = np.concatenate((zeros, np.cumsum(x ** 2, axis=1)), axis=1)
+    sumx = sums[:, m:] - sums[:, :-m]
+    sumx2 = sums_sq[:, m:] - sums_sq[:, :-m]
+
+    if normalize:
+        meanx = sumx / m
+        sigmax = np.sqrt(np.maximum(sumx2 / m - meanx ** 2, 0))
+        meany = np.mean(query)
+        sigmay = np.std(query)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dist = 2 * (m - (z - m * meanx * meany) / (sigmax * sigmay))
+    else:
+        dist = sumx2 - 2 * z + np.sum(query ** 2)
+
+    dist = np.sqrt(np.maximum(dist, 0))
+    dist[~np.isfinite(dist)] = np.inf
+
+    # mask windows that run past the end of each time series
+    valid = np.arange(dist.shape[1]) < (lengths - m + 1)[:, np.newaxis]
+    dist[~valid] = np.inf
+
+    for i, ts_gaps in enumerate(gaps):
+        if ts_gaps is not None:
+            dist[i, :len(ts_gaps)][ts_gaps] = np.inf
+
+    return dist
+
+
+def mass2_many(series, query, top_matches=3, exclusion_zone=None,
+               lengths=None, normalize=True, chunk_size=1024):
+    """
+    Searches one query over many independent time series and returns the top
+    matches of each time series. The time series are grouped by their padded
+    FFT length and every group is processed with batched two dimensional FFTs
+    while the query spectrum is computed once per group.
+
+    Parameters
+    ----------
+    series : list(array_like) or np.array
+        The time series to search. Either a list of one dimensional arrays of
+        any length or a two dimensional array with one time series per row.
+    query : array_like
+        The query to search for.
+    top_matches : int, Default 3
+        The number of matches you would like to return per time series.
+    exclusion_zone : int, Default None
+        The buffer around a match to exclude other matches from. By default
+        it is half of the query length.
+    lengths : array_like, Default None
+        The valid length of each row when series is a two dimensional padded
+        array. By default every row is used in full.
+    normalize : bool, Default True
+        Compute the z-normalized Euclidean distance. When False the raw
+        Euclidean distance is computed.
+    chunk_size : int, Default 1024
+        The maximum number of time series transformed in one batched FFT.
+
+    Note
+    ----
+    Missing values (NaN) are zero filled for the convolution and the windows
+    containing them are inf.
+
+    Returns
+    -------
+    A list with one tuple (indices, distances) for each time series, sorted
+    by distance. Time series shorter than the query have empty results.
+
+    Raises
+    ------
+    ValueError
+        If series is not array_like.
+        If query is not a list or np.array.
+        If a time series or the query is not one dimensional.
+        If top_matches is < 1 or is not an integer.
+        If chunk_size is < 1 or is not an integer.
+    """
+    series = _split_series(series, lengths)
+
+    try:
+        query = mtscore.to_np_array(query)
+    except ValueError:
+        raise ValueError('Invalid query value given. Must be array_like!')
+
+    if not mtscore.is_one_dimensional(query):
+        raise ValueError('query must be one dimensional!')
+
+    if not isinstance(top_matches, int) or top_matches < 1:
+        raise ValueError('top_matches must be an integer > 0.')
+
+    if not isinstance(chunk_size, int) or chunk_size < 1:
+        raise ValueError('chunk_size must be an integer > 0.')
+
+    m = len(query)
+    if exclusion_zone is None:
+        exclusion_zone = max(1, m // 2)
+
+    empty = (np.array([], dtype='int64'), np.array([]))
+    results = [empty] * len(series)
+
+    # group the time series by padded FFT length
+    groups = {}
+    for i, ts in enumerate(series):
+        if len(ts) >= m:
+            nfft = 1 << int(len(ts) - 1).bit_length()
+            groups.setdefault(nfft, []).append(i)
+
+    for nfft, members in sorted(groups.items()):
+        for start in range(0, len(members), chunk_size):
+            chunk = members[start:start + chunk_size]
+            dist = _group_distances(
+                [series[i] for i in chunk], query, nfft, normalize)
+
+            for row, i in enumerate(chunk):
+                profile = dist[row, :len(series[i]) - m + 1]
+                results[i] = _top_k._greedy_select(
+                    np.arange(len(profile)), profile, top_matches,
+                    exclusion_zone)
+
+    return results
@@ -7,20 +7,263 @@ from __future__ import unicode_literals
 range = getattr(__builtins__, 'xrange', range)
 # end of py2 compatability boilerplate
 
-import warnings
-
 import numpy as np
 
-try:
-    import cupy as cp
-except ModuleNotFoundError:
-    warnings.warn(
-        'GPU support will not work. You must pip install mass-ts[gpu].')
-
 from mass_ts import core as mtscore
+from mass_ts import _backend as mtsbackend
+from mass_ts import _cache as mtscache
+from mass_ts import _top_k
+from mass_ts import _jit as mtsjit
+
+
+def _distance_from_dot(z, m, meanx, sigmax, meany, sigmay, sumx2=None,
+                       sumy2=None, normalize=True, corr_coef=False,
+                       squared=False, xp=np):
+    """
+    Converts the sliding dot products between the query and the time series
+    into distances or correlation coefficients.
+
+    Parameters
+    ----------
+    z : array_like
+        The sliding dot products.
+    m : int
+        The query length.
+    meanx : array_like
+        The moving mean of the time series windows.
+    sigmax : array_like
+        The moving std. of the time series windows.
+    meany : float
+        The mean of the query.
+    sigmay : float
+        The std. of the query.
+    sumx2 : array_like, Default None
+        The moving sum of squares of the time series windows. Required when
+        normalize is False.
+    sumy2 : float, Default None
+        The sum of squares of the query. Required when normalize is False.
+    normalize : bool, Default True
+        Compute the z-normalized Euclidean distance. When False the raw
+        Euclidean distance is computed.
+    corr_coef : bool, Default False
+        Return the Pearson correlation coefficient instead of distances.
+    squared : bool, Default False
+        Return the squared distances and skip the square root.
+    xp : module, Default numpy
+        The array module used for the computation.
+
+    Returns
+    -------
+    An array of distances or correlation coefficients.
+    """
+    if corr_coef:
+        corr = (z - m * meanx * meany) / (m * sigmax * sigmay)
+        if mtsbackend.is_complex(corr, xp):
+            corr = xp.real(corr)
+
+        return corr
+
+    if normalize:
+        dist = 2 * (m - (z - m * meanx * meany) / (sigmax * sigmay))
+    else:
+        dist = sumx2 - 2 * z + sumy2
+
+    # rounding leaves tiny negative values at exact matches of real products
+    if not mtsbackend.is_complex(dist, xp):
+        dist = xp.where(dist < 0, xp.zeros_like(dist), dist)
+
+    if squared:
+        return dist
+
+    return xp.sqrt(dist)
+
+
+def _series_stats(x, m):
+    """
+    Computes the moving mean, std. and sum of squares of the time series
+    windows.
+
+    Parameters
+    ----------
+    x : np.array
+        The time series.
+    m : int
+        The window size.
+
+    Returns
+    -------
+    A dict with the meanx, sigmax and sumx2 arrays.
+    """
+    meanx, sigmax = mtsjit.moving_mean_std(x, m)
+
+    return {
+        'meanx': meanx,
+        'sigmax': sigmax,
+        'sumx2': mtscore.moving_sum_sq(x, m),
+    }
+
+
+def _query_spectrum(query, nfft, real=False):
+    """
+    Computes the statistics of the query and the FFT of the reversed query
+    padded with zeros to nfft points. They are loaded from the query cache
+    when it is enabled.
+
+    Parameters
+    ----------
+    query : np.array
+        The query.
+    nfft : int
+        The FFT length.
+    real : bool, Default False
+        Compute the real FFT instead of the full FFT.
+
+    Returns
+    -------
+    A dict with the meany, sigmay, sumy2 and Y arrays.
+    """
+    def compute():
+        y = np.zeros(nfft)
+        y[:len(query)] = np.flip(query)
+        fft = np.fft.rfft if real else np.fft.fft
+
+        return {
+            'meany': np.mean(query),
+            'sigmay': np.std(query),
+            'sumy2': np.sum(query ** 2),
+            'Y': fft(y),
+        }
+
+    return mtscache.cached_query_arrays(
+        query, ('rfft' if real else 'fft', nfft), compute)
+
+
+def _check_correction(correction, return_type):
+    """
+    Validates the distance correction.
+
+    Raises
+    ------
+    ValueError
+        If correction is not cid or length.
+        If correction is combined with the correlation return type.
+    """
+    if correction is None:
+        return None
+
+    correction = correction.lower()
+    if correction not in ('cid', 'length'):
+        raise ValueError('correction only accepts cid or length.')
+
+    if return_type == 'correlation':
+        raise ValueError('correction can not be applied to correlations.')
+
+    return correction
+
+
+def _correct(dist, x, query, correction, normalize=True, squared=False):
+    """
+    Applies a distance correction to a distance profile in one vectorized
+    pass. The complexity invariant distance (CID) multiplies every distance
+    by the ratio of the larger to the smaller complexity estimate of the
+    window and the query. The length correction divides the distances by the
+    square root of the query length.
+
+    Parameters
+    ----------
+    dist : np.array
+        The distance profile of x.
+    x : np.array
+        The time series the profile was computed on.
+    query : np.array
+        The query.
+    correction : str ('cid', 'length') or None
+        The correction to apply.
+    normalize : bool, default True
+        The distances are z-normalized.
+    squared : bool, default False
+        The distances are squared.
+
+    Returns
+    -------
+    The corrected distance profile.
+    """
+    if correction is None:
+        return dist
+
+    m = len(query)
+    if correction == 'length':
+        factor = 1 / np.sqrt(m)
+    else:
+        cex = mtscore.complexity_estimate(x, m, normalize=normalize)
+        cey = mtscore.complexity_estimate(query, m, normalize=normalize)[0]
+
+        # two windows without any complexity are not corrected
+        with np.errstate(divide='ignore', invalid='ignore'):
+            factor = np.maximum(cex, cey) / np.minimum(cex, cey)
+        factor[np.isnan(factor)] = 1
+
+    if squared:
+        factor = factor ** 2
+
+    return dist * factor
+
+
+def _constrained_profile(ts, m, compute, start=None, stop=None, mask=None,
+                         fill=np.inf):
+    """
+    Computes a distance profile only over the runs of windows lying within
+    the valid points of the time series. The other windows are set to fill.
+    Missing values are zero filled so the profile is computed in one pass and
+    the windows containing them are set to fill afterwards.
+
+    Parameters
+    ----------
+    ts : np.array
+        The time series.
+    m : int
+        The query length.
+    compute : callable
+        Computes the distance profile of a segment of the time series.
+    start : int, Default None
+        The first valid point.
+    stop : int, Default None
+        The point after the last valid point.
+    mask : array_like, Default None
+        A boolean array of valid points or a list of valid intervals.
+    fill : float, Default np.inf
+        The value of the windows that are not computed.
+
+    Returns
+    -------
+    An array of distances.
+    """
+    ts, gaps = mtscore.fill_missing(ts, m)
+
+    # windows made of filled zeros have no deviation and are replaced below
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if start is None and stop is None and mask is None:
+            dist = compute(ts)
+        else:
+            runs = mtscore.valid_window_runs(len(ts), m, start, stop, mask)
+            parts = [
+                (first, compute(ts[first:last + m - 1]))
+                for first, last in runs
+            ]
+
+            dtype = parts[0][1].dtype if parts else 'float64'
+            dist = np.full(len(ts) - m + 1, fill, dtype=dtype)
+            for first, d in parts:
+                dist[first:first + len(d)] = d
+
+    if gaps is not None:
+        dist[gaps] = fill
+
+    return dist
 
 
-def mass(ts, query, normalize_query=True, corr_coef=False):
+def mass(ts, query, normalize_query=True, corr_coef=False, normalize=True,
+         return_type=None):
     """
     Compute the distance profile for the given query over the given time 
     series. Optionally, the correlation coefficient can be returned and 
@@ -36,6 +279,15 @@ def mass(ts, query, normalize_query=True, corr_coef=False):
         Optionally normalize the query.
     corr_coef : bool, default False
         Optionally return the correlation coef.
+    normalize : bool, default True
+        Compute the z-normalized Euclidean distance. When False the raw
+        Euclidean distance is computed and normalize_query is ignored.
+    return_type : str ('squared', 'distance', 'correlation'), default None
+        Return the squared distances, the distances or the Pearson
+        correlation coef. derived from the squared distances. The squared
+        distances and correlation skip the square root. When None it is
+        derived from corr_coef, which keeps its historical 1 - d / (2m)
+        scaling. Correlations require normalize.
 
     Returns
     -------
@@ -47,10 +299,19 @@ def mass(ts, query, normalize_query=True, corr_coef=False):
         If ts is not a list or np.array.
         If query is not a list or np.array.
         If ts or query is not one dimensional.
+        If return_type is not squared, distance or correlation.
+        If a correlation is requested with normalize False.
     """
     ts, query = mtscore.precheck_series_and_query(ts, query)
+    legacy_corr_coef = corr_coef and return_type is None
+    return_type = mtscore.check_return_type(return_type, corr_coef)
 
-    if normalize_query:
+    # the raw Euclidean distance does not map to a Pearson correlation
+    if return_type == 'correlation' and not normalize:
+        raise ValueError(
+            'correlations can only be computed with normalize=True.')
+
+    if normalize_query and normalize:
         query = (query - np.mean(query)) / np.std(query)
         
     n = len(ts)
@@ -71,26 +332,39 @@ def mass(ts, query, normalize_query=True, corr_coef=False):
     cum_sumx2 = np.cumsum(x ** 2)
     
     sumx2 = cum_sumx2[m:n] - cum_sumx2[0:n-m]
-    sumx = cum_sumx[m:n] - cum_sumx[0:n-m]
-    meanx = sumx / m
-    sigmax2 = (sumx2 / m) - (meanx**2)
-    sigmax = np.sqrt(sigmax2)
-    
-    dist = (sumx2 - 2 * sumx * meanx + m * (meanx ** 2)) \
-        / sigmax2 - 2 * (z[m:n] - sumy * meanx) \
-        / sigmax + sumy2
-    dist = np.absolute(np.sqrt(dist))
-    
-    if corr_coef:
+
+    if not normalize:
+        dist = sumx2 - 2 * z[m:n] + sumy2
+    else:
+        sumx = cum_sumx[m:n] - cum_sumx[0:n-m]
+        meanx = sumx / m
+        sigmax2 = (sumx2 / m) - (meanx**2)
+        sigmax = np.sqrt(sigmax2)
+
+        dist = (sumx2 - 2 * sumx * meanx + m * (meanx ** 2)) \
+            / sigmax2 - 2 * (z[m:n] - sumy * meanx) \
+            / sigmax + sumy2
+
+    # |sqrt(d)| ** 2 == |d| so the squared outputs skip the square root
+    if return_type == 'squared':
+        return np.absolute(dist)
+
+    if return_type == 'correlation' and not legacy_corr_coef:
         return 1 - np.absolute(dist) / (2 * m)
-    
+
+    dist = np.absolute(np.sqrt(dist))
+
+    if legacy_corr_coef:
+        return 1 - dist / (2 * m)
+
     return dist
 
 
-def mass2_gpu(ts, query):
+def mass2_gpu(ts, query, normalize=True, corr_coef=False, return_type=None):
     """
     Compute the distance profile for the given query over the given time 
-    series. This require cupy to be installed.
+    series. This require cupy to be installed. It runs the MASS2 kernel of
+    mass2_xp on CuPy and copies the result back to the host.
 
     Parameters
     ----------
@@ -98,6 +372,15 @@ def mass2_gpu(ts, query):
         The array to create a rolling window on.
     query : array_like
         The query.
+    normalize : bool, default True
+        Compute the z-normalized Euclidean distance. When False the raw
+        Euclidean distance is computed.
+    corr_coef : bool, default False
+        Optionally return the Pearson correlation coef. instead of distances.
+    return_type : str ('squared', 'distance', 'correlation'), default None
+        Return the squared distances, the distances or the Pearson
+        correlation coef. The squared distances and correlation skip the
+        square root. When None it is derived from corr_coef.
 
     Returns
     -------
@@ -109,45 +392,136 @@ def mass2_gpu(ts, query):
         If ts is not a list or np.array.
         If query is not a list or np.array.
         If ts or query is not one dimensional.
+        If return_type is not squared, distance or correlation.
+    ImportError
+        If cupy is not installed.
     """
-    def moving_mean_std_gpu(a, w):
-        s = cp.concatenate([cp.array([0]), cp.cumsum(a)])
-        sSq = cp.concatenate([cp.array([0]), cp.cumsum(a ** 2)])
-        segSum = s[w:] - s[:-w]
-        segSumSq = sSq[w:] -sSq[:-w]
-    
-        movmean = segSum / w
-        movstd = cp.sqrt(segSumSq / w - (segSum / w) ** 2)
-    
-        return (movmean, movstd)
+    return mass2_xp(
+        ts, query, normalize=normalize, corr_coef=corr_coef,
+        return_type=return_type, backend='cupy')
 
-    x = cp.asarray(ts)
-    y = cp.asarray(query)
-    n = x.size
-    m = y.size
 
-    meany = cp.mean(y)
-    sigmay = cp.std(y)
-    
-    meanx, sigmax = moving_mean_std_gpu(x, m)
-    meanx = cp.concatenate([cp.ones(n - meanx.size), meanx])
-    sigmax = cp.concatenate([cp.zeros(n - sigmax.size), sigmax])
-    
-    y = cp.concatenate((cp.flip(y, axis=0), cp.zeros(n - m)))
-    
-    X = cp.fft.fft(x)
-    Y = cp.fft.fft(y)
-    Z = X * Y
-    z = cp.fft.ifft(Z)
-    
-    dist = 2 * (m - (z[m - 1:n] - m * meanx[m - 1:n] * meany) / 
-                    (sigmax[m - 1:n] * sigmay))
-    dist = cp.sqrt(dist)
+def mass2_xp(ts, query, normalize=True, corr_coef=False, return_type=None,
+             backend=None, to_numpy=True):
+    """
+    Compute the distance profile for the given query over the given time
+    series with any array namespace. The MASS2 kernel is written once against
+    the array API so it runs on NumPy, CuPy or libraries such as
+    array-api-strict.
+
+    Parameters
+    ----------
+    ts : array_like
+        The array to create a rolling window on.
+    query : array_like
+        The query.
+    normalize : bool, default True
+        Compute the z-normalized Euclidean distance. When False the raw
+        Euclidean distance is computed.
+    corr_coef : bool, default False
+        Optionally return the Pearson correlation coef. instead of distances.
+    return_type : str ('squared', 'distance', 'correlation'), default None
+        Return the squared distances, the distances or the Pearson
+        correlation coef. When None it is derived from corr_coef.
+    backend : str or module, default None
+        The array namespace, e.g. 'numpy', 'cupy' or a module implementing
+        the array API. By default it is inferred from the ts.
+    to_numpy : bool, default True
+        Copy the result into a NumPy array. When False the result is kept in
+        the namespace, and on the device, of the computation.
+
+    Returns
+    -------
+    An array of distances.
+
+    Raises
+    ------
+    ValueError
+        If ts or query is not one dimensional.
+        If query is longer than ts.
+        If return_type is not squared, distance or correlation.
+        If the backend can not be imported.
+    """
+    return_type = mtscore.check_return_type(return_type, corr_coef)
+    xp = mtsbackend.get_namespace(backend, (ts, query))
+
+    x = xp.asarray(ts, dtype=xp.float64)
+    y = xp.asarray(query, dtype=xp.float64)
+    if x.ndim != 1 or y.ndim != 1:
+        raise ValueError('ts and query must be one dimensional!')
 
-    return cp.asnumpy(dist)
+    if y.shape[0] > x.shape[0]:
+        raise ValueError('query must be shorter than the ts!')
 
+    dist = _mass2_kernel(
+        x, y, normalize=normalize, corr_coef=(return_type == 'correlation'),
+        squared=(return_type == 'squared'), xp=xp)
 
-def mass2(ts, query):
+    if to_numpy:
+        return mtsbackend.to_numpy(dist, xp)
+
+    return dist
+
+
+def _mass2_kernel(x, y, normalize=True, corr_coef=False, squared=False,
+                  xp=np, stats=None, X=None, query_stats=None):
+    """
+    Computes the MASS2 distance profile with the array namespace xp. It is
+    shared by mass2, mass2_gpu and mass2_xp.
+
+    Parameters
+    ----------
+    x : array
+        The time series.
+    y : array
+        The query.
+    normalize : bool, default True
+        Compute the z-normalized Euclidean distance.
+    corr_coef : bool, default False
+        Return the Pearson correlation coef. instead of distances.
+    squared : bool, default False
+        Return the squared distances.
+    xp : module, default numpy
+        The array namespace of x and y.
+    stats : dict, default None
+        The precomputed moving stats of x. See mtsbackend.moving_stats.
+    X : array, default None
+        The precomputed real FFT of x.
+    query_stats : dict, default None
+        The precomputed query stats and real FFT. See _query_spectrum.
+
+    Returns
+    -------
+    An array of distances.
+    """
+    n = x.shape[0]
+    m = y.shape[0]
+
+    if stats is None:
+        stats = mtsbackend.moving_stats(x, m, xp=xp)
+
+    if X is None:
+        X = xp.fft.rfft(x)
+
+    if query_stats is None:
+        query_stats = {
+            'meany': xp.mean(y),
+            'sigmay': xp.std(y),
+            'sumy2': xp.sum(y * y),
+            'Y': None,
+        }
+
+    z = mtsbackend.sliding_dot_product(X, y, n, xp=xp, Y=query_stats['Y'])
+
+    return _distance_from_dot(
+        z, m, stats['meanx'], stats['sigmax'], query_stats['meany'],
+        query_stats['sigmay'], sumx2=stats['sumx2'],
+        sumy2=query_stats['sumy2'], normalize=normalize, corr_coef=corr_coef,
+        squared=squared, xp=xp)
+
+
+def mass2(ts, query, normalize=True, corr_coef=False, return_type=None,
+          start=None, stop=None, mask=None, correction=None):
     """
     Compute the distance profile for the given query over the given time 
     series. Optionally, the correlation coefficient can be returned.
@@ -158,6 +532,34 @@ def mass2(ts, query):
         The array to create a rolling window on.
     query : array_like
         The query.
+    normalize : bool, default True
+        Compute the z-normalized Euclidean distance. When False the raw
+        Euclidean distance is computed.
+    corr_coef : bool, default False
+        Optionally return the Pearson correlation coef. instead of distances.
+    return_type : str ('squared', 'distance', 'correlation'), default None
+        Return the squared distances, the distances or the Pearson
+        correlation coef. The squared distances and correlation skip the
+        square root. When None it is derived from corr_coef.
+    start : int, Default None
+        Only search windows starting at or after this point.
+    stop : int, Default None
+        Only search windows ending before this point.
+    mask : array_like, Default None
+        Only search windows made of valid points. Either a boolean array of
+        the ts length that is True for valid points or a list of
+        (start, stop) intervals of valid points. Only the segments covering
+        valid windows are transformed and the other windows are inf, or -inf
+        for correlations.
+    correction : str ('cid', 'length'), default None
+        Correct the distances with the complexity invariant distance (CID)
+        or divide them by the square root of the query length so profiles
+        of different query lengths are comparable.
+
+    Note
+    ----
+    Missing values (NaN) in the ts are zero filled for the convolution and
+    the windows containing them are inf, or -inf for correlations.
 
     Returns
     -------
@@ -169,38 +571,193 @@ def mass2(ts, query):
         If ts is not a list or np.array.
         If query is not a list or np.array.
         If ts or query is not one dimensional.
+        If return_type is not squared, distance or correlation.
+        If start or stop is not an integer within the ts.
+        If mask is not a boolean array or a list of intervals.
+        If correction is not cid or length or is used with correlations.
     """
     ts, query = mtscore.precheck_series_and_query(ts, query)
+    return_type = mtscore.check_return_type(return_type, corr_coef)
+    corr_coef = (return_type == 'correlation')
+    squared = (return_type == 'squared')
+    correction = _check_correction(correction, return_type)
+
+    def compute(x):
+        dist = _mass2(
+            x, query, normalize=normalize, corr_coef=corr_coef,
+            squared=squared)
+
+        return _correct(
+            dist, x, query, correction, normalize=normalize, squared=squared)
+
+    return _constrained_profile(
+        ts, len(query), compute, start=start, stop=stop, mask=mask,
+        fill=-np.inf if corr_coef else np.inf)
 
+
+def _mass2(ts, query, normalize=True, corr_coef=False, squared=False):
+    """
+    Computes the MASS2 distance profile of validated inputs. See mass2.
+
+    Parameters
+    ----------
+    ts : np.array
+        The time series.
+    query : np.array
+        The query.
+    normalize : bool, default True
+        Compute the z-normalized Euclidean distance.
+    corr_coef : bool, default False
+        Return the Pearson correlation coef. instead of distances.
+    squared : bool, default False
+        Return the squared distances.
+
+    Returns
+    -------
+    An array of distances.
+    """
     n = len(ts)
     m = len(query)
+
+    # the series stats and spectrum are loaded from the cache when enabled
+    digest = mtscache.series_digest(ts)
+    stats = mtscache.cached_arrays(
+        digest, ('stats', m), lambda: _series_stats(ts, m),
+        names=('meanx', 'sigmax', 'sumx2'))
+    X = mtscache.cached_arrays(
+        digest, ('rfft', n), lambda: {'X': np.fft.rfft(ts)},
+        names=('X',))['X']
+
+    return _mass2_kernel(
+        ts, query, normalize=normalize, corr_coef=corr_coef, squared=squared,
+        stats=stats, X=X, query_stats=_query_spectrum(query, n, real=True))
+
+
+def _mass3_pieces(ts, query, pieces, normalize=True, corr_coef=False,
+                  squared=False):
+    """
+    Computes the MASS3 distance profile piece by piece. Each piece covers
+    pieces points of the time series and yields the distances of the
+    pieces - m + 1 windows starting within it, so only one piece is held in
+    memory at a time.
+
+    Parameters
+    ----------
+    ts : np.array
+        The time series.
+    query : np.array
+        The query.
+    pieces : int
+        Number of points in a piece.
+    normalize : bool, default True
+        Compute the z-normalized Euclidean distance. When False the raw
+        Euclidean distance is computed.
+    corr_coef : bool, default False
+        Return the Pearson correlation coef. instead of distances.
+    squared : bool, default False
+        Return the squared distances.
+
+    Returns
+    -------
+    A yielded tuple (start, distances) for every piece where start is the
+    index of the first window of the piece.
+    """
+    m = len(query)
+    n = len(ts)
+    k = pieces
     x = ts
-    y = query
 
-    meany = np.mean(y)
-    sigmay = np.std(y)
-    
-    meanx = mtscore.moving_average(x, m)
-    meanx = np.append(np.ones([1, len(x) - len(meanx)]), meanx)
-    sigmax = mtscore.moving_std(x, m)
-    sigmax = np.append(np.zeros([1, len(x) - len(sigmax)]), sigmax)
-    
-    y = np.append(np.flip(y), np.zeros([1, n - m]))
-    
-    X = np.fft.fft(x)
-    Y = np.fft.fft(y)
-    Y.resize(X.shape)
-    Z = X * Y
-    z = np.fft.ifft(Z)
-    
-    dist = 2 * (m - (z[m - 1:n] - m * meanx[m - 1:n] * meany) / 
-                    (sigmax[m - 1:n] * sigmay))
-    dist = np.sqrt(dist)
-    
-    return dist
+    # the query stats and spectrum are loaded from the query cache
+    query_stats = _query_spectrum(query, k)
+    meany = query_stats['meany']
+    sigmay = query_stats['sigmay']
+    sumy2 = query_stats['sumy2']
+    Y = query_stats['Y']
+
+    # full length stats and piece spectra are only used with the cache
+    digest = mtscache.series_digest(x)
+    stats = None
+    step_size = k - m + 1
+    starts = list(range(0, n - m + 1, step_size))
+    full_pieces = len(range(0, n - k + 1, step_size))
+
+    # missing piece spectra are written to the cache one piece at a time
+    spectra, writer = mtscache.cached_array_writer(
+        digest, ('pieces', k, m), 'X', (full_pieces, k), 'complex128')
+
+    if digest is not None:
+        stats = mtscache.cached_arrays(
+            digest, ('stats', m), lambda: _series_stats(x, m),
+            names=('meanx', 'sigmax', 'sumx2'))
+
+    try:
+        for p, j in enumerate(starts):
+            # the last piece may be shorter than the others
+            piece = x[j:j + k]
+            size = len(piece)
+            windows = size - m + 1
+
+            # The main trick of getting dot products in O(n log n) time
+            if p < full_pieces and spectra is not None:
+                X = spectra[p]
+            else:
+                X = np.fft.fft(piece)
+                if p < full_pieces and writer is not None:
+                    writer[p] = X
+
+            if size < k:
+                Z = X * np.fft.fft(
+                    np.append(np.flip(query), np.zeros(size - m)))
+            else:
+                Z = X * Y
+            z = np.fft.ifft(Z)
+
+            if stats is None:
+                piece_stats = _series_stats(piece, m)
+            else:
+                piece_stats = dict(
+                    (name, a[j:j + windows]) for name, a in stats.items())
+
+            d = _distance_from_dot(
+                z[m - 1:size], m, piece_stats['meanx'],
+                piece_stats['sigmax'], meany, sigmay,
+                sumx2=piece_stats['sumx2'], sumy2=sumy2, normalize=normalize,
+                corr_coef=corr_coef, squared=squared)
+
+            yield (j, d)
+
+        if writer is not None:
+            writer.commit()
+            writer = None
+    finally:
+        # a piece search stopped early leaves no partial cache entry
+        if writer is not None:
+            writer.discard()
+
+
+def _precheck_mass3(ts, query, pieces):
+    """
+    Validates the MASS3 parameters.
+
+    Raises
+    ------
+    ValueError
+        If ts is not a list or np.array.
+        If query is not a list or np.array.
+        If ts or query is not one dimensional.
+        If pieces is less than the length of the query.
+    """
+    ts, query = mtscore.precheck_series_and_query(ts, query)
+
+    if pieces < len(query):
+        raise ValueError('pieces should be larger than the query length.')
+
+    return (ts, query)
 
 
-def mass3(ts, query, pieces):
+def mass3(ts, query, pieces, normalize=True, corr_coef=False,
+          return_type=None, start=None, stop=None, mask=None,
+          correction=None):
     """
     Compute the distance profile for the given query over the given time 
     series. This version of MASS is hardware efficient given the right number
@@ -214,6 +771,34 @@ def mass3(ts, query, pieces):
         The query.
     pieces : int
         Number of pieces to process. This is best as a power of 2.
+    normalize : bool, default True
+        Compute the z-normalized Euclidean distance. When False the raw
+        Euclidean distance is computed.
+    corr_coef : bool, default False
+        Optionally return the Pearson correlation coef. instead of distances.
+    return_type : str ('squared', 'distance', 'correlation'), default None
+        Return the squared distances, the distances or the Pearson
+        correlation coef. The squared distances and correlation skip the
+        square root. When None it is derived from corr_coef.
+    start : int, Default None
+        Only search windows starting at or after this point.
+    stop : int, Default None
+        Only search windows ending before this point.
+    mask : array_like, Default None
+        Only search windows made of valid points. Either a boolean array of
+        the ts length that is True for valid points or a list of
+        (start, stop) intervals of valid points. Only the segments covering
+        valid windows are transformed and the other windows are inf, or -inf
+        for correlations.
+    correction : str ('cid', 'length'), default None
+        Correct the distances with the complexity invariant distance (CID)
+        or divide them by the square root of the query length so profiles
+        of different query lengths are comparable.
+
+    Note
+    ----
+    Missing values (NaN) in the ts are zero filled for the convolution and
+    the windows containing them are inf, or -inf for correlations.
 
     Returns
     -------
@@ -226,61 +811,340 @@ def mass3(ts, query, pieces):
         If query is not a list or np.array.
         If ts or query is not one dimensional.
         If pieces is less than the length of the query.
+        If return_type is not squared, distance or correlation.
+        If start or stop is not an integer within the ts.
+        If mask is not a boolean array or a list of intervals.
+        If correction is not cid or length or is used with correlations.
     """
-    ts, query = mtscore.precheck_series_and_query(ts, query)
+    ts, query = _precheck_mass3(ts, query, pieces)
+    return_type = mtscore.check_return_type(return_type, corr_coef)
+    corr_coef = (return_type == 'correlation')
+    squared = (return_type == 'squared')
+    correction = _check_correction(correction, return_type)
+
+    def compute(x):
+        dist = [
+            d for j, d in _mass3_pieces(
+                x, query, pieces, normalize=normalize, corr_coef=corr_coef,
+                squared=squared)
+        ]
+
+        return _correct(
+            np.concatenate(dist), x, query, correction, normalize=normalize,
+            squared=squared)
+
+    return _constrained_profile(
+        ts, len(query), compute, start=start, stop=stop, mask=mask,
+        fill=-np.inf if corr_coef else np.inf)
+
+
+def mass3_top_k(ts, query, pieces, k, exclusion_zone, option='motifs',
+                normalize=True, corr_coef=False, return_type=None,
+                start=None, stop=None, mask=None, correction=None):
+    """
+    Finds the top k motifs or discords of the query within the time series
+    without materializing the distance profile. Every MASS3 piece is consumed
+    as soon as it is computed into a bounded candidate buffer honoring the
+    exclusion zone, so the memory needed is O(k + pieces).
+
+    Parameters
+    ----------
+    ts : array_like
+        The array to create a rolling window on.
+    query : array_like
+        The query.
+    pieces : int
+        Number of pieces to process. This is best as a power of 2.
+    k : int
+        The number of results you want returned.
+    exclusion_zone : int
+        The buffer around a found index to exclude results from being apart of.
+    option : str ('motifs', 'discords'), Default 'motifs'
+        Specify if you want to find motifs or discords.
+    normalize : bool, default True
+        Compute the z-normalized Euclidean distance. When False the raw
+        Euclidean distance is computed.
+    corr_coef : bool, default False
+        Rank by the Pearson correlation coef. instead of distances. Motifs are
+        then the most correlated windows.
+    return_type : str ('squared', 'distance', 'correlation'), default None
+        Rank by and return the squared distances, the distances or the
+        Pearson correlation coef. The ranking is the same for squared
+        distances and distances but the square root is skipped. When None it
+        is derived from corr_coef.
+    start : int, Default None
+        Only search windows starting at or after this point.
+    stop : int, Default None
+        Only search windows ending before this point.
+    mask : array_like, Default None
+        Only search windows made of valid points. Either a boolean array of
+        the ts length that is True for valid points or a list of
+        (start, stop) intervals of valid points.
+    correction : str ('cid', 'length'), default None
+        Correct the distances with the complexity invariant distance (CID)
+        or divide them by the square root of the query length so profiles
+        of different query lengths are comparable.
+
+    Note
+    ----
+    Windows containing missing values (NaN) are never selected.
+
+    Returns
+    -------
+    Tuple (indices, values) - the starting indices and distances (or
+    correlation coef.) of the top k windows sorted from best to worst.
+
+    Raises
+    ------
+    ValueError
+        If ts is not a list or np.array.
+        If query is not a list or np.array.
+        If ts or query is not one dimensional.
+        If pieces is less than the length of the query.
+        If k is not an integer or is less than 1.
+        If option is not discords or motifs.
+        If exclusion_zone is not an integer or is less than 1.
+        If return_type is not squared, distance or correlation.
+        If start or stop is not an integer within the ts.
+        If mask is not a boolean array or a list of intervals.
+        If correction is not cid or length or is used with correlations.
+    """
+    ts, query = _precheck_mass3(ts, query, pieces)
+    return_type = mtscore.check_return_type(return_type, corr_coef)
+    corr_coef = (return_type == 'correlation')
+    squared = (return_type == 'squared')
+    correction = _check_correction(correction, return_type)
+    m = len(query)
+    ts, gaps = mtscore.fill_missing(ts, m)
+
+    option = option.lower()
+    if option not in ('discords', 'motifs'):
+        raise ValueError('option only accepts discords or motifs.')
+
+    largest = (option == 'discords') != corr_coef
+    buffer = _top_k.TopKBuffer(k, exclusion_zone, largest=largest)
+
+    if start is None and stop is None and mask is None:
+        runs = [(0, len(ts) - m + 1)]
+    else:
+        runs = mtscore.valid_window_runs(len(ts), m, start, stop, mask)
+
+    # only the pieces covering valid windows are computed and windows with
+    # missing values are never selected
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for first, last in runs:
+            x = ts[first:last + m - 1]
+
+            # the correction of a piece only depends on its own windows
+            for j, d in _mass3_pieces(
+                    x, query, pieces, normalize=normalize,
+                    corr_coef=corr_coef, squared=squared):
+                d = _correct(
+                    np.real(d), x[j:j + len(d) + m - 1], query, correction,
+                    normalize=normalize, squared=squared)
+                if gaps is not None:
+                    d = np.where(gaps[first + j:first + j + len(d)], np.nan, d)
+
+                buffer.push(first + j, d)
+
+    return buffer.result()
+
+
+def mass3_motif_set(ts, query, pieces, radius, exclusion_zone=None,
+                    normalize=True, corr_coef=False, return_type=None,
+                    start=None, stop=None, mask=None, correction=None,
+                    order='distance'):
+    """
+    Finds the motif set of a query, every occurrence within a radius of the
+    query, while MASS3 computes the distance profile piece by piece. Only
+    the windows within the radius are kept and the occurrences are selected
+    from the best to the worst honoring the exclusion zone, so the whole
+    distance profile is never materialized or sorted. To find the motif set
+    of a seed motif pass ts[i:i + m] as the query.
+
+    Parameters
+    ----------
+    ts : array_like
+        The time series to search.
+    query : array_like
+        The query or seed motif.
+    pieces : int
+        Number of points in a piece. It must be larger than the query length.
+    radius : float
+        The largest distance of an occurrence. With correlations it is the
+        smallest correlation coef. of an occurrence.
+    exclusion_zone : int, Default None
+        The minimum distance between occurrences. By default it is the query
+        length so occurrences never overlap.
+    normalize : bool, default True
+        Compute the z-normalized Euclidean distance. When False the raw
+        Euclidean distance is computed.
+    corr_coef : bool, default False
+        Optionally use the Pearson correlation coef. instead of distances.
+    return_type : str ('squared', 'distance', 'correlation'), default None
+        Use the squared distances, the distances or the Pearson correlation
+        coef. When None it is derived from corr_coef.
+    start : int, Default None
+        Only search windows starting at or after this point.
+    stop : int, Default None
+        Only search windows ending before this point.
+    mask : array_like, Default None
+        Only search windows made of valid points. Either a boolean array of
+        the ts length that is True for valid points or a list of
+        (start, stop) intervals of valid points.
+    correction : str ('cid', 'length'), default None
+        Correct the distances with the complexity invariant distance (CID)
+        or divide them by the square root of the query length.
+    order : str ('distance', 'index'), default 'distance'
+        Sort the occurrences from best to worst or by starting index.
+
+    Note
+    ----
+    Windows containing missing values (NaN) are never selected.
+
+    Returns
+    -------
+    Tuple (indices, values) - the starting indices and distances (or
+    correlation coef.) of the occurrences.
 
+    Raises
+    ------
+    ValueError
+        If ts is not a list or np.array.
+        If query is not a list or np.array.
+        If ts or query is not one dimensional.
+        If pieces is less than the length of the query.
+        If exclusion_zone is not an integer or is less than 1.
+        If order is not distance or index.
+        If return_type is not squared, distance or correlation.
+        If start or stop is not an integer within the ts.
+        If mask is not a boolean array or a list of intervals.
+        If correction is not cid or length or is used with correlations.
+    """
+    ts, query = _precheck_mass3(ts, query, pieces)
+    return_type = mtscore.check_return_type(return_type, corr_coef)
+    corr_coef = (return_type == 'correlation')
+    squared = (return_type == 'squared')
+    correction = _check_correction(correction, return_type)
     m = len(query)
-    
-    if pieces < m:
-        raise ValueError('pieces should be larger than the query length.')
-    
+    ts, gaps = mtscore.fill_missing(ts, m)
+
+    if exclusion_zone is None:
+        exclusion_zone = m
+
+    if not isinstance(exclusion_zone, int) or exclusion_zone < 1:
+        raise ValueError('exclusion_zone must be an integer of 1 or more.')
+
+    order = order.lower()
+    if order not in ('distance', 'index'):
+        raise ValueError('order only accepts distance or index.')
+
+    if start is None and stop is None and mask is None:
+        runs = [(0, len(ts) - m + 1)]
+    else:
+        runs = mtscore.valid_window_runs(len(ts), m, start, stop, mask)
+
+    # correlations are negated so the best occurrences are the smallest
+    sign = -1 if corr_coef else 1
+    limit = sign * radius
+    indices = [np.array([], dtype='int64')]
+    scores = [np.array([])]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for first, last in runs:
+            x = ts[first:last + m - 1]
+
+            # the correction of a piece only depends on its own windows
+            for j, d in _mass3_pieces(
+                    x, query, pieces, normalize=normalize,
+                    corr_coef=corr_coef, squared=squared):
+                d = sign * _correct(
+                    np.real(d), x[j:j + len(d) + m - 1], query, correction,
+                    normalize=normalize, squared=squared)
+                if gaps is not None:
+                    d[gaps[first + j:first + j + len(d)]] = np.nan
+
+                within = np.flatnonzero(d <= limit)
+                indices.append(within + first + j)
+                scores.append(d[within])
+
+    indices = np.concatenate(indices)
+    scores = np.concatenate(scores)
+    indices, scores = _top_k._greedy_select_all(
+        indices, scores, exclusion_zone)
+
+    if order == 'index':
+        positions = np.argsort(indices)
+        indices = indices[positions]
+        scores = scores[positions]
+
+    return (indices, sign * scores)
+
+
+def mass_multiscale(ts, query, lengths, normalize_length=True):
+    """
+    Compute the distance profiles for the given query resampled to several
+    lengths over the given time series in one pass. The spectrum of the time
+    series and its cumulative sums are computed once and shared by every
+    query length.
+
+    Parameters
+    ----------
+    ts : array_like
+        The array to create a rolling window on.
+    query : array_like
+        The query. It is linearly resampled to each of the lengths.
+    lengths : array_like
+        The query lengths to search for.
+    normalize_length : bool, default True
+        Divide each distance profile by the square root of its query length
+        so profiles of different lengths are comparable.
+
+    Returns
+    -------
+    A list of distance profiles, one for each length in the given order.
+
+    Raises
+    ------
+    ValueError
+        If ts is not a list or np.array.
+        If query is not a list or np.array.
+        If ts or query is not one dimensional.
+        If lengths is not array_like.
+        If a length is less than 2 or larger than the time series.
+    """
+    ts, query = mtscore.precheck_series_and_query(ts, query)
+
+    if not mtscore.is_array_like(lengths):
+        raise ValueError('lengths must be array like.')
+
     n = len(ts)
-    k = pieces
-    x = ts
-    dist = np.array([])
-    
-    # compute stats in O(n)
-    meany = np.mean(query)
-    sigmay = np.std(query)
-    
-    meanx = mtscore.moving_average(x, m)
-    meanx = np.append(np.ones([1, len(x) - len(meanx)]), meanx)
-    sigmax = mtscore.moving_std(x, m)
-    sigmax = np.append(np.zeros([1, len(x) - len(sigmax)]), sigmax)
-    
-    # reverse the query and append zeros
-    y = np.append(np.flip(query), np.zeros(pieces - m))
-    
-    step_size = k - m + 1
-    stop = n - k + 1
-       
-    for j in range(0, stop, step_size):
-        # The main trick of getting dot products in O(n log n) time
-        X = np.fft.fft(x[j:j + k])
-        Y = np.fft.fft(y)
-        
-        Z = X * Y
-        z = np.fft.ifft(Z)
-            
-        d = 2 * (m-(z[m - 1:k] - m * meanx[m + j - 1:j + k] * meany) /
-                   (sigmax[m + j - 1:j + k] * sigmay))
-        d = np.sqrt(d)
-        dist = np.append(dist, d)
-   
-    j = j + k - m
-    k = n - j - 1
-    if k >= m:
-        X = np.fft.fft(x[j:n-1])
-        y = y[0:k]
-
-        Y = np.fft.fft(y)
-        Z = X * Y
-        z = np.fft.ifft(Z)
-
-        d = 2 * (m-(z[m - 1:k] - m * meanx[j + m - 1:n - 1] * meany) /
-                 (sigmax[j + m - 1:n - 1] * sigmay))
-       
-        d = np.sqrt(d)
-        dist = np.append(dist, d)
-    
-    return np.array(dist)
\ No newline at end of file
+    for m in lengths:
+        if int(m) != m or m < 2 or m > n:
+            raise ValueError(
+                'lengths must be integers between 2 and the ts length.')
+
+    sums = mtscore.cumulative_sums(ts)
+    X = np.fft.rfft(ts)
+    source = np.linspace(0, 1, len(query))
+
+    dists = []
+    for m in lengths:
+        m = int(m)
+        y = np.interp(np.linspace(0, 1, m), source, query)
+        meany = np.mean(y)
+        sigmay = np.std(y)
+        meanx, sigmax = mtscore.moving_mean_std(ts, m, sums=sums)
+
+        Y = np.fft.rfft(np.flip(y), n)
+        z = np.fft.irfft(X * Y, n)
+
+        dist = 2 * (m - (z[m - 1:n] - m * meanx * meany) / (sigmax * sigmay))
+        dist = np.sqrt(np.maximum(dist, 0))
+
+        if normalize_length:
+            dist = dist / np.sqrt(m)
+
+        dists.append(dist)
+
+    return dists
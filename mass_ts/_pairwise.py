@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module contains all logic used for the pairwise distances between
+equal length subsequences. Aligned distances are computed with matrix
+multiplications and shift invariant distances with batched FFTs, chunk by
+chunk of rows to bound the memory used.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+range = getattr(__builtins__, 'xrange', range)
+# end of py2 compatability boilerplate
+
+import numpy as np
+
+from mass_ts import core as mtscore
+
+
+def _znormalize_rows(a):
+    """
+    Z-normalizes every row of a two dimensional array. Constant rows are
+    normalized to zeros.
+    """
+    mean = np.mean(a, axis=1, keepdims=True)
+    std = np.std(a, axis=1, keepdims=True)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = (a - mean) / std
+
+    a[std[:, 0] == 0] = 0
+
+    return a
+
+
+def _shifted_dots(spectra, block, m, lags):
+    """
+    Computes the largest circular cross correlation over the allowed lags
+    between the rows of a block and every row.
+
+    Parameters
+    ----------
+    spectra : np.array
+        The real FFT of every row.
+    block : slice
+        The rows of the block.
+    m : int
+        The row length.
+    lags : np.array
+        The allowed lags.
+
+    Returns
+    -------
+    An array of the largest dot products of shape (block rows, rows).
+    """
+    cc = np.fft.irfft(
+        spectra[block, np.newaxis, :] * np.conj(spectra[np.newaxis, :, :]),
+        n=m, axis=2)
+
+    return np.max(cc[:, :, lags], axis=2)
+
+
+def pairwise_distances(subsequences, shift_invariant=False, max_shift=None,
+                       normalize=True, return_type='distance',
+                       chunk_size=None):
+    """
+    Computes the distance matrix of equal length subsequences. The aligned
+    distances are computed with one matrix multiplication per chunk of rows.
+    The shift invariant distances are the smallest distances over circular
+    shifts of one subsequence against the other and are computed with
+    batched FFTs.
+
+    Parameters
+    ----------
+    subsequences : array_like
+        A two dimensional array with one subsequence per row.
+    shift_invariant : bool, Default False
+        Return the smallest distance over all circular shifts.
+    max_shift : int, Default None
+        The largest shift considered when shift_invariant is True. By default
+        all shifts are considered.
+    normalize : bool, Default True
+        Compute the z-normalized Euclidean distance. When False the raw
+        Euclidean distance is computed. Constant subsequences are
+        z-normalized to zeros.
+    return_type : str ('squared', 'distance', 'correlation'), Default
+        'distance'
+        Return the squared distances, the distances or the Pearson
+        correlation coef. The correlation is always computed from the
+        z-normalized subsequences.
+    chunk_size : int, Default None
+        The number of rows computed at once. By default it is chosen so the
+        cross correlations of a chunk use about 64 MiB.
+
+    Returns
+    -------
+    A symmetric array of shape (k, k) for k subsequences.
+
+    Raises
+    ------
+    ValueError
+        If subsequences is not two dimensional array_like.
+        If the subsequences are shorter than 2 points.
+        If max_shift is not an integer >= 0.
+        If chunk_size is not an integer > 0.
+        If return_type is not squared, distance or correlation.
+    """
+    try:
+        a = np.array(subsequences, dtype='float64')
+    except (TypeError, ValueError):
+        raise ValueError('subsequences must be a two dimensional array.')
+
+    if a.ndim != 2 or a.shape[1] < 2:
+        raise ValueError(
+            'subsequences must be a two dimensional array of rows with 2 or '
+            'more points.')
+
+    if max_shift is not None and \
+            (not isinstance(max_shift, int) or max_shift < 0):
+        raise ValueError('max_shift must be an integer >= 0.')
+
+    if chunk_size is not None and \
+            (not isinstance(chunk_size, int) or chunk_size < 1):
+        raise ValueError('chunk_size must be an integer > 0.')
+
+    return_type = mtscore.check_return_type(return_type)
+    k, m = a.shape
+
+    if normalize or return_type == 'correlation':
+        a = _znormalize_rows(a)
+
+    norms = np.sum(a ** 2, axis=1)
+
+    if shift_invariant:
+        spectra = np.fft.rfft(a, axis=1)
+        lags = np.arange(m)
+        if max_shift is not None:
+            lags = lags[(lags <= max_shift) | (lags >= m - max_shift)]
+
+    if chunk_size is None:
+        row_bytes = 8 * k * (2 * m if shift_invariant else 1)
+        chunk_size = max(1, 2 ** 26 // row_bytes)
+
+    out = np.empty((k, k))
+    for start in range(0, k, chunk_size):
+        block = slice(start, min(k, start + chunk_size))
+
+        if shift_invariant:
+            out[block] = _shifted_dots(spectra, block, m, lags)
+        else:
+            out[block] = np.dot(a[block], a.T)
+
+    if return_type == 'correlation':
+        return out / m
+
+    # the squared distances follow from the norms and dot products
+    out = norms[:, np.newaxis] + norms[np.newaxis, :] - 2 * out
+    np.maximum(out, 0, out=out)
+    np.fill_diagonal(out, 0)
+
+    if return_type == 'distance':
+        np.sqrt(out, out=out)
+
+    return out
@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module contains all logic used for the memory budgeted search planner.
+The memory and time of MASS2, MASS3 and MASS2 batch are estimated from the
+time series and query lengths and a calibration of the host, and the fastest
+strategy fitting in the memory limit is run.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+range = getattr(__builtins__, 'xrange', range)
+# end of py2 compatability boilerplate
+
+from multiprocessing import cpu_count
+import os
+import time
+
+import numpy as np
+
+import mass_ts as mts
+from mass_ts import _cache as mtscache
+from mass_ts import core as mtscore
+
+
+_calibration = None
+
+# the approximate number of bytes held per point by each strategy, covering
+# the complex spectra, the dot products and the rolling statistics
+MASS2_BYTES_PER_POINT = 96
+MASS3_BYTES_PER_POINT = 96
+
+# the batched statistics use cumulative sums along the rows, so the bytes
+# per point do not grow with the query length
+BATCH_BYTES_PER_POINT = 80
+
+# mass3 holds the complex pieces and their concatenation
+PROFILE_BYTES_PER_WINDOW = 32
+
+# the batched single process mass2_batch path transforms 64 batches at once
+BATCH_CHUNK_SIZE = 64
+
+# the cost of starting one worker process in seconds
+PROCESS_START_SECONDS = 0.05
+
+# the python overhead of computing one mass3 piece in seconds, besides its
+# FFTs
+MASS3_PIECE_SECONDS = 5e-5
+
+
+def calibrate(size=2 ** 16, repeat=5):
+    """
+    Measures the speed of the FFT on this host. The result is cached and used
+    by the planner.
+
+    Parameters
+    ----------
+    size : int, Default 2 ** 16
+        The FFT size to time.
+    repeat : int, Default 5
+        The number of timings. The fastest one is used.
+
+    Returns
+    -------
+    A dict with the seconds per n log2(n) unit of an FFT, 'fft', and the
+    fixed overhead of one small FFT call in seconds, 'overhead'.
+    """
+    global _calibration
+
+    x = np.random.RandomState(0).randn(size)
+    small = x[:16]
+
+    def best(func):
+        timings = []
+        for i in range(repeat):
+            start = time.time()
+            func()
+            timings.append(time.time() - start)
+
+        return max(min(timings), 1e-9)
+
+    overhead = best(lambda: [np.fft.fft(small) for i in range(100)]) / 100
+    fft = (best(lambda: np.fft.fft(x)) - overhead) / (size * np.log2(size))
+
+    _calibration = {'fft': max(float(fft), 1e-12), 'overhead': overhead}
+
+    return _calibration
+
+
+def get_calibration():
+    """
+    Returns the host calibration, measuring it on first use.
+    """
+    if _calibration is None:
+        calibrate()
+
+    return _calibration
+
+
+def available_memory():
+    """
+    Returns the available physical memory in bytes. It falls back to 1 GiB
+    when it cannot be determined.
+    """
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return 2 ** 30
+
+
+def _fft_seconds(size, calibration):
+    """
+    Estimates the seconds of one FFT of the given size.
+    """
+    return float(calibration['fft'] * size * np.log2(max(size, 2)) +
+                 calibration['overhead'])
+
+
+def _rfft_seconds(size, calibration):
+    """
+    Estimates the seconds of one real FFT, or inverse real FFT, of the given
+    size. It does about half the work of a complex FFT.
+    """
+    return float(calibration['fft'] * size * np.log2(max(size, 2)) / 2 +
+                 calibration['overhead'])
+
+
+def _powers_of_two(low, high):
+    """
+    Returns the powers of two from the first one >= low up to high.
+    """
+    size = 1 << int(max(low, 2) - 1).bit_length()
+    sizes = []
+    while size <= high:
+        sizes.append(size)
+        size *= 2
+
+    return sizes
+
+
+def _candidates(n, m, n_jobs, top_matches, calibration, query_cached=False):
+    """
+    Estimates the memory and time of every strategy and parameter choice.
+    The query spectrum of mass2 costs nothing when it is in the query cache.
+
+    Returns
+    -------
+    A list of plan dicts.
+    """
+    windows = n - m + 1
+    candidates = []
+
+    if top_matches is None:
+        # mass2 takes the real FFT of the time series and the inverse of the
+        # product, plus the query spectrum unless it is cached
+        transforms = 2 if query_cached else 3
+        candidates.append({
+            'algorithm': 'mass2',
+            'memory': MASS2_BYTES_PER_POINT * n,
+            'seconds': transforms * _rfft_seconds(n, calibration),
+        })
+
+        for k in _powers_of_two(2 * m, n):
+            pieces = -(-windows // (k - m + 1))
+            candidates.append({
+                'algorithm': 'mass3',
+                'pieces': k,
+                'memory': PROFILE_BYTES_PER_WINDOW * windows +
+                MASS3_BYTES_PER_POINT * k,
+                'seconds': pieces * (
+                    2 * _fft_seconds(k, calibration) + MASS3_PIECE_SECONDS),
+            })
+
+        return candidates
+
+    for b in _powers_of_two(2 * m, n):
+        batches = n // b
+        if batches < top_matches:
+            break
+
+        seconds = batches * 2 * _fft_seconds(b, calibration)
+        chunk = min(batches, BATCH_CHUNK_SIZE)
+        candidates.append({
+            'algorithm': 'mass2_batch',
+            'batch_size': b,
+            'n_jobs': 1,
+            'memory': chunk * BATCH_BYTES_PER_POINT * b,
+            'seconds': seconds,
+        })
+
+        jobs = min(n_jobs, batches)
+        if jobs > 1:
+            candidates.append({
+                'algorithm': 'mass2_batch',
+                'batch_size': b,
+                'n_jobs': jobs,
+                'memory': jobs * MASS2_BYTES_PER_POINT * b,
+                'seconds': seconds / jobs + jobs * PROCESS_START_SECONDS,
+            })
+
+    return candidates
+
+
+def plan_search(n, m, memory_limit=None, n_jobs=1, top_matches=None,
+                calibration=None, query_cached=False):
+    """
+    Chooses the fastest search strategy and its parameters that fits within
+    the memory limit. Without top_matches the full distance profile is needed
+    and MASS2 or MASS3 with the best piece size is chosen. With top_matches
+    MASS2 batch with the best batch size is chosen.
+
+    Parameters
+    ----------
+    n : int
+        The length of the time series.
+    m : int
+        The length of the query.
+    memory_limit : int, Default None
+        The memory budget in bytes. By default it is the available memory.
+    n_jobs : int, Default 1
+        The number of processes MASS2 batch may use. Setting it to < 1 uses
+        the number of available cpus.
+    top_matches : int, Default None
+        The number of matches wanted instead of the distance profile.
+    calibration : dict, Default None
+        The host calibration returned by calibrate. By default the cached
+        calibration is used.
+    query_cached : bool, Default False
+        The MASS2 query spectrum is in the query cache.
+
+    Returns
+    -------
+    A dict describing the plan. It holds the algorithm, its parameters
+    (pieces, batch_size and n_jobs), the estimated memory in bytes and
+    seconds and the number of strategies considered as candidates.
+
+    Raises
+    ------
+    ValueError
+        If m is less than 2 or larger than n.
+        If top_matches is < 1 or is not an integer.
+        If no strategy fits within the memory limit.
+    """
+    if m < 2 or m > n:
+        raise ValueError(
+            'the query length must be between 2 and the ts length.')
+
+    if top_matches is not None and \
+            (not isinstance(top_matches, int) or top_matches < 1):
+        raise ValueError('top_matches must be an integer > 0.')
+
+    if memory_limit is None:
+        memory_limit = available_memory()
+
+    if n_jobs < 1:
+        n_jobs = cpu_count()
+
+    if calibration is None:
+        calibration = get_calibration()
+
+    candidates = _candidates(
+        n, m, n_jobs, top_matches, calibration, query_cached=query_cached)
+    fitting = [c for c in candidates if c['memory'] <= memory_limit]
+
+    if not fitting:
+        raise ValueError(
+            'no search strategy fits within {} bytes.'.format(memory_limit))
+
+    plan = dict(min(fitting, key=lambda c: c['seconds']))
+    plan['memory_limit'] = memory_limit
+    plan['candidates'] = len(candidates)
+
+    return plan
+
+
+def search(ts, query, memory_limit=None, n_jobs=1, top_matches=None,
+           normalize=True, return_type=None, calibration=None):
+    """
+    Searches the query over the time series with the fastest strategy that
+    fits within the memory limit. See plan_search for how it is chosen.
+
+    Parameters
+    ----------
+    ts : array_like
+        The time series.
+    query : array_like
+        The query.
+    memory_limit : int, Default None
+        The memory budget in bytes. By default it is the available memory.
+    n_jobs : int, Default 1
+        The number of processes MASS2 batch may use. Setting it to < 1 uses
+        the number of available cpus.
+    top_matches : int, Default None
+        Return the top matches found with MASS2 batch instead of the distance
+        profile.
+    normalize : bool, Default True
+        Compute the z-normalized Euclidean distance. When False the raw
+        Euclidean distance is computed.
+    return_type : str ('squared', 'distance', 'correlation'), Default None
+        Return the squared distances, the distances or the Pearson
+        correlation coef.
+    calibration : dict, Default None
+        The host calibration returned by calibrate.
+
+    Returns
+    -------
+    Tuple (result, plan) - the distance profile, or the tuple (indices,
+    distances) when top_matches is given, and the plan dict that was run.
+
+    Raises
+    ------
+    ValueError
+        If ts is not a list or np.array.
+        If query is not a list or np.array.
+        If ts or query is not one dimensional.
+        If top_matches is < 1 or is not an integer.
+        If no strategy fits within the memory limit.
+    """
+    ts, query = mtscore.precheck_series_and_query(ts, query)
+    plan = plan_search(
+        len(ts), len(query), memory_limit=memory_limit, n_jobs=n_jobs,
+        top_matches=top_matches, calibration=calibration,
+        query_cached=mtscache.is_query_cached(query, ('rfft', len(ts))))
+
+    if plan['algorithm'] == 'mass2':
+        result = mts.mass2(
+            ts, query, normalize=normalize, return_type=return_type)
+    elif plan['algorithm'] == 'mass3':
+        # mass3 returns complex values, the result type must not depend on
+        # the plan
+        result = np.real(mts.mass3(
+            ts, query, plan['pieces'], normalize=normalize,
+            return_type=return_type))
+    else:
+        result = mts.mass2_batch(
+            ts, query, plan['batch_size'], top_matches=top_matches,
+            n_jobs=plan['n_jobs'], normalize=normalize,
+            return_type=return_type)
+
+    return (result, plan)
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module contains all logic used for the compact distance profile result
+type. Distances are stored as real values and derived views are computed
+lazily on demand.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+range = getattr(__builtins__, 'xrange', range)
+# end of py2 compatability boilerplate
+
+import numpy as np
+
+from mass_ts import core as mtscore
+from mass_ts import _mass_ts
+from mass_ts import _top_k
+
+
+class DistanceProfile(object):
+    """
+    A distance profile stored as a real float32 or float64 array, optionally
+    as squared distances so the square root is skipped until the distances
+    are read. The correlation coef., sorted order and top k are computed
+    lazily and slicing returns views without copying.
+
+    Parameters
+    ----------
+    values : array_like
+        The real distances or squared distances.
+    m : int
+        The query length the profile was computed with.
+    squared : bool, Default False
+        The values are squared distances.
+    offset : int, Default 0
+        The index of the first value within the full profile. Slices keep
+        track of it so indices are reported in the original positions.
+    normalize : bool, Default True
+        The values are z-normalized distances.
+    """
+
+    def __init__(self, values, m, squared=False, offset=0, normalize=True):
+        values = np.asarray(values)
+        if np.iscomplexobj(values):
+            values = np.real(values)
+
+        self.values = values
+        self.m = m
+        self.squared = squared
+        self.offset = offset
+        self.normalize = normalize
+        self._distances = None
+        self._order = None
+
+    def __len__(self):
+        return len(self.values)
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None:
+            return self.distances
+
+        return self.distances.astype(dtype)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                raise ValueError('only contiguous slices are supported.')
+
+            return DistanceProfile(
+                self.values[start:stop], self.m, squared=self.squared,
+                offset=self.offset + start, normalize=self.normalize)
+
+        if self.squared:
+            return np.sqrt(np.maximum(self.values[key], 0))
+
+        return self.values[key]
+
+    @property
+    def dtype(self):
+        """
+        The dtype of the stored values.
+        """
+        return self.values.dtype
+
+    @property
+    def nbytes(self):
+        """
+        The number of bytes of the stored values.
+        """
+        return self.values.nbytes
+
+    @property
+    def distances(self):
+        """
+        The distances. The square root is computed once on first access when
+        squared distances are stored.
+        """
+        if not self.squared:
+            return self.values
+
+        if self._distances is None:
+            self._distances = np.sqrt(np.maximum(self.values, 0))
+
+        return self._distances
+
+    @property
+    def squared_distances(self):
+        """
+        The squared distances.
+        """
+        if self.squared:
+            return self.values
+
+        return self.values ** 2
+
+    @property
+    def corr_coef(self):
+        """
+        The Pearson correlation coef. derived from the z-normalized
+        distances.
+
+        Raises
+        ------
+        ValueError
+            If the profile holds raw Euclidean distances.
+        """
+        if not self.normalize:
+            raise ValueError(
+                'corr_coef requires z-normalized distances (normalize=True).')
+
+        return 1 - self.squared_distances / (2 * self.m)
+
+    @property
+    def order(self):
+        """
+        The indices that sort the profile in ascending order of distance. It
+        is computed once on first access.
+        """
+        if self._order is None:
+            self._order = np.argsort(self.values, kind='mergesort')
+
+        return self._order
+
+    def argmin(self):
+        """
+        Returns the index of the smallest distance.
+        """
+        return self.offset + int(np.nanargmin(self.values))
+
+    def top_k(self, k, exclusion_zone, option='motifs'):
+        """
+        Finds the top k motifs or discords honoring the exclusion zone.
+
+        Parameters
+        ----------
+        k : int
+            The number of results you want returned.
+        exclusion_zone : int
+            The buffer around a found index to exclude results from.
+        option : str ('motifs', 'discords'), Default 'motifs'
+            Specify if you want to find motifs or discords.
+
+        Returns
+        -------
+        Tuple (indices, distances) sorted from best to worst.
+
+        Raises
+        ------
+        ValueError
+            If k is not an integer or is less than 1.
+            If option is not discords or motifs.
+            If exclusion_zone is not an integer or is less than 1.
+        """
+        option = option.lower()
+        if option not in ('discords', 'motifs'):
+            raise ValueError('option only accepts discords or motifs.')
+
+        buffer = _top_k.TopKBuffer(
+            k, exclusion_zone, largest=(option == 'discords'))
+        buffer.push(self.offset, self.values)
+        indices, values = buffer.result()
+
+        if self.squared:
+            values = np.sqrt(np.maximum(values, 0))
+
+        return (indices, values)
+
+
+def distance_profile(ts, query, pieces=None, squared=False, dtype='float64',
+                     normalize=True):
+    """
+    Compute the distance profile for the given query over the given time
+    series as a compact DistanceProfile. The distances are stored as real
+    values instead of complex ones and can be kept squared to skip the
+    square root.
+
+    Parameters
+    ----------
+    ts : array_like
+        The array to create a rolling window on.
+    query : array_like
+        The query.
+    pieces : int, Default None
+        Compute the profile with MASS3 using this many points per piece. By
+        default MASS2 is used.
+    squared : bool, Default False
+        Store squared distances.
+    dtype : str or np.dtype, Default 'float64'
+        The dtype of the stored values, e.g. 'float32' to halve the memory.
+    normalize : bool, Default True
+        Compute the z-normalized Euclidean distance. When False the raw
+        Euclidean distance is computed.
+
+    Note
+    ----
+    Missing values (NaN) are zero filled for the convolution and the windows
+    containing them are inf.
+
+    Returns
+    -------
+    A DistanceProfile.
+
+    Raises
+    ------
+    ValueError
+        If ts is not a list or np.array.
+        If query is not a list or np.array.
+        If ts or query is not one dimensional.
+        If pieces is less than the length of the query.
+    """
+    if pieces is None:
+        ts, query = mtscore.precheck_series_and_query(ts, query)
+    else:
+        ts, query = _mass_ts._precheck_mass3(ts, query, pieces)
+
+    m = len(query)
+    ts, gaps = mtscore.fill_missing(ts, m)
+    values = np.empty(len(ts) - m + 1, dtype=dtype)
+
+    # windows made of filled zeros have no deviation and are replaced below
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if pieces is None:
+            parts = [(0, _mass_ts._mass2(
+                ts, query, normalize=normalize, squared=True))]
+        else:
+            parts = _mass_ts._mass3_pieces(
+                ts, query, pieces, normalize=normalize, squared=True)
+
+        for start, dist in parts:
+            dist = np.maximum(np.real(dist), 0)
+            if not squared:
+                dist = np.sqrt(dist)
+
+            values[start:start + len(dist)] = dist
+
+    # windows containing missing values are never selected
+    if gaps is not None:
+        values[gaps] = np.inf
+
+    return DistanceProfile(values, m, squared=squared, normalize=normalize)
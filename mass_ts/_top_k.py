@@ -15,9 +15,219 @@ range = getattr(__builtins__, 'xrange', range)
 import numpy as np
 
 from mass_ts import core as mtscore
+from mass_ts import _jit as mtsjit
 
 
-def _top_k(distance_profile, k, exclusion_zone, option):
+def _greedy_select(indices, distances, k, exclusion_zone):
+    """
+    Selects up to k of the given candidates in ascending order of distance
+    while skipping any candidate within the exclusion zone of an already
+    selected candidate. Non-finite distances are never selected.
+
+    Parameters
+    ----------
+    indices : np.array
+        The candidate starting indices.
+    distances : np.array
+        The candidate distances.
+    k : int
+        The number of results you want returned.
+    exclusion_zone : int
+        The buffer around a found index to exclude results from being apart of.
+
+    Returns
+    -------
+    Tuple (indices, distances) of the selected candidates sorted by distance.
+    """
+    indices = np.asarray(indices)
+    distances = np.asarray(distances)
+
+    # non-finite values are dropped first, a negated inf of a discord search
+    # would otherwise be ranked first
+    finite = np.isfinite(distances)
+    if not finite.all():
+        indices = indices[finite]
+        distances = distances[finite]
+
+    # every candidate skipped before k are found lies within the exclusion
+    # zone of a selected one, so only the best few need to be sorted
+    limit = k * (2 * exclusion_zone + 1)
+    if len(distances) > limit:
+        order = np.argpartition(distances, limit)[:limit]
+        order = order[np.argsort(distances[order], kind='mergesort')]
+    else:
+        order = np.argsort(distances, kind='mergesort')
+
+    found = []
+
+    for pos in order:
+        if len(found) >= k:
+            break
+
+        idx = indices[pos]
+        if all(abs(idx - indices[f]) >= exclusion_zone for f in found):
+            found.append(pos)
+
+    found = np.array(found, dtype='int64')
+
+    return (indices[found], distances[found])
+
+
+def _greedy_select_all(indices, distances, exclusion_zone):
+    """
+    Greedily selects every candidate from the best to the worst unless it
+    lies within the exclusion zone of an already selected candidate. Only
+    the candidates are sorted, never the whole distance profile.
+
+    Parameters
+    ----------
+    indices : np.array
+        The candidate starting indices sorted in ascending order.
+    distances : np.array
+        The candidate distances.
+    exclusion_zone : int
+        The buffer around a found index to exclude results from being apart of.
+
+    Returns
+    -------
+    Tuple (indices, distances) of the selected candidates sorted by distance.
+    """
+    indices = np.asarray(indices)
+    distances = np.asarray(distances)
+    blocked = np.zeros(len(indices), dtype='bool')
+
+    # the candidates within the exclusion zone of each candidate
+    lows = np.searchsorted(indices, indices - exclusion_zone + 1, side='left')
+    highs = np.searchsorted(indices, indices + exclusion_zone - 1,
+                            side='right')
+
+    found = []
+    for pos in np.argsort(distances, kind='mergesort'):
+        if blocked[pos] or not np.isfinite(distances[pos]):
+            continue
+
+        found.append(pos)
+        blocked[lows[pos]:highs[pos]] = True
+
+    found = np.array(found, dtype='int64')
+
+    return (indices[found], distances[found])
+
+
+def _greedy_candidates(indices, distances, k, exclusion_zone):
+    """
+    Keeps the finite candidates greedy selection of k could ever examine,
+    i.e. the best k * (2 * exclusion_zone + 1) of them. Greedy selection over the union
+    of the candidates of several pieces equals greedy selection over the
+    pieces combined.
+
+    Parameters
+    ----------
+    indices : np.array
+        The candidate starting indices.
+    distances : np.array
+        The candidate distances.
+    k : int
+        The number of results you want returned.
+    exclusion_zone : int
+        The buffer around a found index to exclude results from being apart of.
+
+    Returns
+    -------
+    Tuple (indices, distances) of the kept candidates in no particular order.
+    """
+    indices = np.asarray(indices)
+    distances = np.asarray(distances)
+
+    finite = np.isfinite(distances)
+    if not finite.all():
+        indices = indices[finite]
+        distances = distances[finite]
+
+    limit = k * (2 * exclusion_zone + 1)
+    if len(distances) > limit:
+        keep = np.argpartition(distances, limit)[:limit]
+        return (indices[keep], distances[keep])
+
+    return (indices, distances)
+
+
+class TopKBuffer(object):
+    """
+    A bounded buffer of the best k candidates of a distance profile that is
+    consumed piece by piece. Only the candidates greedy selection could ever
+    examine are kept from every pushed piece, so the result equals greedy
+    selection over the whole profile while the memory used is
+    O(k * exclusion_zone + piece) instead of the length of the profile.
+
+    Parameters
+    ----------
+    k : int
+        The number of results you want returned.
+    exclusion_zone : int
+        The buffer around a found index to exclude results from being apart of.
+    largest : bool, Default False
+        Keep the largest values instead of the smallest, i.e. discords.
+
+    Raises
+    ------
+    ValueError
+        If k is not an integer or is less than 1.
+        If exclusion_zone is not an integer or is less than 1.
+    """
+
+    def __init__(self, k, exclusion_zone, largest=False):
+        if not isinstance(k, int) or k < 1:
+            raise ValueError('k must be an integer of 1 or more.')
+
+        if not isinstance(exclusion_zone, int) or exclusion_zone < 1:
+            raise ValueError('exclusion_zone must be an integer of 1 or more.')
+
+        self.k = k
+        self.exclusion_zone = exclusion_zone
+        self.largest = largest
+        self._indices = np.array([], dtype='int64')
+        self._scores = np.array([])
+
+    def push(self, start, values):
+        """
+        Merges a piece of the distance profile into the buffer.
+
+        Parameters
+        ----------
+        start : int
+            The index of the first value of the piece within the profile.
+        values : array_like
+            The values of the piece.
+        """
+        scores = np.asarray(values, dtype='float64')
+        if self.largest:
+            scores = -scores
+
+        # the raw candidates are kept, selecting within a piece first would
+        # let a candidate block its neighbours across the piece boundary
+        self._indices, self._scores = _greedy_candidates(
+            np.concatenate((self._indices, np.arange(len(scores)) + start)),
+            np.concatenate((self._scores, scores)),
+            self.k, self.exclusion_zone)
+
+    def result(self):
+        """
+        Returns the best candidates found so far.
+
+        Returns
+        -------
+        Tuple (indices, values) sorted from best to worst.
+        """
+        indices, scores = _greedy_select(
+            self._indices, self._scores, self.k, self.exclusion_zone)
+        values = -scores if self.largest else scores
+
+        return (indices, values)
+
+
+def _top_k(distance_profile, k, exclusion_zone, option,
+           return_type='distance'):
     """
     Finds top k discords or motifs given an exclusion zone. The exclusion zone
     acts as a buffer between a found index on the left and right hand side. 
@@ -35,6 +245,9 @@ def _top_k(distance_profile, k, exclusion_zone, option):
         The buffer around a found index to exclude results from being apart of.
     option : str ('motifs', 'discords')
         Specify if you want to find motifs or discords.
+    return_type : str ('squared', 'distance', 'correlation')
+        The values of the distance profile. Correlation profiles are ranked
+        in descending order.
     
     Returns
     -------
@@ -47,6 +260,7 @@ def _top_k(distance_profile, k, exclusion_zone, option):
         If k is not an integer or is less than 1.
         If option is not discords or motifs.
         If exclusion_zone is not an integer or is less than 1.
+        If return_type is not squared, distance or correlation.
     """
     # perform value checking
     if not mtscore.is_array_like(distance_profile):
@@ -64,34 +278,26 @@ def _top_k(distance_profile, k, exclusion_zone, option):
     if not isinstance(exclusion_zone, int) or exclusion_zone < 1:
         raise ValueError('exclusion_zone must be an integer of 1 or more.')
 
+    return_type = mtscore.check_return_type(return_type)
+
     distance_profile = mtscore.to_np_array(distance_profile)
-    n = len(distance_profile)
-    found = []
     tmp = distance_profile.copy()
     
-    # obtain indices in ascending order
-    indices = np.argpartition(tmp, k)
-    
-    # created flipped view for discords
-    if option == 'discords':
-        indices = indices[::-1]
-
-    for idx in indices:
-        if not np.isinf(tmp[idx]):
-            found.append(idx)
-
-        # apply exclusion zone
-        exclusion_zone_start = np.max([0, idx - exclusion_zone])
-        exclusion_zone_end = np.min([n, idx + exclusion_zone])
-        tmp[exclusion_zone_start:exclusion_zone_end] = np.inf
+    # obtain the best indices first, correlations and discords rank the
+    # other way
+    if (return_type == 'correlation') != (option == 'discords'):
+        indices = np.argpartition(-tmp, k)
+    else:
+        indices = np.argpartition(tmp, k)
 
-        if len(found) >= k:
-            break
+    found = mtsjit.top_k_exclusion(
+        tmp, np.ascontiguousarray(indices), k, exclusion_zone)
 
-    return found
+    return list(found)
 
 
-def top_k_motifs(distance_profile, k, exclusion_zone):
+def top_k_motifs(distance_profile, k, exclusion_zone,
+                 return_type='distance'):
     """
     Finds top k motifs given an exclusion zone. The exclusion zone acts as a 
     buffer between a found index on the left and right hand side. For example, 
@@ -107,6 +313,9 @@ def top_k_motifs(distance_profile, k, exclusion_zone):
         The number of results you want returned.
     exclusion_zone : int
         The buffer around a found index to exclude results from being apart of.
+    return_type : str ('squared', 'distance', 'correlation')
+        The values of the distance profile. Correlation profiles are ranked
+        in descending order.
     
     Returns
     -------
@@ -118,11 +327,15 @@ def top_k_motifs(distance_profile, k, exclusion_zone):
         If distance_profile is not array_like.
         If k is not an integer or is less than 1.
         If exclusion_zone is not an integer or is less than 1.
+        If return_type is not squared, distance or correlation.
     """
-    return _top_k(distance_profile, k, exclusion_zone, 'motifs')
+    return _top_k(
+        distance_profile, k, exclusion_zone, 'motifs',
+        return_type=return_type)
 
 
-def top_k_discords(distance_profile, k, exclusion_zone):
+def top_k_discords(distance_profile, k, exclusion_zone,
+                   return_type='distance'):
     """
     Finds top k discords given an exclusion zone. The exclusion zone acts as a 
     buffer between a found index on the left and right hand side. For example, 
@@ -138,6 +351,9 @@ def top_k_discords(distance_profile, k, exclusion_zone):
         The number of results you want returned.
     exclusion_zone : int
         The buffer around a found index to exclude results from being apart of.
+    return_type : str ('squared', 'distance', 'correlation')
+        The values of the distance profile. Correlation profiles are ranked
+        in descending order.
     
     Returns
     -------
@@ -149,5 +365,8 @@ def top_k_discords(distance_profile, k, exclusion_zone):
         If distance_profile is not array_like.
         If k is not an integer or is less than 1.
         If exclusion_zone is not an integer or is less than 1.
+        If return_type is not squared, distance or correlation.
     """
-    return _top_k(distance_profile, k, exclusion_zone, 'discords')
\ No newline at end of file
+    return _top_k(
+        distance_profile, k, exclusion_zone, 'discords',
+        return_type=return_type)
\ No newline at end of file
@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module contains the mass-ts command line interface for bulk similarity
+searches over files.
+
+Example Usage
+-------------
+$ mass-ts ts.txt query1.txt query2.txt --algorithm mass3 --pieces 4096 \
+    --n-jobs 4 --output profiles.csv
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+range = getattr(__builtins__, 'xrange', range)
+# end of py2 compatability boilerplate
+
+import argparse
+from concurrent.futures import (
+    ProcessPoolExecutor, ThreadPoolExecutor, as_completed)
+import csv
+import io
+from multiprocessing import cpu_count
+import os
+import sys
+import time
+
+import numpy as np
+
+import mass_ts as mts
+from mass_ts import core as mtscore
+
+
+ALGORITHMS = (
+    'mass', 'mass2', 'mass3', 'mass2_batch', 'mass3_top_k', 'top_k_motifs',
+    'top_k_discords',
+)
+
+# the time series loaded by a worker process, keyed by how it was loaded
+_worker_series = {}
+
+
+def _search(ts, query, args):
+    """
+    Runs the selected algorithm for one query.
+
+    Returns
+    -------
+    Either a distance profile or a tuple (indices, values).
+    """
+    algorithm = args.algorithm
+    normalize = not args.no_normalize
+    return_type = args.return_type
+    exclusion_zone = args.exclusion_zone
+    if exclusion_zone is None:
+        exclusion_zone = max(1, len(query) // 2)
+
+    if algorithm == 'mass':
+        return mts.mass(
+            ts, query, normalize=normalize, return_type=return_type)
+
+    if algorithm == 'mass3':
+        return mts.mass3(
+            ts, query, args.pieces, normalize=normalize,
+            return_type=return_type)
+
+    if algorithm == 'mass2_batch':
+        return mts.mass2_batch(
+            ts, query, args.batch_size, top_matches=args.k,
+            normalize=normalize, return_type=return_type)
+
+    if algorithm == 'mass3_top_k':
+        return mts.mass3_top_k(
+            ts, query, args.pieces, args.k, exclusion_zone,
+            option=args.option, normalize=normalize, return_type=return_type)
+
+    profile = mts.mass2(
+        ts, query, normalize=normalize, return_type=return_type)
+
+    if algorithm in ('top_k_motifs', 'top_k_discords'):
+        find = getattr(mts, algorithm)
+        indices = np.array(find(
+            profile, args.k, exclusion_zone,
+            return_type=return_type or 'distance'), dtype='int64')
+
+        return (indices, np.real(profile[indices]))
+
+    return profile
+
+
+def _load_worker_series(args):
+    """
+    Loads the time series once per worker process so it is never pickled
+    with the queries. Memory mapped series share the page cache.
+    """
+    key = (args.series, args.dtype, args.mmap, args.sidecar)
+    if key not in _worker_series:
+        _worker_series.clear()
+        _worker_series[key] = mtscore.load_series(
+            args.series, dtype=args.dtype, mmap=args.mmap,
+            sidecar=args.sidecar)
+
+    return _worker_series[key]
+
+
+def _run_query(ts, query_path, args):
+    """
+    Loads and searches one query. It runs in the worker threads or processes.
+    Worker processes are given no ts and load their own.
+
+    Returns
+    -------
+    Tuple (query_path, result, load_seconds, search_seconds).
+    """
+    if ts is None:
+        ts = _load_worker_series(args)
+
+    start = time.time()
+    query = mtscore.load_series(
+        query_path, dtype=args.dtype, mmap=False, sidecar=args.sidecar)
+    loaded = time.time()
+    result = _search(ts, query, args)
+
+    return (query_path, result, loaded - start, time.time() - loaded)
+
+
+def _as_columns(result):
+    """
+    Converts a search result into (indices, values) columns.
+    """
+    if isinstance(result, tuple):
+        return (np.asarray(result[0]), np.real(result[1]))
+
+    return (np.arange(len(result)), np.real(result))
+
+
+class ResultWriter(object):
+    """
+    Streams the search results to a CSV file or .npy files as the queries
+    complete. A CSV file holds the query, index and value columns of every
+    query. The .npy output is one file per query with the query number
+    appended to the file name when there are several queries. Distance
+    profiles are written as one dimensional arrays and top k results as
+    (index, value) rows.
+
+    Parameters
+    ----------
+    path : str
+        The output file. Without an output, results are written as CSV to
+        stdout.
+    queries : int
+        The number of queries searched.
+    """
+
+    def __init__(self, path, queries):
+        self.path = path
+        self.queries = queries
+        self._file = None
+        self._csv = None
+
+        if path is None or not path.lower().endswith('.npy'):
+            if path is None:
+                self._file = sys.stdout
+            else:
+                self._file = io.open(path, 'w', newline='')
+
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(['query', 'index', 'value'])
+
+    def write(self, number, query_path, result):
+        """
+        Writes the result of the query with the given number.
+        """
+        if self._csv is not None:
+            indices, values = _as_columns(result)
+            for index, value in zip(indices, values):
+                self._csv.writerow([query_path, index, repr(float(value))])
+
+            return
+
+        path = self.path
+        if self.queries > 1:
+            root, extension = os.path.splitext(path)
+            path = '{}_{}{}'.format(root, number, extension)
+
+        if isinstance(result, tuple):
+            indices, values = _as_columns(result)
+            result = np.column_stack((indices, values))
+
+        np.save(path, np.real(result))
+
+    def close(self):
+        if self._file is not None and self._file is not sys.stdout:
+            self._file.close()
+        elif self._file is not None:
+            self._file.flush()
+
+
+def build_parser():
+    """
+    Builds the argument parser of the mass-ts command.
+    """
+    parser = argparse.ArgumentParser(
+        prog='mass-ts',
+        description='Bulk similarity search of queries over a time series.')
+    parser.add_argument(
+        'series', help='the time series as .npy, raw binary or text file')
+    parser.add_argument(
+        'queries', nargs='+', help='one or more query files')
+    parser.add_argument(
+        '-a', '--algorithm', choices=ALGORITHMS, default='mass2',
+        help='the search algorithm (default: mass2)')
+    parser.add_argument(
+        '-o', '--output', default=None,
+        help='a .csv or .npy output file (default: CSV to stdout)')
+    parser.add_argument(
+        '--return-type', choices=('squared', 'distance', 'correlation'),
+        default=None, help='the values to return (default: distance)')
+    parser.add_argument(
+        '--no-normalize', action='store_true',
+        help='compute the raw instead of the z-normalized distance')
+    parser.add_argument(
+        '--pieces', type=int, default=4096,
+        help='the piece size of mass3 and mass3_top_k (default: 4096)')
+    parser.add_argument(
+        '--batch-size', type=int, default=10000,
+        help='the batch size of mass2_batch (default: 10000)')
+    parser.add_argument(
+        '-k', type=int, default=3,
+        help='the number of matches of the top k algorithms (default: 3)')
+    parser.add_argument(
+        '--exclusion-zone', type=int, default=None,
+        help='the exclusion zone of the top k algorithms '
+             '(default: half the query length)')
+    parser.add_argument(
+        '--option', choices=('motifs', 'discords'), default='motifs',
+        help='find motifs or discords with mass3_top_k (default: motifs)')
+    parser.add_argument(
+        '--dtype', default='float64',
+        help='the dtype of raw binary files (default: float64)')
+    parser.add_argument(
+        '--mmap', action='store_true',
+        help='memory map the binary or sidecar file of the time series')
+    parser.add_argument(
+        '--no-sidecar', dest='sidecar', action='store_false',
+        help='do not cache parsed text files as .npy sidecar files')
+    parser.add_argument(
+        '-j', '--n-jobs', type=int, default=1,
+        help='the number of queries searched in parallel (default: 1)')
+    parser.add_argument(
+        '--processes', action='store_true',
+        help='search the queries in processes instead of threads')
+    parser.add_argument(
+        '-q', '--quiet', action='store_true',
+        help='do not print the timing stats')
+
+    return parser
+
+
+def main(argv=None):
+    """
+    Runs the mass-ts command.
+
+    Parameters
+    ----------
+    argv : list(str), Default None
+        The command line arguments. By default sys.argv is used.
+
+    Returns
+    -------
+    The exit code.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.n_jobs < 1:
+        args.n_jobs = cpu_count()
+
+    start = time.time()
+    ts = mtscore.load_series(
+        args.series, dtype=args.dtype, mmap=args.mmap, sidecar=args.sidecar)
+    loaded = time.time()
+
+    writer = ResultWriter(args.output, len(args.queries))
+    load_seconds = 0.
+    search_seconds = 0.
+
+    try:
+        if args.n_jobs > 1:
+            executor_class = ThreadPoolExecutor
+            shared = ts
+            if args.processes:
+                executor_class = ProcessPoolExecutor
+                shared = None
+
+            with executor_class(max_workers=args.n_jobs) as executor:
+                futures = dict(
+                    (executor.submit(_run_query, shared, path, args), number)
+                    for number, path in enumerate(args.queries))
+
+                # results are written as they complete and released at once
+                for future in as_completed(futures):
+                    number = futures.pop(future)
+                    query_path, profile, load, search = future.result()
+                    writer.write(number, query_path, profile)
+                    load_seconds += load
+                    search_seconds += search
+        else:
+            for number, path in enumerate(args.queries):
+                query_path, profile, load, search = _run_query(ts, path, args)
+                writer.write(number, query_path, profile)
+                load_seconds += load
+                search_seconds += search
+    except ValueError as e:
+        parser.exit(2, 'mass-ts: error: {}\n'.format(e))
+    finally:
+        writer.close()
+
+    total = time.time() - start
+    if not args.quiet:
+        stats = (
+            'series: {} points loaded in {:.3f}s\n'
+            'queries: {} loaded in {:.3f}s, searched in {:.3f}s '
+            '({:.1f} queries/s)\n'
+            'total: {:.3f}s\n'
+        ).format(
+            len(ts), loaded - start, len(args.queries), load_seconds,
+            search_seconds, len(args.queries) / max(total, 1e-9), total)
+        sys.stderr.write(stats)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
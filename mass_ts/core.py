@@ -8,7 +8,9 @@ range = getattr(__builtins__, 'xrange', range)
 # end of py2 compatability boilerplate
 
 import multiprocessing
+import os
 import sys
+import warnings
 
 import numpy as np
 
@@ -163,6 +165,7 @@ def precheck_series_and_query(ts, query):
         If ts is not a list or np.array.
         If query is not a list or np.array.
         If ts or query is not one dimensional.
+        If query contains NaN values.
     """
     try:
         ts = to_np_array(ts)
@@ -180,4 +183,397 @@ def precheck_series_and_query(ts, query):
     if not is_one_dimensional(query):
         raise ValueError('query must be one dimensional!')
 
-    return (ts, query)
\ No newline at end of file
+    if np.isnan(query).any():
+        raise ValueError('query must not contain NaN values!')
+
+    return (ts, query)
+
+
+def paa(a, factor):
+    """
+    Computes the piecewise aggregate approximation (PAA) of an array by
+    averaging consecutive non-overlapping segments. Trailing values that do
+    not fill a whole segment are dropped.
+
+    Parameters
+    ----------
+    a : array_like
+        The array to downsample.
+    factor : int
+        The number of values averaged into one segment.
+
+    Returns
+    -------
+    The downsampled array.
+    """
+    n = (len(a) // factor) * factor
+
+    return np.mean(np.reshape(a[:n], (-1, factor)), axis=1)
+
+
+def cumulative_sums(a):
+    """
+    Computes the cumulative sum and cumulative sum of squares of an array
+    with a leading zero. The tables allow the moving mean and std. of any
+    window size to be computed in O(n).
+
+    Parameters
+    ----------
+    a : array_like
+        The array to compute the cumulative sums on.
+
+    Returns
+    -------
+    (np.array, np.array) - The cumulative sums and sums of squares.
+    """
+    sums = np.concatenate(([0.], np.cumsum(a)))
+    sums_sq = np.concatenate(([0.], np.cumsum(np.square(a))))
+
+    return (sums, sums_sq)
+
+
+def moving_mean_std(a, window, sums=None):
+    """
+    Computes the moving mean and std. over an array given a window size using
+    cumulative sums.
+
+    Parameters
+    ----------
+    a : array_like
+        The array to compute the moving mean and std. on.
+    window : int
+        The window size.
+    sums : tuple(np.array, np.array), Default None
+        Precomputed cumulative sums as returned by cumulative_sums. They are
+        computed from a when not provided.
+
+    Returns
+    -------
+    (np.array, np.array) - The moving mean and std. respectively.
+    """
+    if sums is None:
+        sums = cumulative_sums(a)
+
+    sums, sums_sq = sums
+    seg_sum = sums[window:] - sums[:-window]
+    seg_sum_sq = sums_sq[window:] - sums_sq[:-window]
+
+    mean = seg_sum / window
+    var = seg_sum_sq / window - mean ** 2
+
+    return (mean, np.sqrt(np.maximum(var, 0)))
+
+
+def moving_sum_sq(a, window=3):
+    """
+    Computes the moving sum of squares over an array given a window size.
+
+    Parameters
+    ----------
+    a : array_like
+        The array to compute the moving sum of squares on.
+    window : int
+        The window size.
+
+    Returns
+    -------
+    The moving sum of squares over the array.
+    """
+    sums_sq = np.concatenate(([0.], np.cumsum(np.square(a))))
+
+    return sums_sq[window:] - sums_sq[:-window]
+
+
+def check_return_type(return_type, corr_coef=False):
+    """
+    Helper function to resolve the requested output of a MASS variant.
+
+    Parameters
+    ----------
+    return_type : str ('squared', 'distance', 'correlation') or None
+        The requested output. When None it is derived from corr_coef.
+    corr_coef : bool, Default False
+        The legacy flag requesting the Pearson correlation coef.
+
+    Returns
+    -------
+    The return type as a str.
+
+    Raises
+    ------
+    ValueError
+        If return_type is not squared, distance or correlation.
+    """
+    if return_type is None:
+        return_type = 'correlation' if corr_coef else 'distance'
+
+    return_type = return_type.lower()
+    if return_type not in ('squared', 'distance', 'correlation'):
+        raise ValueError(
+            'return_type only accepts squared, distance or correlation.')
+
+    return return_type
+
+
+BINARY_EXTENSIONS = ('.bin', '.dat', '.raw')
+
+
+def load_text(path, chunk_size=2 ** 24):
+    """
+    Reads a one dimensional series from a text file with whitespace, newline
+    or comma separated values. The file is read in chunks that are parsed
+    with np.fromstring which is much faster than np.loadtxt.
+
+    Parameters
+    ----------
+    path : str
+        The text file to read.
+    chunk_size : int, Default 2 ** 24
+        The number of bytes parsed at once.
+
+    Returns
+    -------
+    A one dimensional np.array of float64 values.
+
+    Raises
+    ------
+    ValueError
+        If the file contains values that are not numbers.
+    """
+    parts = []
+    remainder = b''
+
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            data = remainder + chunk
+
+            # keep the trailing partial value for the next chunk
+            if chunk:
+                cut = max(data.rfind(b'\n'), data.rfind(b' '),
+                          data.rfind(b','))
+                if cut < 0:
+                    remainder = data
+                    continue
+
+                data, remainder = data[:cut + 1], data[cut + 1:]
+
+            # np.fromstring parses whitespace only strings as [-1]
+            data = data.replace(b',', b' ')
+            if data.strip():
+                with warnings.catch_warnings():
+                    warnings.simplefilter('error', DeprecationWarning)
+                    try:
+                        parts.append(np.fromstring(data, sep=' '))
+                    except (ValueError, DeprecationWarning):
+                        raise ValueError(
+                            'Invalid value found in {}.'.format(path))
+
+            if not chunk:
+                break
+
+    if not parts:
+        return np.zeros(0)
+
+    return np.concatenate(parts)
+
+
+def load_series(path, dtype='float64', mmap=True, sidecar=True):
+    """
+    Loads a one dimensional series from a .npy, raw binary or text file. Raw
+    binary files are recognized by the .bin, .dat and .raw extensions. Text
+    files are parsed once with load_text and converted into a binary .npy
+    sidecar file next to them, which is memory mapped on later loads as long
+    as it is newer than the text file.
+
+    Parameters
+    ----------
+    path : str
+        The file to load.
+    dtype : str, Default 'float64'
+        The dtype of raw binary files.
+    mmap : bool, Default True
+        Memory map .npy, sidecar and raw binary files instead of reading
+        them into memory.
+    sidecar : bool, Default True
+        Write and use the .npy sidecar of text files. When the sidecar cannot
+        be written the parsed values are returned.
+
+    Returns
+    -------
+    A one dimensional np.array or np.memmap.
+
+    Raises
+    ------
+    ValueError
+        If a text file contains values that are not numbers.
+    """
+    mmap_mode = 'r' if mmap else None
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == '.npy':
+        return np.load(path, mmap_mode=mmap_mode)
+
+    if extension in BINARY_EXTENSIONS:
+        if mmap:
+            return np.memmap(path, dtype=dtype, mode='r')
+
+        return np.fromfile(path, dtype=dtype)
+
+    if not sidecar:
+        return load_text(path)
+
+    sidecar_path = path + '.npy'
+    try:
+        if os.path.getmtime(sidecar_path) >= os.path.getmtime(path):
+            return np.load(sidecar_path, mmap_mode=mmap_mode)
+    except OSError:
+        pass
+
+    values = load_text(path)
+
+    # write to a temporary file first so readers never see a partial file
+    tmp_path = '{}.{}.tmp.npy'.format(path, os.getpid())
+    try:
+        np.save(tmp_path, values)
+        os.rename(tmp_path, sidecar_path)
+    except (IOError, OSError):
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+        return values
+
+    return np.load(sidecar_path, mmap_mode=mmap_mode)
+
+
+def valid_window_runs(n, window, start=None, stop=None, mask=None):
+    """
+    Finds the runs of consecutive windows that lie entirely within the valid
+    points of a time series. A point is valid when it is within start and
+    stop and is not masked out.
+
+    Parameters
+    ----------
+    n : int
+        The length of the time series.
+    window : int
+        The window size.
+    start : int, Default None
+        The first valid point. By default it is 0.
+    stop : int, Default None
+        The point after the last valid point. By default it is n.
+    mask : array_like, Default None
+        Either a boolean array of length n that is True for valid points or
+        a list of (start, stop) intervals of valid points.
+
+    Returns
+    -------
+    A list of tuples (first, last) of the window starting indices of every
+    run where last is exclusive.
+
+    Raises
+    ------
+    ValueError
+        If start or stop is not an integer within the time series.
+        If mask is not a boolean array of length n or a list of intervals.
+    """
+    start = 0 if start is None else start
+    stop = n if stop is None else stop
+
+    if not isinstance(start, (int, np.integer)) or \
+            not isinstance(stop, (int, np.integer)) or \
+            not 0 <= start <= stop <= n:
+        raise ValueError('start and stop must be integers within the ts.')
+
+    if mask is None:
+        valid = np.ones(n, dtype='bool')
+    else:
+        mask = np.asarray(mask)
+        if mask.dtype == np.bool_ and mask.shape == (n,):
+            valid = mask.copy()
+        elif mask.ndim == 2 and mask.shape[1] == 2 and \
+                np.issubdtype(mask.dtype, np.integer):
+            valid = np.zeros(n, dtype='bool')
+            for first, last in mask:
+                valid[max(first, 0):max(last, 0)] = True
+        else:
+            raise ValueError(
+                'mask must be a boolean array of length n or a list of '
+                '(start, stop) intervals.')
+
+    valid[:start] = False
+    valid[stop:] = False
+
+    # a window is valid when it contains no invalid point
+    invalid = np.concatenate(([0], np.cumsum(~valid)))
+    windows = (invalid[window:] - invalid[:-window]) == 0
+
+    edges = np.diff(np.concatenate(([0], windows.astype('int8'), [0])))
+    firsts = np.flatnonzero(edges == 1)
+    lasts = np.flatnonzero(edges == -1)
+
+    return list(zip(firsts.tolist(), lasts.tolist()))
+
+
+def fill_missing(a, window):
+    """
+    Replaces the missing values of an array with zeros so it can be
+    convolved and finds the windows containing missing values with
+    cumulative counts.
+
+    Parameters
+    ----------
+    a : np.array
+        The array possibly containing NaN values.
+    window : int
+        The window size.
+
+    Returns
+    -------
+    (np.array, np.array) - The zero filled array and a boolean array that is
+    True for every window containing a missing value. When nothing is missing
+    the array itself and None are returned.
+    """
+    missing = np.isnan(a)
+    if not missing.any():
+        return (a, None)
+
+    counts = np.concatenate(([0], np.cumsum(missing)))
+    gaps = (counts[window:] - counts[:-window]) > 0
+
+    return (np.where(missing, 0., a), gaps)
+
+
+def complexity_estimate(a, window, normalize=True):
+    """
+    Computes the complexity estimate of every window, the square root of the
+    sum of squared differences of consecutive values, with cumulative sums in
+    O(n).
+
+    Parameters
+    ----------
+    a : array_like
+        The array to compute the complexity estimates on.
+    window : int
+        The window size.
+    normalize : bool, Default True
+        Compute the complexity estimate of the z-normalized windows by
+        dividing by the moving std.
+
+    Returns
+    -------
+    The complexity estimate of every window.
+    """
+    a = np.asarray(a, dtype='float64')
+    sums = np.concatenate(([0.], np.cumsum(np.diff(a) ** 2)))
+    ce = np.sqrt(np.maximum(sums[window - 1:] - sums[:len(sums) - window + 1],
+                            0))
+
+    if normalize:
+        mean, std = moving_mean_std(a, window)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ce = ce / std
+
+    return ce
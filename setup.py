@@ -34,9 +34,15 @@ setup(
         'Programming Language :: Python :: 3.7',
     ],
     description="MASS (Mueen's Algorithm for Similarity Search)",
+    entry_points={
+        'console_scripts': [
+            'mass-ts=mass_ts.cli:main',
+        ],
+    },
     install_requires=requirements,
     extras_require={
         'gpu':  ['cupy-cuda101==6.2.0',],
+        'jit':  ['numba',],
     },
     license="Apache Software License 2.0",
     long_description=readme + '\n\n' + history,
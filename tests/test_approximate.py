@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+range = getattr(__builtins__, 'xrange', range)
+# end of py2 compatability boilerplate
+
+"""Tests for `mass_ts` package."""
+
+import os
+
+import pytest
+
+import numpy as np
+
+import mass_ts as mts
+
+MODULE_PATH = mts.__path__[0]
+
+
+def test_mass2_approximate_robotdog():
+    """Sanity check that compares results from UCR use case."""
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+
+    indices, distances, recall = mts.mass2_approximate(
+        robot_dog, carpet_walk, factor=4, candidates=8, top_matches=2,
+        random_state=0)
+    exact = np.real(mts.mass2(robot_dog, carpet_walk))
+
+    assert(indices[0] == 7479)
+    np.testing.assert_almost_equal(distances, exact[indices])
+    assert(0 <= recall <= 1)
+
+
+def test_mass2_approximate_invalid_factor():
+    with pytest.raises(ValueError) as excinfo:
+        mts.mass2_approximate(np.arange(100.), np.arange(10.), factor=6)
+    assert 'factor is too large for the query length.' in str(excinfo.value)
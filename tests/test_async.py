@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for `mass_ts` package."""
+
+import asyncio
+import os
+
+import pytest
+
+import numpy as np
+
+import mass_ts as mts
+
+MODULE_PATH = mts.__path__[0]
+
+
+def load_robot_dog():
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+
+    return (robot_dog, carpet_walk)
+
+
+def test_amass2_robotdog():
+    """Sanity check that compares results from UCR use case."""
+    robot_dog, carpet_walk = load_robot_dog()
+
+    distances = asyncio.run(mts.amass2(robot_dog, carpet_walk))
+
+    assert(np.argmin(distances) == 7479)
+
+
+def test_amass2_batch_robotdog():
+    """Sanity check that compares results from UCR use case."""
+    robot_dog, carpet_walk = load_robot_dog()
+
+    indices, distances = asyncio.run(
+        mts.amass2_batch(robot_dog, carpet_walk, 1000, top_matches=3))
+    desired_indices, desired_dists = mts.mass2_batch(
+        robot_dog, carpet_walk, 1000, top_matches=3)
+
+    assert(indices[np.argmin(distances)] == 7479)
+    np.testing.assert_almost_equal(np.sort(distances), np.sort(desired_dists))
+
+
+def test_amass2_batch_iter_partial_results():
+    robot_dog, carpet_walk = load_robot_dog()
+
+    async def collect():
+        results = []
+        async for result in mts.amass2_batch_iter(
+                robot_dog, carpet_walk, 1000, top_matches=3, max_pending=2):
+            results.append(result)
+
+        return results
+
+    results = asyncio.run(collect())
+    completed = [r[2] for r in results]
+
+    assert(completed == list(range(1, 14)))
+    assert(all(r[3] == 13 for r in results))
+    assert(len(results[0][0]) == 1)
+    assert(results[-1][0][np.argmin(results[-1][1])] == 7479)
+
+
+def test_amass2_batch_timeout():
+    ts = np.random.RandomState(0).randn(2 ** 16)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(mts.amass2_batch(ts, ts[:100], 200, timeout=1e-6))
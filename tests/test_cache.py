@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+range = getattr(__builtins__, 'xrange', range)
+# end of py2 compatability boilerplate
+
+"""Tests for `mass_ts` package."""
+
+import os
+
+import pytest
+
+import numpy as np
+
+import mass_ts as mts
+
+MODULE_PATH = mts.__path__[0]
+
+
+@pytest.fixture
+def cache(tmpdir):
+    yield mts.set_cache(str(tmpdir))
+    mts.set_cache(None)
+
+
+def test_mass2_mass3_cached(cache):
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+
+    cold = mts.mass2(robot_dog, carpet_walk)
+    files = os.listdir(cache.directory)
+    warm = mts.mass2(robot_dog, carpet_walk)
+
+    assert(len(files) == 4)
+    assert(sorted(os.listdir(cache.directory)) == sorted(files))
+    np.testing.assert_almost_equal(warm, cold)
+
+    cold = mts.mass3(robot_dog, carpet_walk, 256)
+    warm = mts.mass3(robot_dog, carpet_walk, 256)
+    np.testing.assert_almost_equal(warm, cold)
+    assert(np.argmin(warm) == 7479)
+
+
+def test_series_cache_eviction(tmpdir):
+    cache = mts.SeriesCache(str(tmpdir), max_bytes=1500)
+    a = np.arange(100, dtype='float64')
+
+    cache.put('a', {'x': a})
+    cache.put('b', {'x': a})
+    np.testing.assert_equal(cache.get('b')['x'], a)
+
+    assert(cache.get('a') is None)
+    assert(cache.get('missing') is None)
+
+
+@pytest.fixture
+def query_cache():
+    yield mts.set_query_cache()
+    mts.set_query_cache()
+
+
+def test_query_cache_hits(query_cache):
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+
+    cold = mts.mass2(robot_dog, carpet_walk)
+    warm = mts.mass2(robot_dog, carpet_walk)
+    np.testing.assert_equal(warm, cold)
+
+    mts.mass3(robot_dog, carpet_walk, 256)
+    mts.mass3(robot_dog, carpet_walk, 256)
+    mts.mass2_batch(robot_dog, carpet_walk, 1000)
+    mts.mass2_batch(robot_dog, carpet_walk, 1000)
+
+    stats = query_cache.stats()
+    assert(stats['misses'] == 3)
+    assert(stats['hits'] == 3)
+    assert(stats['entries'] == 3)
+
+    mts.set_query_cache(None)
+    np.testing.assert_equal(mts.mass2(robot_dog, carpet_walk), cold)
+
+
+def test_query_cache_eviction():
+    cache = mts.QueryCache(max_bytes=1500)
+    a = np.arange(100, dtype='float64')
+
+    cache.put('a', {'x': a})
+    cache.put('b', {'x': a})
+    np.testing.assert_equal(cache.get('b')['x'], a)
+    assert(not cache.get('b')['x'].flags.writeable)
+
+    assert(cache.get('a') is None)
+    cache.put('c', {'x': np.arange(1000)})
+    assert(cache.get('c') is None)
+
+    stats = cache.stats()
+    assert(stats['hits'] == 2)
+    assert(stats['misses'] == 2)
+    assert(stats['evictions'] == 1)
+    assert(stats['nbytes'] == a.nbytes)
+
+    # a hit makes the entry the most recently used one
+    cache = mts.QueryCache(max_bytes=2000)
+    cache.put('a', {'x': a})
+    cache.put('b', {'x': a.copy()}, copy=False)
+    cache.get('a')
+    cache.put('c', {'x': a})
+    assert(cache.get('a') is not None)
+    assert(cache.get('b') is None)
+
+
+def test_mass3_piece_spectra_written_incrementally(cache):
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+    desired = mts.mass3_top_k(robot_dog, carpet_walk, 256, 3, 50)
+    cache.clear()
+
+    # a search stopped after the first piece leaves no partial entry
+    pieces = mts._mass_ts._mass3_pieces(robot_dog, carpet_walk, 256)
+    next(pieces)
+    pieces.close()
+    assert(not any('pieces' in f for f in os.listdir(cache.directory)))
+
+    cold = mts.mass3_top_k(robot_dog, carpet_walk, 256, 3, 50)
+    assert(any('pieces' in f for f in os.listdir(cache.directory)))
+    assert(not any('.tmp' in f for f in os.listdir(cache.directory)))
+    warm = mts.mass3_top_k(robot_dog, carpet_walk, 256, 3, 50)
+
+    for actual in (cold, warm):
+        np.testing.assert_equal(actual[0], desired[0])
+        np.testing.assert_almost_equal(actual[1], desired[1])
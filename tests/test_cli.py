@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+range = getattr(__builtins__, 'xrange', range)
+# end of py2 compatability boilerplate
+
+"""Tests for `mass_ts` package."""
+
+import os
+
+import pytest
+
+import numpy as np
+
+import mass_ts as mts
+from mass_ts import cli
+
+MODULE_PATH = mts.__path__[0]
+ROBOT_DOG = os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt')
+CARPET_WALK = os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt')
+
+
+def test_cli_mass2_npy(tmpdir):
+    output = str(tmpdir.join('profile.npy'))
+    series = str(tmpdir.join('robot_dog.bin'))
+    np.loadtxt(ROBOT_DOG).tofile(series)
+
+    code = cli.main(
+        [series, CARPET_WALK, '-o', output, '--mmap', '--no-sidecar'])
+    assert(code == 0)
+
+    desired = np.real(mts.mass2(np.loadtxt(ROBOT_DOG),
+                                np.loadtxt(CARPET_WALK)))
+    np.testing.assert_almost_equal(np.load(output), desired)
+
+
+def test_cli_top_k_csv_parallel(tmpdir, capsys):
+    query = str(tmpdir.join('query.npy'))
+    np.save(query, np.loadtxt(CARPET_WALK))
+    output = str(tmpdir.join('motifs.csv'))
+
+    code = cli.main([
+        ROBOT_DOG, CARPET_WALK, query, '-a', 'mass3_top_k', '--pieces', '256',
+        '-k', '2', '--exclusion-zone', '50', '-j', '2', '-o', output,
+        '--no-sidecar',
+    ])
+    assert(code == 0)
+    assert('queries: 2' in capsys.readouterr().err)
+
+    rows = np.genfromtxt(output, delimiter=',', skip_header=1,
+                         usecols=(1, 2))
+    assert(len(rows) == 4)
+    np.testing.assert_equal(rows[:, 0], [7479, 6999, 7479, 6999])
+
+
+def test_cli_processes_load_series_once(tmpdir):
+    output = str(tmpdir.join('motifs.csv'))
+
+    code = cli.main([
+        ROBOT_DOG, CARPET_WALK, CARPET_WALK, '-a', 'mass3_top_k',
+        '--pieces', '256', '-k', '1', '-j', '2', '--processes', '-o', output,
+        '--no-sidecar', '--quiet',
+    ])
+    assert(code == 0)
+
+    rows = np.genfromtxt(output, delimiter=',', skip_header=1,
+                         usecols=(1, 2))
+    np.testing.assert_equal(rows[:, 0], [7479, 7479])
+
+
+def test_cli_invalid_arguments(tmpdir):
+    with pytest.raises(SystemExit):
+        cli.main([ROBOT_DOG, CARPET_WALK, '-a', 'unknown', '--no-sidecar'])
+
+    with pytest.raises(SystemExit):
+        cli.main([ROBOT_DOG, CARPET_WALK, '-a', 'mass3', '--pieces', '10',
+                  '-o', str(tmpdir.join('out.csv')), '--no-sidecar'])
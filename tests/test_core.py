@@ -122,4 +122,65 @@ def test_moving_std():
     actual = mtscore.moving_std(a, 3)
     desired = np.array([0.81649658, 0.81649658, 0.81649658, 0.81649658])
 
-    np.testing.assert_almost_equal(actual, desired)
\ No newline at end of file
+    np.testing.assert_almost_equal(actual, desired)
+
+def test_moving_mean_std():
+    a = np.array([1, 2, 3, 4, 5, 6])
+    mean, std = mtscore.moving_mean_std(a, 3)
+
+    np.testing.assert_almost_equal(mean, mtscore.moving_average(a, 3))
+    np.testing.assert_almost_equal(std, mtscore.moving_std(a, 3))
+
+
+def test_load_text():
+    path = os.path.join(
+        os.path.dirname(os.path.realpath(__file__)), 'robot_dog.txt')
+    desired = np.loadtxt(path)
+
+    np.testing.assert_equal(mtscore.load_text(path), desired)
+    np.testing.assert_equal(mtscore.load_text(path, chunk_size=7), desired)
+
+
+def test_load_text_invalid(tmpdir):
+    path = str(tmpdir.join('invalid.txt'))
+    with open(path, 'w') as f:
+        f.write('1.5, 2\n3 abc\n')
+
+    with pytest.raises(ValueError):
+        mtscore.load_text(path)
+
+
+def test_load_series_sidecar(tmpdir):
+    path = str(tmpdir.join('ts.txt'))
+    desired = np.random.RandomState(0).randn(1000)
+    np.savetxt(path, desired)
+
+    cold = mtscore.load_series(path)
+    assert(os.path.exists(path + '.npy'))
+    warm = mtscore.load_series(path)
+
+    assert(isinstance(warm, np.memmap))
+    np.testing.assert_equal(cold, desired)
+    np.testing.assert_equal(warm, desired)
+
+    binary = str(tmpdir.join('ts.bin'))
+    desired.astype('float32').tofile(binary)
+    np.testing.assert_equal(
+        mtscore.load_series(binary, dtype='float32'), desired.astype('float32'))
+
+
+def test_complexity_estimate():
+    a = np.random.RandomState(0).randn(100)
+    window = 10
+    desired = np.array([
+        np.sqrt(np.sum(np.diff(a[i:i + window]) ** 2))
+        for i in range(len(a) - window + 1)
+    ])
+    np.testing.assert_almost_equal(
+        mtscore.complexity_estimate(a, window, normalize=False), desired)
+
+    stds = np.array([
+        np.std(a[i:i + window]) for i in range(len(a) - window + 1)
+    ])
+    np.testing.assert_almost_equal(
+        mtscore.complexity_estimate(a, window), desired / stds)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+range = getattr(__builtins__, 'xrange', range)
+# end of py2 compatability boilerplate
+
+"""Tests for `mass_ts` package."""
+
+import os
+
+import pytest
+
+import numpy as np
+
+import mass_ts as mts
+
+MODULE_PATH = mts.__path__[0]
+
+
+def brute_force_matrix_profile(ts, m):
+    windows = len(ts) - m + 1
+    profile = np.zeros(windows)
+
+    for i in range(windows):
+        dist = np.real(mts.mass2(ts, ts[i:i + m]))
+        dist[max(0, i - m + 1):i + m] = np.inf
+        profile[i] = np.min(dist)
+
+    return profile
+
+
+def test_drag_discords():
+    rng = np.random.RandomState(0)
+    ts = np.sin(np.linspace(0, 40 * np.pi, 800)) + 0.05 * rng.randn(800)
+    ts[400:420] += 1.5
+    m = 30
+
+    indices, distances = mts.drag_discords(ts, m, k=1)
+    profile = brute_force_matrix_profile(ts, m)
+
+    assert(indices[0] == np.argmax(profile))
+    np.testing.assert_almost_equal(distances[0], np.max(profile), decimal=5)
+
+
+def test_drag_discords_range():
+    rng = np.random.RandomState(1)
+    ts = np.sin(np.linspace(0, 40 * np.pi, 800)) + 0.05 * rng.randn(800)
+    ts[200:210] = 0
+    ts[600:620] += 1.5
+
+    indices, distances = mts.drag_discords(ts, 30, k=2)
+
+    assert(len(indices) == 2)
+    assert(distances[0] >= distances[1])
+    assert(abs(indices[0] - indices[1]) >= 30)
+
+    indices, distances = mts.drag_discords(ts, 30, k=5, r=100.)
+    assert(len(indices) == 0)
+
+
+def test_drag_discords_invalid_m():
+    with pytest.raises(ValueError) as excinfo:
+        mts.drag_discords(np.arange(10.), 6)
+    assert 'm must be an integer' in str(excinfo.value)
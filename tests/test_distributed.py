@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+range = getattr(__builtins__, 'xrange', range)
+# end of py2 compatability boilerplate
+
+"""Tests for `mass_ts` package."""
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+import pytest
+
+import numpy as np
+
+import mass_ts as mts
+from mass_ts import _top_k
+
+MODULE_PATH = mts.__path__[0]
+
+
+def _desired(ts, query, k, exclusion_zone):
+    dist = np.real(mts.mass2(ts, query))
+
+    return _top_k._greedy_select(
+        np.arange(len(dist)), dist, k, exclusion_zone)
+
+
+def test_distributed_index_local_workers():
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+
+    processes, addresses, authkey = mts.start_local_workers(3)
+    try:
+        with pytest.raises(ValueError):
+            mts.DistributedIndex(robot_dog, workers=addresses)
+
+        with mts.DistributedIndex(
+                robot_dog, workers=addresses, max_query_length=200,
+                authkey=authkey) as index:
+            indices, distances = index.search(carpet_walk, 3, 50)
+            with pytest.raises(ValueError):
+                index.search(np.zeros(201))
+
+            index.close(shutdown=True)
+    finally:
+        for process in processes:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+
+    desired = _desired(robot_dog, carpet_walk, 3, 50)
+    np.testing.assert_equal(indices, desired[0])
+    np.testing.assert_almost_equal(distances, desired[1], decimal=5)
+
+
+def test_distributed_index_executor():
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+
+    with ThreadPoolExecutor(2) as executor:
+        index = mts.DistributedIndex(
+            robot_dog, executor=executor, shards=5, max_query_length=100)
+        indices, distances = index.search(carpet_walk, 4, 50)
+
+    desired = _desired(robot_dog, carpet_walk, 4, 50)
+    np.testing.assert_equal(indices, desired[0])
+    np.testing.assert_almost_equal(distances, desired[1], decimal=5)
+
+    with pytest.raises(ValueError):
+        mts.DistributedIndex(robot_dog)
+
+
+def test_distributed_index_short_query_at_end():
+    ts = np.random.RandomState(0).randn(2000)
+    query = ts[1980:2000]
+
+    with ThreadPoolExecutor(2) as executor:
+        index = mts.DistributedIndex(
+            ts, executor=executor, shards=4, max_query_length=200)
+        indices, distances = index.search(query, 1)
+
+    assert(indices[0] == 1980)
+
+
+def test_distributed_index_matches_greedy_across_shards():
+    ts = np.random.RandomState(1).randn(3000)
+    query = ts[1000:1050]
+
+    with ThreadPoolExecutor(2) as executor:
+        index = mts.DistributedIndex(
+            ts, executor=executor, shards=7, max_query_length=100)
+        indices, distances = index.search(query, 10, 25)
+
+    desired = _desired(ts, query, 10, 25)
+    np.testing.assert_equal(indices, desired[0])
+    np.testing.assert_almost_equal(distances, desired[1], decimal=5)
+
+
+def test_serve_worker_requires_authkey():
+    with pytest.raises(ValueError):
+        mts.serve_worker(('localhost', 0), None)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+range = getattr(__builtins__, 'xrange', range)
+# end of py2 compatability boilerplate
+
+"""Tests for `mass_ts` package."""
+
+import os
+
+import pytest
+
+import numpy as np
+
+import mass_ts as mts
+
+MODULE_PATH = mts.__path__[0]
+
+
+def test_search_engine_robotdog():
+    """Sanity check that compares results from UCR use case."""
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+    queries = [carpet_walk, carpet_walk[:50], robot_dog[100:200]]
+
+    with mts.SearchEngine(robot_dog, max_wait=0.05) as engine:
+        futures = [engine.submit(q) for q in queries]
+        results = [f.result(timeout=10) for f in futures]
+
+    for query, dist in zip(queries, results):
+        desired = np.real(mts.mass2(robot_dog, query))
+        np.testing.assert_almost_equal(dist, desired, decimal=5)
+
+    assert(np.argmin(results[0]) == 7479)
+
+
+def test_search_engine_not_normalized():
+    ts = np.array([1, 1, 1, 2, 1, 1, 4, 5])
+    query = np.array([2, 1, 1, 4])
+
+    with mts.SearchEngine(ts, normalize=False) as engine:
+        actual = engine.search(query, timeout=10)
+
+    desired = np.real(mts.mass2(ts, query, normalize=False))
+    np.testing.assert_almost_equal(actual, desired)
+
+
+def test_search_engine_closed():
+    engine = mts.SearchEngine(np.arange(10.))
+    engine.close()
+
+    with pytest.raises(ValueError) as excinfo:
+        engine.submit(np.arange(3.))
+    assert 'the search engine is closed.' in str(excinfo.value)
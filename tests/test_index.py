@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+range = getattr(__builtins__, 'xrange', range)
+# end of py2 compatability boilerplate
+
+"""Tests for `mass_ts` package."""
+
+import os
+
+import pytest
+
+import numpy as np
+
+import mass_ts as mts
+
+MODULE_PATH = mts.__path__[0]
+
+
+def test_mass_index_robotdog():
+    """Sanity check that compares results from UCR use case."""
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+
+    index = mts.MassIndex(robot_dog[:5000], block_size=256)
+    index.append(robot_dog[5000:9999])
+    index.append(robot_dog[9999:])
+    distances = index.search(carpet_walk)
+    desired = np.real(mts.mass2(robot_dog, carpet_walk))
+
+    assert(len(index) == len(robot_dog))
+    np.testing.assert_almost_equal(distances, desired, decimal=5)
+    assert(np.argmin(distances) == 7479)
+
+
+def test_mass_index_update():
+    rng = np.random.RandomState(0)
+    ts = rng.randn(1000)
+    query = rng.randn(40)
+
+    index = mts.MassIndex(ts, block_size=64, max_query_length=100)
+    index.update(500, query)
+    ts[500:540] = query
+
+    np.testing.assert_almost_equal(
+        index.search(query), np.real(mts.mass2(ts, query)), decimal=5)
+    np.testing.assert_almost_equal(
+        index.search(query, normalize=False),
+        np.real(mts.mass2(ts, query, normalize=False)), decimal=5)
+
+
+def test_mass_index_invalid_query():
+    index = mts.MassIndex(np.arange(100.), block_size=8)
+
+    with pytest.raises(ValueError) as excinfo:
+        index.search(np.arange(10.))
+    assert 'query must not be longer' in str(excinfo.value)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+range = getattr(__builtins__, 'xrange', range)
+# end of py2 compatability boilerplate
+
+"""Tests for `mass_ts` package."""
+
+import os
+
+import pytest
+
+import numpy as np
+
+import mass_ts as mts
+from mass_ts import _jit as mtsjit
+from mass_ts import _mass2_batch
+
+MODULE_PATH = mts.__path__[0]
+
+requires_numba = pytest.mark.skipif(
+    not mtsjit.HAS_NUMBA, reason='numba is not installed')
+
+
+@requires_numba
+def test_top_k_exclusion_parity():
+    rng = np.random.RandomState(0)
+    profile = rng.rand(1000)
+    indices = np.argpartition(profile, 5)
+
+    actual = mtsjit._top_k_exclusion_jit(profile.copy(), indices, 5, 10)
+    desired = mtsjit._top_k_exclusion_py(profile.copy(), indices, 5, 10)
+
+    np.testing.assert_equal(actual, desired)
+
+
+@requires_numba
+def test_moving_mean_std_parity():
+    rng = np.random.RandomState(0)
+    a = 1e3 + rng.randn(5000)
+
+    actual = mtsjit._moving_mean_std_jit(a, 100)
+    desired = mtsjit._moving_mean_std_py(a, 100)
+
+    np.testing.assert_almost_equal(actual[0], desired[0])
+    np.testing.assert_almost_equal(actual[1], desired[1])
+
+
+def test_moving_mean_std_loop():
+    a = np.array([1., 2., 3., 4., 5., 6.])
+    mean, std = mtsjit._moving_mean_std_loop(a, 3)
+
+    np.testing.assert_almost_equal(mean, [2., 3., 4., 5.])
+    np.testing.assert_almost_equal(std, mts.core.moving_std(a, 3))
+
+
+def test_min_subsequence_distances_parity():
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+    batches = len(robot_dog) // 1000
+
+    actual = _mass2_batch._min_subsequence_distances(
+        robot_dog, carpet_walk, batches, 1000)
+    desired = [
+        _mass2_batch._min_subsequence_distance(values)
+        for values in _mass2_batch._batch_job_generator(
+            robot_dog, carpet_walk, range(0, batches * 1000, 1000), 1000)
+    ]
+
+    np.testing.assert_equal([a[0] for a in actual], [d[0] for d in desired])
+    np.testing.assert_almost_equal(
+        [a[1] for a in actual], [d[1] for d in desired])
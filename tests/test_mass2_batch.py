@@ -48,4 +48,111 @@ def test_mass2_batch_robotdog_multi_threaded():
     min_dist_idx = np.argmin(distances)
     min_idx = indices[min_dist_idx]
 
-    assert(min_idx == 7479)
\ No newline at end of file
+    assert(min_idx == 7479)
+
+def test_mass2_batch_robotdog_not_normalized():
+    """Sanity check that compares results from UCR use case."""
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+
+    indices, distances = mts.mass2_batch(
+        robot_dog, carpet_walk, 1000, top_matches=3, normalize=False)
+    desired = np.real(mts.mass2(robot_dog, carpet_walk, normalize=False))
+    min_idx = indices[np.argmin(distances)]
+
+    np.testing.assert_almost_equal(desired[min_idx], np.min(desired))
+
+
+def test_mass2_batch_robotdog_corr_coef():
+    """Sanity check that compares results from UCR use case."""
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+
+    indices, corr = mts.mass2_batch(
+        robot_dog, carpet_walk, 1000, top_matches=3, corr_coef=True)
+    max_idx = indices[np.argmax(corr)]
+
+    assert(max_idx == 7479)
+
+
+def test_mass2_batch_robotdog_squared():
+    """Sanity check that compares results from UCR use case."""
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+
+    indices, distances = mts.mass2_batch(
+        robot_dog, carpet_walk, 1000, top_matches=3)
+    actual = mts.mass2_batch(
+        robot_dog, carpet_walk, 1000, top_matches=3, return_type='squared')
+
+    np.testing.assert_equal(np.sort(actual[0]), np.sort(indices))
+    np.testing.assert_almost_equal(
+        np.sort(actual[1]), np.sort(distances) ** 2, decimal=4)
+
+
+def test_mass2_batch_robotdog_missing_values():
+    """Sanity check that compares results from UCR use case."""
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+    robot_dog[7480] = np.nan
+    robot_dog[100:1500] = np.nan
+
+    indices, distances = mts.mass2_batch(
+        robot_dog, carpet_walk, 1000, top_matches=3)
+    desired = np.real(mts.mass2(robot_dog, carpet_walk))
+
+    assert(np.all(np.isfinite(distances)))
+    np.testing.assert_almost_equal(distances, desired[indices])
+    m = len(carpet_walk)
+    assert(np.all(indices >= 1500))
+    assert(np.all((indices <= 7480 - m) | (indices > 7480)))
+
+
+def test_mass2_batch_checkpoint_resume(tmpdir):
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+    checkpoint = str(tmpdir.join('search.npz'))
+    desired = mts.mass2_batch(robot_dog, carpet_walk, 1000, top_matches=3)
+
+    actual = mts.mass2_batch(
+        robot_dog, carpet_walk, 1000, top_matches=3, checkpoint=checkpoint)
+    np.testing.assert_equal(actual[0], desired[0])
+    np.testing.assert_almost_equal(actual[1], desired[1])
+
+    with np.load(checkpoint) as data:
+        assert(np.all(data['done']))
+        signature = data['signature']
+        done = data['done'].copy()
+        matches = data['matches'].copy()
+
+    # forget some batches and mark a completed one so it must be skipped
+    done[[2, 3, 7]] = False
+    matches[[2, 3, 7]] = 0
+    matches[10] = [10500, -1]
+    for n_jobs in (1, 2):
+        np.savez(checkpoint, signature=signature, done=done, matches=matches)
+        indices, distances = mts.mass2_batch(
+            robot_dog, carpet_walk, 1000, top_matches=3, n_jobs=n_jobs,
+            checkpoint=checkpoint)
+        assert(10500 in indices)
+        assert(7479 in indices)
+
+    with pytest.raises(ValueError):
+        mts.mass2_batch(
+            robot_dog, carpet_walk, 500, top_matches=3, checkpoint=checkpoint)
+
+    # a different series of the same length does not resume the checkpoint
+    with pytest.raises(ValueError):
+        mts.mass2_batch(
+            robot_dog[::-1], carpet_walk, 1000, top_matches=3,
+            checkpoint=checkpoint)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+range = getattr(__builtins__, 'xrange', range)
+# end of py2 compatability boilerplate
+
+"""Tests for `mass_ts` package."""
+
+import os
+
+import pytest
+
+import numpy as np
+
+import mass_ts as mts
+
+MODULE_PATH = mts.__path__[0]
+
+
+def test_mass2_many_robotdog():
+    """Sanity check that compares results from UCR use case."""
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+
+    series = [robot_dog, robot_dog[7000:9000], robot_dog[:50]]
+    results = mts.mass2_many(series, carpet_walk, top_matches=2)
+
+    assert(len(results) == 3)
+    assert(results[0][0][0] == 7479)
+    assert(results[1][0][0] == 479)
+    assert(len(results[2][0]) == 0)
+
+    desired = np.real(mts.mass2(series[1], carpet_walk))
+    np.testing.assert_almost_equal(results[1][1], desired[results[1][0]])
+
+
+def test_mass2_many_padded():
+    ts = np.array([
+        [1, 1, 1, 2, 1, 1, 4, 5],
+        [1, 2, 1, 1, 4, 0, 0, 0],
+    ])
+    query = np.array([2, 1, 1, 4])
+    results = mts.mass2_many(ts, query, top_matches=1, lengths=[8, 5])
+
+    assert(results[0][0][0] == 3)
+    assert(results[1][0][0] == 1)
+    np.testing.assert_almost_equal(results[1][1], [0.])
+
+
+def test_mass2_many_missing_values():
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+    m = len(carpet_walk)
+
+    gappy = robot_dog.copy()
+    gappy[7480] = np.nan
+    gappy[100:1500] = np.nan
+    results = mts.mass2_many([gappy, robot_dog], carpet_walk, top_matches=3)
+
+    indices = results[0][0]
+    assert(len(indices) == 3)
+    assert(np.all(np.isfinite(results[0][1])))
+    assert(np.all((indices >= 1500) | (indices <= 100 - m)))
+    assert(np.all((indices <= 7480 - m) | (indices > 7480)))
+    assert(results[1][0][0] == 7479)
@@ -18,6 +18,8 @@ import numpy as np
 
 import mass_ts
 from mass_ts import _mass_ts as mts
+from mass_ts import _backend as mtsbackend
+from mass_ts import _top_k
 
 MODULE_PATH = mass_ts.__path__[0]
 
@@ -109,4 +111,345 @@ def test_mass3_robotdog():
     distances = mts.mass3(robot_dog, carpet_walk, 256)
     min_idx = np.argmin(distances)
 
-    assert(min_idx == 7479)
\ No newline at end of file
+    assert(min_idx == 7479)
+
+def test_mass_multiscale():
+    """Sanity check that compares results from UCR use case."""
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+    m = len(carpet_walk)
+
+    dists = mts.mass_multiscale(robot_dog, carpet_walk, [m // 2, m])
+    desired = np.real(mts.mass2(robot_dog, carpet_walk)) / np.sqrt(m)
+
+    assert(len(dists) == 2)
+    assert(len(dists[0]) == len(robot_dog) - m // 2 + 1)
+    np.testing.assert_almost_equal(dists[1], desired)
+    assert(np.argmin(dists[1]) == 7479)
+
+
+def naive_euclidean(ts, query):
+    windows = mass_ts.core.rolling_window(ts.astype('float64'), len(query))
+
+    return np.sqrt(np.sum((windows - query) ** 2, axis=1))
+
+
+def test_mass_not_normalized():
+    ts = np.array([1, 1, 1, 2, 1, 1, 4, 5])
+    query = np.array([2, 1, 1, 4])
+    actual = mts.mass(ts, query, normalize=False)
+    desired = naive_euclidean(ts, query)[1:]
+
+    np.testing.assert_almost_equal(actual, desired)
+
+
+def test_mass2_not_normalized():
+    ts = np.array([1, 1, 1, 2, 1, 1, 4, 5])
+    query = np.array([2, 1, 1, 4])
+    actual = mts.mass2(ts, query, normalize=False)
+    desired = naive_euclidean(ts, query)
+
+    np.testing.assert_almost_equal(actual, desired)
+
+
+def test_mass3_not_normalized():
+    ts = np.array([1, 1, 1, 2, 1, 1, 4, 5])
+    query = np.array([2, 1, 1, 4])
+    actual = mts.mass3(ts, query, 8, normalize=False)
+    desired = naive_euclidean(ts, query)
+
+    np.testing.assert_almost_equal(actual, desired)
+
+
+def test_mass2_corr_coef():
+    ts = np.array([1, 1, 1, 2, 1, 1, 4, 5])
+    query = np.array([2, 1, 1, 4])
+    actual = mts.mass2(ts, query, corr_coef=True)
+    windows = mass_ts.core.rolling_window(ts, len(query))
+    desired = np.array([np.corrcoef(w, query)[0, 1] for w in windows])
+
+    np.testing.assert_almost_equal(actual, desired)
+    np.testing.assert_almost_equal(
+        mts.mass3(ts, query, 8, corr_coef=True), desired)
+
+
+def test_mass3_matches_mass2_robotdog():
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+
+    desired = np.real(mts.mass2(robot_dog, carpet_walk))
+    for pieces in (100, 256, 1000):
+        actual = np.real(mts.mass3(robot_dog, carpet_walk, pieces))
+        np.testing.assert_almost_equal(actual, desired, decimal=5)
+
+
+def test_mass3_top_k_robotdog():
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+
+    indices, distances = mts.mass3_top_k(robot_dog, carpet_walk, 256, 3, 50)
+    profile = np.real(mts.mass2(robot_dog, carpet_walk))
+
+    assert(indices[0] == 7479)
+    np.testing.assert_almost_equal(distances, profile[indices], decimal=5)
+    assert(np.all(np.diff(distances) >= 0))
+    assert(np.min(np.abs(np.diff(np.sort(indices)))) >= 50)
+
+    indices, distances = mts.mass3_top_k(
+        robot_dog, carpet_walk, 256, 2, 50, option='discords')
+    np.testing.assert_almost_equal(distances[0], np.nanmax(profile))
+
+
+def test_return_type():
+    ts = np.array([1, 1, 1, 2, 1, 1, 4, 5], dtype='float64')
+    query = np.array([2, 1, 1, 4], dtype='float64')
+    windows = mass_ts.core.rolling_window(ts, len(query))
+    corr = np.array([np.corrcoef(w, query)[0, 1] for w in windows])
+    dist = np.real(mts.mass2(ts, query))
+
+    for func in (mts.mass2, lambda *a, **kw: mts.mass3(a[0], a[1], 8, **kw)):
+        np.testing.assert_almost_equal(
+            np.real(func(ts, query, return_type='squared')), dist ** 2)
+        np.testing.assert_almost_equal(
+            func(ts, query, return_type='correlation'), corr)
+        np.testing.assert_almost_equal(
+            np.real(func(ts, query, return_type='distance')), dist)
+
+    squared = mts.mass(ts, query, return_type='squared')
+    np.testing.assert_almost_equal(squared, mts.mass(ts, query) ** 2)
+    np.testing.assert_almost_equal(
+        mts.mass(ts, query, return_type='correlation'),
+        1 - squared / (2 * len(query)))
+
+    with pytest.raises(ValueError):
+        mts.mass2(ts, query, return_type='cosine')
+
+    with pytest.raises(ValueError):
+        mts.mass(ts, query, normalize=False, corr_coef=True)
+
+    with pytest.raises(ValueError):
+        mts.mass(ts, query, normalize=False, return_type='correlation')
+
+
+def test_mass3_top_k_return_type_robotdog():
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+
+    indices, distances = mts.mass3_top_k(robot_dog, carpet_walk, 256, 3, 50)
+    actual = mts.mass3_top_k(
+        robot_dog, carpet_walk, 256, 3, 50, return_type='squared')
+    np.testing.assert_equal(actual[0], indices)
+    np.testing.assert_almost_equal(actual[1], distances ** 2, decimal=4)
+
+    actual = mts.mass3_top_k(
+        robot_dog, carpet_walk, 256, 3, 50, return_type='correlation')
+    np.testing.assert_equal(actual[0], indices)
+
+
+def test_constrained_search_robotdog():
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+    m = len(carpet_walk)
+    full = np.real(mts.mass2(robot_dog, carpet_walk))
+
+    mask = np.ones(len(robot_dog), dtype='bool')
+    mask[7400:7500] = False
+    intervals = [(1000, 3000), (6000, 9000)]
+
+    for kwargs in ({'start': 6000, 'stop': 9000}, {'mask': mask},
+                   {'mask': intervals}, {'mask': intervals, 'stop': 8000}):
+        valid = np.zeros(len(full), dtype='bool')
+        for first, last in mass_ts.core.valid_window_runs(
+                len(robot_dog), m, **kwargs):
+            valid[first:last] = True
+
+        for actual in (mts.mass2(robot_dog, carpet_walk, **kwargs),
+                       mts.mass3(robot_dog, carpet_walk, 256, **kwargs)):
+            actual = np.real(actual)
+            np.testing.assert_almost_equal(actual[valid], full[valid], 5)
+            assert(np.all(np.isinf(actual[~valid])))
+
+    indices, distances = mts.mass3_top_k(
+        robot_dog, carpet_walk, 256, 1, 50, mask=mask)
+    assert(indices[0] <= 7400 - m or indices[0] >= 7500)
+    assert(indices[0] != 7479)
+
+    indices, distances = mts.mass3_top_k(
+        robot_dog, carpet_walk, 256, 1, 50, start=6000, stop=9000)
+    assert(indices[0] == 7479)
+
+    with pytest.raises(ValueError):
+        mts.mass2(robot_dog, carpet_walk, start=-1)
+
+    with pytest.raises(ValueError):
+        mts.mass2(robot_dog, carpet_walk, mask=[True, False])
+
+
+def test_missing_values_robotdog():
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+    m = len(carpet_walk)
+    full = np.real(mts.mass2(robot_dog, carpet_walk))
+
+    ts = robot_dog.copy()
+    ts[[1000, 5000]] = np.nan
+    ts[9000:9500] = np.nan
+    gaps = np.zeros(len(full), dtype='bool')
+    for i in (1000, 5000):
+        gaps[i - m + 1:i + 1] = True
+    gaps[9000 - m + 1:9500] = True
+
+    for actual in (mts.mass2(ts, carpet_walk),
+                   mts.mass3(ts, carpet_walk, 256)):
+        actual = np.real(actual)
+        assert(np.all(np.isinf(actual[gaps])))
+        np.testing.assert_almost_equal(actual[~gaps], full[~gaps], 5)
+
+    corr = mts.mass2(ts, carpet_walk, return_type='correlation')
+    assert(np.all(corr[gaps] == -np.inf))
+
+    indices, distances = mts.mass3_top_k(
+        ts, carpet_walk, 256, 2, 50, option='discords')
+    assert(np.all(np.isfinite(distances)))
+    assert(not np.any(gaps[indices]))
+
+    with pytest.raises(ValueError):
+        mts.mass2(robot_dog, np.array([1., np.nan, 2.]))
+
+
+def test_correction_robotdog():
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+    m = len(carpet_walk)
+    dist = np.real(mts.mass2(robot_dog, carpet_walk, normalize=False))
+
+    def ce(x):
+        return np.sqrt(np.sum(np.diff(x) ** 2))
+
+    cey = ce(carpet_walk)
+    cex = np.array([ce(robot_dog[i:i + m]) for i in range(len(dist))])
+    desired = dist * np.maximum(cex, cey) / np.minimum(cex, cey)
+
+    actual = mts.mass2(
+        robot_dog, carpet_walk, normalize=False, correction='cid')
+    np.testing.assert_almost_equal(actual, desired)
+
+    actual = mts.mass3(
+        robot_dog, carpet_walk, 256, normalize=False, correction='cid')
+    np.testing.assert_almost_equal(actual, desired)
+
+    squared = mts.mass2(
+        robot_dog, carpet_walk, normalize=False, return_type='squared',
+        correction='cid')
+    np.testing.assert_almost_equal(np.sqrt(squared), desired, 5)
+
+    indices, distances = mts.mass3_top_k(
+        robot_dog, carpet_walk, 256, 3, 50, normalize=False,
+        correction='cid')
+    motifs = mass_ts.top_k_motifs(desired, 3, 50)
+    np.testing.assert_almost_equal(distances, desired[indices])
+    np.testing.assert_almost_equal(distances, np.sort(desired[motifs]))
+
+    actual = mts.mass2(robot_dog, carpet_walk, correction='length')
+    np.testing.assert_almost_equal(
+        actual, np.real(mts.mass2(robot_dog, carpet_walk)) / np.sqrt(m))
+
+    with pytest.raises(ValueError):
+        mts.mass2(robot_dog, carpet_walk, correction='unknown')
+
+    with pytest.raises(ValueError):
+        mts.mass2(robot_dog, carpet_walk, return_type='correlation',
+                  correction='cid')
+
+
+def test_mass2_xp_robotdog():
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+
+    for return_type in ('squared', 'distance', 'correlation'):
+        desired = mts.mass2(robot_dog, carpet_walk, return_type=return_type)
+        actual = mts.mass2_xp(
+            robot_dog, carpet_walk, return_type=return_type, backend='numpy')
+        np.testing.assert_almost_equal(actual, desired)
+
+    desired = mts.mass2(robot_dog, carpet_walk, normalize=False)
+    actual = mts.mass2_xp(
+        list(robot_dog), list(carpet_walk), normalize=False, to_numpy=False)
+    assert(isinstance(actual, np.ndarray))
+    np.testing.assert_almost_equal(actual, desired)
+
+    with pytest.raises(ValueError):
+        mts.mass2_xp(robot_dog, carpet_walk, backend='not_a_backend')
+
+
+def test_mass2_xp_array_api_strict():
+    xp = pytest.importorskip('array_api_strict')
+    ts = np.array([1, 1, 1, 2, 1, 1, 4, 5], dtype='float64')
+    query = np.array([2, 1, 1, 4], dtype='float64')
+
+    actual = mts.mass2_xp(xp.asarray(ts), xp.asarray(query), to_numpy=False)
+    assert(not isinstance(actual, np.ndarray))
+    np.testing.assert_almost_equal(
+        mtsbackend.to_numpy(actual, xp), mts.mass2(ts, query))
+
+
+def test_mass3_motif_set_robotdog():
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+    m = len(carpet_walk)
+    profile = np.real(mts.mass2(robot_dog, carpet_walk))
+    radius = 8.
+
+    indices, distances = mts.mass3_motif_set(
+        robot_dog, carpet_walk, 256, radius)
+    assert(indices[0] == 7479)
+    assert(np.all(distances <= radius))
+    assert(np.all(np.diff(distances) >= 0))
+    np.testing.assert_almost_equal(distances, profile[indices], 5)
+    assert(np.min(np.diff(np.sort(indices))) >= m)
+
+    # every window within the radius is covered by an occurrence
+    within = np.flatnonzero(profile <= radius - 1e-6)
+    nearest = np.min(np.abs(within[:, np.newaxis] - indices), axis=1)
+    assert(np.all(nearest < m))
+
+    # it matches a greedy selection over the whole sorted profile
+    desired = _top_k._greedy_select(
+        np.arange(len(profile)), profile, len(indices) + 1, m)
+    np.testing.assert_equal(
+        np.sort(indices), np.sort(desired[0][:len(indices)]))
+    assert(desired[1][len(indices)] > radius)
+
+    ordered, values = mts.mass3_motif_set(
+        robot_dog, carpet_walk, 256, radius, order='index')
+    np.testing.assert_equal(ordered, np.sort(indices))
+
+    corr, values = mts.mass3_motif_set(
+        robot_dog, carpet_walk, 256, 1 - radius ** 2 / (2 * m),
+        return_type='correlation')
+    np.testing.assert_equal(np.sort(corr), np.sort(indices))
+    assert(np.all(np.diff(values) <= 0))
+
+    empty, values = mts.mass3_motif_set(robot_dog, carpet_walk, 256, 0.)
+    assert(len(empty) == 0)
+
+    with pytest.raises(ValueError):
+        mts.mass3_motif_set(robot_dog, carpet_walk, 256, radius, order='x')
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+range = getattr(__builtins__, 'xrange', range)
+# end of py2 compatability boilerplate
+
+"""Tests for `mass_ts` package."""
+
+import os
+
+import pytest
+
+import numpy as np
+
+import mass_ts as mts
+
+MODULE_PATH = mts.__path__[0]
+
+
+def robot_dog_subsequences(k=20, m=100):
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    starts = np.linspace(0, len(robot_dog) - m, k).astype('int64')
+
+    return np.array([robot_dog[i:i + m] for i in starts])
+
+
+def test_pairwise_distances_matches_mass2():
+    subsequences = robot_dog_subsequences()
+    k = len(subsequences)
+    desired = np.array([
+        [np.real(mts.mass2(subsequences[j], subsequences[i]))[0]
+         for j in range(k)]
+        for i in range(k)
+    ])
+    np.fill_diagonal(desired, 0)
+
+    actual = mts.pairwise_distances(subsequences, chunk_size=7)
+    np.testing.assert_almost_equal(actual, desired, 5)
+    np.testing.assert_equal(actual, actual.T)
+
+    squared = mts.pairwise_distances(subsequences, return_type='squared')
+    np.testing.assert_almost_equal(np.sqrt(squared), actual, 5)
+
+    raw = mts.pairwise_distances(subsequences[:3], normalize=False)
+    np.testing.assert_almost_equal(
+        raw[0, 1], np.linalg.norm(subsequences[0] - subsequences[1]))
+
+
+def test_pairwise_distances_shift_invariant():
+    subsequences = robot_dog_subsequences(k=8, m=50)
+    m = subsequences.shape[1]
+    z = (subsequences - subsequences.mean(axis=1, keepdims=True)) / \
+        subsequences.std(axis=1, keepdims=True)
+
+    def brute(max_shift):
+        shifts = [s for s in range(m) if s <= max_shift or s >= m - max_shift]
+        return np.array([
+            [min(np.linalg.norm(a - np.roll(b, s)) for s in shifts)
+             for b in z]
+            for a in z
+        ])
+
+    actual = mts.pairwise_distances(
+        subsequences, shift_invariant=True, chunk_size=3)
+    np.testing.assert_almost_equal(actual, brute(m), 5)
+
+    actual = mts.pairwise_distances(
+        subsequences, shift_invariant=True, max_shift=5)
+    np.testing.assert_almost_equal(actual, brute(5), 5)
+
+    aligned = mts.pairwise_distances(subsequences)
+    assert(np.all(actual <= aligned + 1e-9))
+
+    corr = mts.pairwise_distances(
+        subsequences, shift_invariant=True, return_type='correlation')
+    np.testing.assert_almost_equal(
+        corr, 1 - brute(m) ** 2 / (2 * m), 5)
+
+
+def test_pairwise_distances_invalid():
+    with pytest.raises(ValueError):
+        mts.pairwise_distances(np.arange(10))
+
+    with pytest.raises(ValueError):
+        mts.pairwise_distances(np.ones((3, 4)), max_shift=-1)
+
+    with pytest.raises(ValueError):
+        mts.pairwise_distances(np.ones((3, 4)), chunk_size=0)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+range = getattr(__builtins__, 'xrange', range)
+# end of py2 compatability boilerplate
+
+"""Tests for `mass_ts` package."""
+
+import os
+
+import pytest
+
+import numpy as np
+
+import mass_ts as mts
+
+MODULE_PATH = mts.__path__[0]
+
+CALIBRATION = {'fft': 2e-9, 'overhead': 5e-6}
+
+
+def test_plan_search_memory_limit():
+    plan = mts.plan_search(10 ** 6, 100, memory_limit=2 ** 34,
+                           calibration=CALIBRATION)
+    assert(plan['memory'] <= 2 ** 34)
+    assert(plan['algorithm'] in ('mass2', 'mass3'))
+
+    plan = mts.plan_search(10 ** 6, 100, memory_limit=50 * 10 ** 6,
+                           calibration=CALIBRATION)
+    assert(plan['algorithm'] == 'mass3')
+    assert(plan['memory'] <= 50 * 10 ** 6)
+
+    plan = mts.plan_search(10 ** 6, 100, memory_limit=2 ** 22, top_matches=5,
+                           calibration=CALIBRATION)
+    assert(plan['algorithm'] == 'mass2_batch')
+    assert(plan['memory'] <= 2 ** 22)
+    assert(10 ** 6 // plan['batch_size'] >= 5)
+
+    with pytest.raises(ValueError):
+        mts.plan_search(10 ** 6, 100, memory_limit=2 ** 20,
+                        calibration=CALIBRATION)
+
+
+def test_plan_search_prefers_mass2_for_small_series():
+    for n in (3000, 2 ** 16):
+        plan = mts.plan_search(n, 100, memory_limit=2 ** 34,
+                               calibration=CALIBRATION)
+        assert(plan['algorithm'] == 'mass2')
+
+    cold = mts.plan_search(2 ** 16, 100, calibration=CALIBRATION)
+    warm = mts.plan_search(2 ** 16, 100, calibration=CALIBRATION,
+                           query_cached=True)
+    assert(warm['seconds'] < cold['seconds'])
+
+
+def test_search_robotdog():
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+    desired = np.real(mts.mass2(robot_dog, carpet_walk))
+
+    for memory_limit in (2 ** 30, 10 ** 6):
+        dist, plan = mts.search(robot_dog, carpet_walk,
+                                memory_limit=memory_limit)
+        assert(dist.dtype == np.float64)
+        np.testing.assert_almost_equal(dist, desired, decimal=5)
+
+    assert(plan['algorithm'] == 'mass3')
+
+    (indices, distances), plan = mts.search(
+        robot_dog, carpet_walk, memory_limit=10 ** 6, top_matches=3)
+    assert(plan['algorithm'] == 'mass2_batch')
+    np.testing.assert_almost_equal(distances, desired[indices], decimal=5)
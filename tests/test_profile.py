@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+range = getattr(__builtins__, 'xrange', range)
+# end of py2 compatability boilerplate
+
+"""Tests for `mass_ts` package."""
+
+import os
+
+import pytest
+
+import numpy as np
+
+import mass_ts as mts
+
+MODULE_PATH = os.path.dirname(os.path.realpath(__file__))
+
+
+def test_distance_profile_matches_mass2():
+    ts = np.array([1, 1, 1, 2, 1, 1, 4, 5], dtype='float64')
+    query = np.array([2, 1, 1, 4], dtype='float64')
+    desired = np.real(mts.mass2(ts, query))
+
+    profile = mts.distance_profile(ts, query)
+    assert(profile.dtype == np.float64)
+    assert(not np.iscomplexobj(profile.values))
+    np.testing.assert_almost_equal(np.asarray(profile), desired)
+
+    profile = mts.distance_profile(ts, query, squared=True, dtype='float32')
+    assert(profile.dtype == np.float32)
+    np.testing.assert_almost_equal(profile.squared_distances, desired ** 2, 5)
+    np.testing.assert_almost_equal(profile.distances, desired, 5)
+    np.testing.assert_almost_equal(
+        profile.corr_coef, mts.mass2(ts, query, corr_coef=True), 5)
+
+
+def test_distance_profile_views():
+    ts = np.array([1, 1, 1, 2, 1, 1, 4, 5], dtype='float64')
+    query = np.array([2, 1, 1, 4], dtype='float64')
+    profile = mts.distance_profile(ts, query, squared=True)
+
+    view = profile[2:5]
+    assert(len(view) == 3)
+    assert(view.offset == 2)
+    assert(np.shares_memory(view.values, profile.values))
+    np.testing.assert_almost_equal(view[0], profile[2])
+    assert(view.argmin() == 3)
+    np.testing.assert_equal(profile.distances[profile.order],
+                            np.sort(profile.distances))
+
+    np.testing.assert_almost_equal(
+        profile[np.array([2, 3])], profile.distances[2:4])
+
+    with pytest.raises(ValueError):
+        profile[::2]
+
+    raw = mts.distance_profile(ts, query, normalize=False)
+    assert(not raw[1:3].normalize)
+    with pytest.raises(ValueError):
+        raw.corr_coef
+
+
+def test_distance_profile_top_k_robotdog():
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+
+    profile = mts.distance_profile(robot_dog, carpet_walk, pieces=256)
+    desired = mts.mass3_top_k(robot_dog, carpet_walk, 256, 3, 50)
+    indices, distances = profile.top_k(3, 50)
+
+    np.testing.assert_equal(indices, desired[0])
+    np.testing.assert_almost_equal(distances, desired[1])
+
+    indices, distances = profile[7000:8000].top_k(1, 50)
+    assert(indices[0] == 7479)
+
+
+def test_distance_profile_top_k_discords_constant_segment():
+    rng = np.random.RandomState(0)
+    ts = rng.randn(2000)
+    ts[500:700] = 1.0
+    query = rng.randn(50)
+
+    profile = mts.distance_profile(ts, query)
+    assert(np.isinf(profile.distances).any())
+
+    indices, distances = profile.top_k(3, 25, 'discords')
+    desired = mts._top_k._greedy_select(
+        np.arange(len(profile)), -profile.distances, 3, 25)
+
+    assert(len(indices) == 3)
+    np.testing.assert_equal(indices, desired[0])
+    np.testing.assert_almost_equal(distances, -desired[1])
+
+
+def test_distance_profile_missing_values():
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+    robot_dog[7480] = np.nan
+    robot_dog[100:1500] = np.nan
+    desired = np.real(mts.mass2(robot_dog, carpet_walk))
+
+    for pieces in (None, 256):
+        profile = mts.distance_profile(robot_dog, carpet_walk, pieces=pieces)
+        np.testing.assert_almost_equal(profile.distances, desired)
+
+        indices, distances = profile.top_k(3, 50)
+        assert(len(indices) == 3)
+        assert(np.all(np.isfinite(distances)))
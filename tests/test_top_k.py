@@ -46,6 +46,61 @@ def test_top_k_discords():
     distances = mts.mass2(robot_dog, carpet_walk)
     found = mts.top_k_discords(distances, 2, 25)
     found = np.array(found)
-    expected = np.array([12900, 2])
 
-    assert(np.array_equal(found, expected))
\ No newline at end of file
+    # the robot dog series repeats, so the two discords are tied
+    expected = np.array([798, 8798])
+
+    assert(np.array_equal(np.sort(found), expected))
+
+def test_top_k_buffer_matches_greedy_selection_across_pieces():
+    profile = np.full(64, 10.0)
+    profile[30] = 0.5
+    profile[33] = 1.0
+    profile[36] = 2.0
+    profile[50] = 3.0
+    buffer = mts._top_k.TopKBuffer(2, 5)
+
+    # 33 blocks 36 within its own piece but is itself blocked by 30
+    buffer.push(0, profile[:32])
+    buffer.push(32, profile[32:])
+
+    indices, distances = buffer.result()
+    desired_indices, desired_dists = mts._top_k._greedy_select(
+        np.arange(64), profile, 2, 5)
+
+    np.testing.assert_equal(desired_indices, [30, 36])
+    np.testing.assert_equal(indices, desired_indices)
+    np.testing.assert_almost_equal(distances, desired_dists)
+
+
+def test_mass3_top_k_discords_flat_segment():
+    rng = np.random.RandomState(0)
+    ts = rng.randn(2000)
+    ts[500:700] = 1.0
+    query = rng.randn(50)
+
+    # the flat windows have inf distances which must not hide the discords
+    dist = mts.mass2(ts, query, normalize=False, correction='cid')
+    desired = mts._top_k._greedy_select(np.arange(len(dist)), -dist, 3, 25)
+    indices, distances = mts.mass3_top_k(
+        ts, query, 256, 3, 25, 'discords', normalize=False,
+        correction='cid')
+
+    assert(np.isinf(dist).any())
+    assert(len(mts.top_k_discords(dist, 3, 25)) == 3)
+    np.testing.assert_equal(indices, desired[0])
+    np.testing.assert_almost_equal(distances, -desired[1])
+
+
+def test_top_k_correlation():
+    """Sanity check that compares results from UCR use case."""
+    robot_dog = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'robot_dog.txt'))
+    carpet_walk = np.loadtxt(
+        os.path.join(MODULE_PATH, '..', 'tests', 'carpet_query.txt'))
+
+    corr = mts.mass2(robot_dog, carpet_walk, return_type='correlation')
+    found = mts.top_k_motifs(corr, 2, 25, return_type='correlation')
+
+    assert(found[0] == 7479)
+    assert(found[0] == np.argmax(corr))